@@ -0,0 +1,293 @@
+"""
+Ingest benchmark on synthetic Retrosheet data.
+
+Writes -s seasons (the last one 2014, the last season in fgGuts.json) of
+synthetic event, roster and TEAM files with classes/synthetic.py, then runs
+each stage of a full build in a process of its own:
+
+  generate      writing the synthetic files
+  convert       event files to csv (built-in parser, or chadwick with -c)
+  teams         parse.py's loaders, into empty tables
+  rosters
+  games
+  events
+  indexes       building the indexes deferred during the load
+  value_added   retrosheet_sql_tools.computeValueAdded and playoffFlagSql
+                (needs numpy and pytz)
+
+Every stage is recorded with its rows, wall time, rows/sec and the peak RSS
+of its process and child processes, as a JSON line in benchmarks.jsonl
+tagged with the git commit. -r prints the recorded runs at the given scale
+side by side, so commits can be compared.
+
+The stages always run against a new sqlite database in the work directory.
+With -p, they run again against the [database] of the given config file, e.g.
+a local postgres database set aside for benchmarks: its tables are dropped
+and recreated from sql/schema.postgres.sql.
+
+    python benchmark.py [-s seasons] [-t teams] [-g games per team]
+                        [-w work directory] [-c chadwick directory]
+                        [-p config file] [-o results file] [-k] [-r]
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import getopt
+import shutil
+import resource
+import tempfile
+import subprocess
+import ConfigParser
+import multiprocessing
+import parse
+from classes import synthetic
+from classes import eventparser
+
+LAST_SEASON = 2014
+STAGES = ['generate', 'convert', 'teams', 'rosters', 'games', 'events', 'indexes', 'value_added']
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_commit():
+    """The short hash of the checked out commit, with '+dirty' if tracked
+    files have been modified."""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPTS).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('+dirty' if dirty else '')
+
+
+def stage_process(queue, func, args):
+    start = time.time()
+    try:
+        rows, error = func(*args), None
+    except Exception, e:
+        rows, error = 0, ('%s: %s' % (type(e).__name__, e)).strip()
+    seconds = time.time() - start
+
+    # ru_maxrss is in kilobytes on linux
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    queue.put((rows, seconds, rss / 1024.0, error))
+
+
+def measure(func, *args):
+    """Run func(*args) in a new process, so that its peak RSS is its own.
+    Returns (rows, seconds, peak RSS in MB, error or None)."""
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=stage_process, args=(queue, func, args))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def count_rows(files):
+    """Rows of csv `files` written with a header line."""
+    rows = 0
+    for file in files:
+        with open(file) as fp:
+            rows += max(0, sum(1 for line in fp) - 1)
+    return rows
+
+
+def generate(path, years, teams, games):
+    return sum(synthetic.write_season(path, year, teams, games) for year in years)
+
+
+def convert(path, years, chadwick):
+    csvpath = '%s/csv' % path
+    if chadwick:
+        jobs, runner = parse.chadwick_jobs(years, chadwick, path, csvpath), parse.run_chadwick
+    else:
+        jobs, runner = parse.native_jobs(years, path, csvpath), eventparser.run_native
+
+    failed = parse.convert(jobs, multiprocessing.cpu_count(), False, runner)
+    if failed:
+        raise RuntimeError(', '.join('%s failed with exit code %s' % job for job in failed))
+    return count_rows(glob.glob('%s/events-*.csv' % csvpath))
+
+
+def load_table(config, path, years, table):
+    conn = parse.connect(config)
+    sqlite = conn.engine.name == 'sqlite'
+    bound_param = '?' if sqlite else '%s'
+    if sqlite:
+        parse.sqlite_pragmas(conn, parse.SQLITE_BULK_PRAGMAS)
+
+    try:
+        if table == 'teams':
+            keys = set()
+            for year in years:
+                parse.parse_teams('%s/TEAM%d' % (path, year), conn, bound_param, keys)
+            return len(keys)
+
+        if table == 'rosters':
+            keys = set()
+            for year in years:
+                for file in sorted(glob.glob('%s/*%d.ROS' % (path, year))):
+                    parse.parse_rosters(file, conn, bound_param, keys)
+            return len(keys)
+
+        loader = parse.parse_games if table == 'games' else parse.parse_events
+        return sum(loader('%s/csv/%s-%d.csv' % (path, table, year), conn, bound_param, 10000, False) for year in years)
+    finally:
+        conn.close()
+
+
+def build_indexes(config, deferred):
+    conn = parse.connect(config)
+    try:
+        parse.add_secondary_indexes(conn, ['games', 'events'], deferred)
+        parse.build_indexes(parse.get_engine(config), conn, deferred, 1 if conn.engine.name == 'sqlite' else 2, False)
+    finally:
+        conn.close()
+    return 0
+
+
+def value_added(cfg_file, years):
+    # read external_data/ relative to the scripts directory
+    os.chdir(SCRIPTS)
+    import retrosheet_sql_tools
+    rs = retrosheet_sql_tools.retrosheet_sql(cfgFile=cfg_file)
+    rs.updateSchema()
+    rs.playoffFlagSql(minyr=min(years), maxyr=max(years))
+    return sum(len(rdata['TBL_RETRO_EVENTS']) for rdata in rs.computeValueAdded(minyr=min(years), maxyr=max(years)))
+
+
+def create_schema(config):
+    """Drop and create the tables of the benchmark database, and defer its
+    events/games indexes like a full rebuild with parse.py does. Returns the
+    deferred index statements."""
+    conn = parse.connect(config)
+    try:
+        if conn.engine.name == 'sqlite':
+            conn.connection.executescript(open('%s/../sql/schema.sql' % SCRIPTS).read())
+            return parse.sqlite_defer_indexes(conn, ['games', 'events'])
+
+        cursor = conn.connection.cursor()
+        cursor.execute(open('%s/../sql/schema.postgres.sql' % SCRIPTS).read())
+        conn.connection.commit()
+        return parse.defer_indexes(conn, ['games', 'events'], ['games', 'events'])
+    finally:
+        conn.close()
+
+
+def run(config, path, years, chadwick, scale, results, generated):
+    """Run the stages against the database in `config`, appending a record
+    per stage to the `results` file. Files written by an earlier run are
+    reused when `generated`."""
+    engine = config.get('database', 'engine')
+    cfg_file = '%s/benchmark-%s.ini' % (path, engine)
+    with open(cfg_file, 'w') as out:
+        config.write(out)
+    deferred = create_schema(config)
+
+    stages = [('generate', generate, (path, years, scale['teams'], scale['games'])),
+              ('convert', convert, (path, years, chadwick)),
+              ('teams', load_table, (config, path, years, 'teams')),
+              ('rosters', load_table, (config, path, years, 'rosters')),
+              ('games', load_table, (config, path, years, 'games')),
+              ('events', load_table, (config, path, years, 'events')),
+              ('indexes', build_indexes, (config, deferred)),
+              ('value_added', value_added, (cfg_file, years))]
+
+    commit = git_commit()
+    for stage, func, args in stages:
+        if stage in ('generate', 'convert') and generated:
+            continue
+
+        print '%s %s...' % (engine, stage)
+        rows, seconds, rss, error = measure(func, *args)
+        record = {'commit': commit, 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'engine': engine,
+                  'stage': stage, 'rows': rows, 'seconds': round(seconds, 3),
+                  'rows_per_sec': round(rows / max(seconds, 0.001), 1), 'peak_rss_mb': round(rss, 1),
+                  'python': sys.version.split()[0]}
+        record.update(scale)
+        if error:
+            record['error'] = error
+            print '%s %s failed: %s' % (engine, stage, error)
+
+        with open(results, 'a') as out:
+            out.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def report(results, scale):
+    """Print the recorded stages at `scale`, the latest run of every commit
+    and engine, oldest commit first."""
+    if not os.path.isfile(results):
+        print 'no results in %s' % results
+        return
+
+    latest = {}
+    commits = []
+    for line in open(results):
+        record = json.loads(line)
+        if any(record.get(k) != v for k, v in scale.items()):
+            continue
+        if record['commit'] not in commits:
+            commits.append(record['commit'])
+        latest[record['commit'], record['engine'], record['stage']] = record
+
+    print 'commit        engine      stage          rows   seconds     rows/s   peak MB'
+    for engine in sorted(set(k[1] for k in latest)):
+        for stage in STAGES:
+            for commit in commits:
+                record = latest.get((commit, engine, stage))
+                if record is None:
+                    continue
+                print ('%-13s %-11s %-11s %8d %9.2f %10.0f %9.1f   %s' % (
+                    commit, engine, stage, record['rows'], record['seconds'], record['rows_per_sec'],
+                    record['peak_rss_mb'], record.get('error', ''))).rstrip()
+
+
+def main():
+    opts, args = getopt.getopt(sys.argv[1:], "s:t:g:w:c:p:o:kr")
+    opts = dict(opts)
+
+    scale = {'seasons': int(opts.get('-s', 1)),
+             'teams': int(opts.get('-t', 30)),
+             'games': int(opts.get('-g', 162))}
+    results = os.path.abspath(opts.get('-o', 'benchmarks.jsonl'))
+
+    if '-r' in opts:
+        report(results, scale)
+        return
+
+    years = range(LAST_SEASON - scale['seasons'] + 1, LAST_SEASON + 1)
+    chadwick = opts.get('-c')
+    path = os.path.abspath(opts['-w']) if '-w' in opts else tempfile.mkdtemp(prefix='retrosheet-benchmark-')
+    if os.path.exists('%s/csv' % path):
+        shutil.rmtree('%s/csv' % path)
+    os.makedirs('%s/csv' % path)
+
+    sqlite = ConfigParser.ConfigParser()
+    sqlite.add_section('database')
+    sqlite.set('database', 'engine', 'sqlite')
+    sqlite.set('database', 'database', '%s/benchmark.sqlite' % path)
+    if os.path.exists('%s/benchmark.sqlite' % path):
+        os.remove('%s/benchmark.sqlite' % path)
+
+    configs = [sqlite]
+    if '-p' in opts:
+        config = ConfigParser.ConfigParser()
+        config.readfp(open(opts['-p']))
+        configs.append(config)
+
+    try:
+        for i, config in enumerate(configs):
+            run(config, path, years, chadwick, scale, results, i > 0)
+    finally:
+        if '-k' not in opts and '-w' not in opts:
+            shutil.rmtree(path)
+
+    report(results, scale)
+
+
+if __name__ == '__main__':
+    main()
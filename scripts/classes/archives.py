@@ -0,0 +1,112 @@
+'''
+Season files read straight out of the Retrosheet archives.
+
+With `[download] extract = False`, download.py keeps every <yyyy>eve.zip and
+gl<yyyy>.zip as it was downloaded instead of unzipping it into thousands of
+small files, so a season is a single file. Season gives parse.py and
+eventparser.py the event, roster and TEAM files of a season, whether they
+were extracted into the download directory or are still in its archive.
+Programs that need real files, like cwevent and cwgame, get them through
+directory(), which unzips the archive into a temporary directory for as
+long as they run.
+'''
+
+import os
+import re
+import glob
+import shutil
+import fnmatch
+import zipfile
+import tempfile
+import contextlib
+
+
+class Season(object):
+    ''' The files of season `year` in the download directory `path`: the
+    extracted ones if there are any, otherwise the members of the season's
+    archive. '''
+
+    def __init__(self, path, year):
+        self.path = path
+        self.year = year
+        archive = '%s/%deve.zip' % (path, year)
+        if not glob.glob('%s/%d*.EV*' % (path, year)) and os.path.isfile(archive):
+            self.archive = archive
+            zip = zipfile.ZipFile(archive, 'r')
+            self.members = sorted(name for name in zip.namelist() if not name.endswith('/'))
+            zip.close()
+        else:
+            self.archive = None
+
+    def location(self):
+        ''' The archive or directory holding the files. '''
+        return self.archive or self.path
+
+    def names(self, pattern):
+        ''' The sorted file names matching the glob `pattern`. '''
+        if self.archive:
+            return [name for name in self.members if fnmatch.fnmatch(os.path.basename(name), pattern)]
+        return sorted(os.path.basename(f) for f in glob.glob('%s/%s' % (self.path, pattern)))
+
+    def open(self, name):
+        if self.archive:
+            zip = zipfile.ZipFile(self.archive, 'r')
+            try:
+                # the member keeps a file handle of its own
+                return zip.open(name)
+            finally:
+                zip.close()
+        return open('%s/%s' % (self.path, name))
+
+    def event_files(self):
+        return self.names('%d*.EV*' % self.year)
+
+    def roster_files(self):
+        return self.names('*%d.ROS' % self.year)
+
+    def team_files(self):
+        return self.names('TEAM%d' % self.year)
+
+
+def seasons(path):
+    ''' The seasons with event files in `path`, extracted or in archives. '''
+    years = set()
+    for file in glob.glob('%s/*.EV*' % path) + glob.glob('%s/*eve.zip' % path):
+        name = os.path.basename(file)
+        if name[:4].isdigit():
+            years.add(int(name[:4]))
+    return years
+
+
+def open_text(file):
+    ''' Open `file`, or the first text member of it if it is a zip file,
+    such as the GLyyyy.TXT of a gl<yyyy>.zip. '''
+    if not file.lower().endswith('.zip'):
+        return open(file)
+
+    zip = zipfile.ZipFile(file, 'r')
+    try:
+        names = [name for name in zip.namelist() if re.search(r'\.txt$', name, re.I)]
+        return zip.open(names[0])
+    finally:
+        zip.close()
+
+
+@contextlib.contextmanager
+def directory(location):
+    ''' A directory with the files of `location`: the directory itself, or a
+    temporary one with the members of the archive, removed afterwards. '''
+    if not location.endswith('.zip'):
+        yield location
+        return
+
+    tmp = tempfile.mkdtemp(prefix='retrosheet-')
+    try:
+        zip = zipfile.ZipFile(location, 'r')
+        try:
+            zip.extractall(tmp)
+        finally:
+            zip.close()
+        yield tmp
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,1246 @@
+'''
+A pure python reader for Retrosheet event files (.EVN/.EVA), usable in
+place of the Chadwick cwevent/cwgame binaries.
+
+iter_file() reads an event file in one pass, yielding the 84 fields of
+`cwgame -f 0-83` for every game along with its events, each a tuple of the
+same 97 standard and 63 extended fields that `cwevent -f 0-96 -x 0-62`
+writes. A season is fanned out over a process pool one file at a time
+(file_jobs and run_native), and merge() joins the files' csv output.
+
+The play interpreter follows the Retrosheet event file specification
+(http://www.retrosheet.org/eventfile.htm). A few derived fields are
+approximations of Chadwick's scoring logic (RBI credit on errors and
+double plays, the responsible pitcher/batter rules and the runner fates);
+run this file with -b to compare its output with cwevent on real data:
+
+   python classes/eventparser.py -b -y 2004 -c /usr/local/bin files
+
+Without -b it converts the event files of the given year(s) into
+csv/events-YYYY.csv and csv/games-YYYY.csv under the given directory.
+'''
+
+import os
+import re
+import sys
+import csv
+import time
+import shutil
+import getopt
+import datetime
+import subprocess
+import multiprocessing
+from cStringIO import StringIO
+import archives
+
+
+EVENT_FIELDS = [
+    'GAME_ID', 'AWAY_TEAM_ID', 'INN_CT', 'BAT_HOME_ID', 'OUTS_CT', 'BALLS_CT',
+    'STRIKES_CT', 'PITCH_SEQ_TX', 'AWAY_SCORE_CT', 'HOME_SCORE_CT', 'BAT_ID',
+    'BAT_HAND_CD', 'RESP_BAT_ID', 'RESP_BAT_HAND_CD', 'PIT_ID', 'PIT_HAND_CD',
+    'RESP_PIT_ID', 'RESP_PIT_HAND_CD', 'POS2_FLD_ID', 'POS3_FLD_ID',
+    'POS4_FLD_ID', 'POS5_FLD_ID', 'POS6_FLD_ID', 'POS7_FLD_ID', 'POS8_FLD_ID',
+    'POS9_FLD_ID', 'BASE1_RUN_ID', 'BASE2_RUN_ID', 'BASE3_RUN_ID', 'EVENT_TX',
+    'LEADOFF_FL', 'PH_FL', 'BAT_FLD_CD', 'BAT_LINEUP_ID', 'EVENT_CD',
+    'BAT_EVENT_FL', 'AB_FL', 'H_CD', 'SH_FL', 'SF_FL', 'EVENT_OUTS_CT', 'DP_FL',
+    'TP_FL', 'RBI_CT', 'WP_FL', 'PB_FL', 'FLD_CD', 'BATTEDBALL_CD', 'BUNT_FL',
+    'FOUL_FL', 'BATTEDBALL_LOC_TX', 'ERR_CT', 'ERR1_FLD_CD', 'ERR1_CD',
+    'ERR2_FLD_CD', 'ERR2_CD', 'ERR3_FLD_CD', 'ERR3_CD', 'BAT_DEST_ID',
+    'RUN1_DEST_ID', 'RUN2_DEST_ID', 'RUN3_DEST_ID', 'BAT_PLAY_TX',
+    'RUN1_PLAY_TX', 'RUN2_PLAY_TX', 'RUN3_PLAY_TX', 'RUN1_SB_FL', 'RUN2_SB_FL',
+    'RUN3_SB_FL', 'RUN1_CS_FL', 'RUN2_CS_FL', 'RUN3_CS_FL', 'RUN1_PK_FL',
+    'RUN2_PK_FL', 'RUN3_PK_FL', 'RUN1_RESP_PIT_ID', 'RUN2_RESP_PIT_ID',
+    'RUN3_RESP_PIT_ID', 'GAME_NEW_FL', 'GAME_END_FL', 'PR_RUN1_FL',
+    'PR_RUN2_FL', 'PR_RUN3_FL', 'REMOVED_FOR_PR_RUN1_ID',
+    'REMOVED_FOR_PR_RUN2_ID', 'REMOVED_FOR_PR_RUN3_ID', 'REMOVED_FOR_PH_BAT_ID',
+    'REMOVED_FOR_PH_BAT_FLD_CD', 'PO1_FLD_CD', 'PO2_FLD_CD', 'PO3_FLD_CD',
+    'ASS1_FLD_CD', 'ASS2_FLD_CD', 'ASS3_FLD_CD', 'ASS4_FLD_CD', 'ASS5_FLD_CD',
+    'EVENT_ID',
+    # extended fields (cwevent -x 0-62)
+    'HOME_TEAM_ID', 'BAT_TEAM_ID', 'FLD_TEAM_ID', 'BAT_LAST_ID', 'INN_NEW_FL',
+    'INN_END_FL', 'START_BAT_SCORE_CT', 'START_FLD_SCORE_CT', 'INN_RUNS_CT',
+    'GAME_PA_CT', 'INN_PA_CT', 'PA_NEW_FL', 'PA_TRUNC_FL', 'START_BASES_CD',
+    'END_BASES_CD', 'BAT_START_FL', 'RESP_BAT_START_FL', 'BAT_ON_DECK_ID',
+    'BAT_IN_HOLD_ID', 'PIT_START_FL', 'RESP_PIT_START_FL', 'RUN1_FLD_CD',
+    'RUN1_LINEUP_CD', 'RUN1_ORIGIN_EVENT_ID', 'RUN2_FLD_CD', 'RUN2_LINEUP_CD',
+    'RUN2_ORIGIN_EVENT_ID', 'RUN3_FLD_CD', 'RUN3_LINEUP_CD',
+    'RUN3_ORIGIN_EVENT_ID', 'RUN1_RESP_CAT_ID', 'RUN2_RESP_CAT_ID',
+    'RUN3_RESP_CAT_ID', 'PA_BALL_CT', 'PA_CALLED_BALL_CT', 'PA_INTENT_BALL_CT',
+    'PA_PITCHOUT_BALL_CT', 'PA_HITBATTER_BALL_CT', 'PA_OTHER_BALL_CT',
+    'PA_STRIKE_CT', 'PA_CALLED_STRIKE_CT', 'PA_SWINGMISS_STRIKE_CT',
+    'PA_FOUL_STRIKE_CT', 'PA_INPLAY_STRIKE_CT', 'PA_OTHER_STRIKE_CT',
+    'EVENT_RUNS_CT', 'FLD_ID', 'BASE2_FORCE_FL', 'BASE3_FORCE_FL',
+    'BASE4_FORCE_FL', 'BAT_SAFE_ERR_FL', 'BAT_FATE_ID', 'RUN1_FATE_ID',
+    'RUN2_FATE_ID', 'RUN3_FATE_ID', 'FATE_RUNS_CT', 'ASS6_FLD_CD',
+    'ASS7_FLD_CD', 'ASS8_FLD_CD', 'ASS9_FLD_CD', 'ASS10_FLD_CD',
+    'UNKNOWN_OUT_EXC_FL', 'UNCERTAIN_PLAY_EXC_FL']
+
+GAME_FIELDS = [
+    'GAME_ID', 'GAME_DT', 'GAME_CT', 'GAME_DY', 'START_GAME_TM', 'DH_FL',
+    'DAYNIGHT_PARK_CD', 'AWAY_TEAM_ID', 'HOME_TEAM_ID', 'PARK_ID',
+    'AWAY_START_PIT_ID', 'HOME_START_PIT_ID', 'BASE4_UMP_ID', 'BASE1_UMP_ID',
+    'BASE2_UMP_ID', 'BASE3_UMP_ID', 'LF_UMP_ID', 'RF_UMP_ID', 'ATTEND_PARK_CT',
+    'SCORER_RECORD_ID', 'TRANSLATOR_RECORD_ID', 'INPUTTER_RECORD_ID',
+    'INPUT_RECORD_TS', 'EDIT_RECORD_TS', 'METHOD_RECORD_CD',
+    'PITCHES_RECORD_CD', 'TEMP_PARK_CT', 'WIND_DIRECTION_PARK_CD',
+    'WIND_SPEED_PARK_CT', 'FIELD_PARK_CD', 'PRECIP_PARK_CD', 'SKY_PARK_CD',
+    'MINUTES_GAME_CT', 'INN_CT', 'AWAY_SCORE_CT', 'HOME_SCORE_CT',
+    'AWAY_HITS_CT', 'HOME_HITS_CT', 'AWAY_ERR_CT', 'HOME_ERR_CT',
+    'AWAY_LOB_CT', 'HOME_LOB_CT', 'WIN_PIT_ID', 'LOSE_PIT_ID', 'SAVE_PIT_ID',
+    'GWRBI_BAT_ID'] + \
+    ['%s_LINEUP%d_%s' % (team, slot, kind) for team in ('AWAY', 'HOME')
+     for slot in range(1, 10) for kind in ('BAT_ID', 'FLD_CD')] + \
+    ['AWAY_FINISH_PIT_ID', 'HOME_FINISH_PIT_ID']
+
+FIELD_INDEX = dict((name, i) for i, name in enumerate(EVENT_FIELDS))
+
+# fields derived from Chadwick's scoring logic, which this parser only
+# approximates: RBI credit, the responsible batter/pitcher and runner fates
+APPROXIMATE = frozenset([
+    'RBI_CT', 'RESP_BAT_ID', 'RESP_BAT_HAND_CD', 'RESP_PIT_ID',
+    'RESP_PIT_HAND_CD', 'RESP_BAT_START_FL', 'RESP_PIT_START_FL',
+    'RUN1_RESP_PIT_ID', 'RUN2_RESP_PIT_ID', 'RUN3_RESP_PIT_ID',
+    'RUN1_RESP_CAT_ID', 'RUN2_RESP_CAT_ID', 'RUN3_RESP_CAT_ID', 'BAT_FATE_ID',
+    'RUN1_FATE_ID', 'RUN2_FATE_ID', 'RUN3_FATE_ID', 'FATE_RUNS_CT'])
+
+# event types, numbered as in the lkup_cd_event table
+(UNKNOWN, NONE, GENERIC_OUT, STRIKEOUT, STOLEN_BASE, INDIFFERENCE,
+ CAUGHT_STEALING, PICKOFF_ERROR, PICKOFF, WILD_PITCH, PASSED_BALL, BALK,
+ OTHER_ADVANCE, FOUL_ERROR, WALK, INTENTIONAL_WALK, HIT_BY_PITCH,
+ INTERFERENCE, ERROR, FIELDERS_CHOICE, SINGLE, DOUBLE, TRIPLE,
+ HOME_RUN) = range(24)
+
+BATTER_EVENTS = frozenset([GENERIC_OUT, STRIKEOUT, WALK, INTENTIONAL_WALK,
+                           HIT_BY_PITCH, INTERFERENCE, ERROR, FIELDERS_CHOICE,
+                           SINGLE, DOUBLE, TRIPLE, HOME_RUN])
+NOT_AT_BAT = frozenset([WALK, INTENTIONAL_WALK, HIT_BY_PITCH, INTERFERENCE])
+RBI_EVENTS = frozenset([GENERIC_OUT, WALK, INTENTIONAL_WALK, HIT_BY_PITCH,
+                        INTERFERENCE, FIELDERS_CHOICE, SINGLE, DOUBLE, TRIPLE,
+                        HOME_RUN])
+
+# pitch sequence codes, by the PA_*_CT field they count towards
+CALLED_BALL, INTENT_BALL, PITCHOUT_BALL, HITBATTER_BALL, OTHER_BALL = 'B', 'I', 'P', 'H', 'V'
+CALLED_STRIKE, SWINGMISS_STRIKE, FOUL_STRIKE, INPLAY_STRIKE, OTHER_STRIKE = 'C', 'SMQ', 'FLORT', 'XY', 'K'
+
+# info record values to the lkup_cd_* codes used by cwgame
+HOWSCORED = {'park': 1, 'tv': 2, 'radio': 3}
+PITCHES = {'pitches': 1, 'count': 2}
+WINDDIR = {'tolf': 1, 'tocf': 2, 'torf': 3, 'ltor': 4, 'fromlf': 5, 'fromcf': 6, 'fromrf': 7, 'rtol': 8}
+FIELDCOND = {'soaked': 1, 'wet': 2, 'damp': 3, 'dry': 4}
+PRECIP = {'none': 1, 'drizzle': 2, 'showers': 3, 'rain': 4, 'snow': 5}
+SKY = {'sunny': 1, 'cloudy': 2, 'overcast': 3, 'night': 4, 'dome': 5}
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+ADVANCE_RE = re.compile(r'([B123])([-X])([123H])((?:\([^)]*\))*)')
+PARENS_RE = re.compile(r'\(([^)]*)\)')
+FIELDING_RE = re.compile(r'(\d[0-9E]*)(?:\(([B123])\))?')
+BATTEDBALL_RE = re.compile(r'^(BG|BP|BL|G|L|F|P)(\d[0-9A-Z]*)?[+-]?$')
+BASE = {'1': 1, '2': 2, '3': 3, 'H': 4}
+
+
+def flag(value):
+    return 'T' if value else 'F'
+
+
+def split_outside_parens(text, sep):
+    """Split `text` on `sep`, ignoring separators inside parentheses."""
+    parts = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(text):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def fielder(text):
+    """The first fielder digit in `text`, or 0."""
+    for ch in text:
+        if ch.isdigit():
+            return int(ch)
+    return 0
+
+
+class Play(object):
+    ''' The outcome of one play, as described by its event text. Index 0 of
+    the per-runner lists is the batter, 1-3 the runners on those bases.
+    '''
+    __slots__ = ('event_cd', 'dest', 'out', 'explicit', 'play_tx', 'rbi',
+                 'sb', 'cs', 'pk', 'errors', 'putouts', 'assists',
+                 'fielded_by', 'batted_ball', 'bunt', 'foul', 'loc', 'sh',
+                 'sf', 'dp', 'tp', 'wp', 'pb', 'safe_on_error',
+                 'unknown_out', 'uncertain')
+
+    def __init__(self):
+        self.event_cd = UNKNOWN
+        self.dest = [0, 1, 2, 3]
+        self.out = [False, False, False, False]
+        self.explicit = [False, False, False, False]
+        self.play_tx = ['', '', '', '']
+        self.rbi = [None, None, None, None]
+        self.sb = [False, False, False, False]
+        self.cs = [False, False, False, False]
+        self.pk = [False, False, False, False]
+        self.errors = []
+        self.putouts = []
+        self.assists = []
+        self.fielded_by = 0
+        self.batted_ball = ''
+        self.bunt = False
+        self.foul = False
+        self.loc = ''
+        self.sh = False
+        self.sf = False
+        self.dp = False
+        self.tp = False
+        self.wp = False
+        self.pb = False
+        self.safe_on_error = False
+        self.unknown_out = False
+        self.uncertain = False
+
+    def credit(self, seq, throwing=False):
+        ''' Credit putouts, assists and errors for a fielding sequence such
+        as "643" or "2E6". Returns True if the sequence records an out.
+        '''
+        if 'E' in seq:
+            before, after = seq.split('E', 1)
+            for ch in before:
+                self.assist(int(ch))
+            if after[:1].isdigit():
+                self.errors.append((int(after[0]), 'T' if throwing else 'F'))
+            return False
+
+        digits = [int(ch) for ch in seq if ch.isdigit()]
+        if not digits:
+            return True
+        for f in digits[:-1]:
+            self.assist(f)
+        self.putouts.append(digits[-1])
+        return True
+
+    def assist(self, f):
+        if f not in self.assists:
+            self.assists.append(f)
+
+    def put_out(self, who, seq):
+        self.out[who] = True
+        self.dest[who] = 0
+        self.play_tx[who] = seq
+
+
+def parse_fielding(p, text):
+    ''' Interpret a fielding sequence for outs, e.g. "63", "64(1)3" or
+    "8(B)84(2)". Marks who is out and credits the fielders.
+    '''
+    groups = FIELDING_RE.findall(text)
+    if not groups:
+        return
+
+    p.fielded_by = fielder(groups[0][0])
+    batter_out = False
+    last = None
+    for seq, runner in groups:
+        # after a force ("64(1)3") the relay continues from the fielder
+        # who made the previous putout
+        if last is not None and last[1] != 'B' and last[0] and not seq.startswith(last[0][-1]):
+            seq = last[0][-1] + seq
+        who = 0 if runner in ('', 'B') else int(runner)
+        if p.credit(seq):
+            p.put_out(who, seq)
+            if who == 0:
+                batter_out = True
+        elif who == 0:
+            p.safe_on_error = True
+            p.event_cd = ERROR
+            p.dest[0] = 1
+        last = (seq, runner)
+
+    # a force out with no out recorded on the batter leaves him on first
+    if not batter_out and not p.safe_on_error:
+        p.dest[0] = 1
+
+
+def parse_runner_event(p, text):
+    ''' Interpret the running events that can stand alone or follow a
+    strikeout or walk: SB, CS, PO, POCS, WP, PB, OA, DI and E.
+    '''
+    for item in text.split(';'):
+        if item.startswith('SB'):
+            target = BASE.get(item[2:3])
+            if target:
+                p.sb[target - 1] = True
+                p.dest[target - 1] = target
+        elif item.startswith('CS') or item.startswith('POCS'):
+            pickoff = item.startswith('POCS')
+            body = item[4:] if pickoff else item[2:]
+            target = BASE.get(body[:1])
+            if not target:
+                continue
+            src = target - 1
+            p.cs[src] = True
+            p.pk[src] = p.pk[src] or pickoff
+            groups = PARENS_RE.findall(body)
+            seq = groups[0].split('/')[0] if groups else ''
+            if seq and 'E' in seq:
+                p.credit(seq, throwing='/TH' in groups[0])
+                p.dest[src] = target
+            else:
+                if seq:
+                    p.credit(seq)
+                p.put_out(src, seq)
+        elif item.startswith('PO'):
+            src = BASE.get(item[2:3])
+            if not src or src > 3:
+                continue
+            p.pk[src] = True
+            groups = PARENS_RE.findall(item)
+            seq = groups[0].split('/')[0] if groups else ''
+            if seq and 'E' in seq:
+                p.credit(seq, throwing='/TH' in groups[0])
+            else:
+                if seq:
+                    p.credit(seq)
+                p.put_out(src, seq)
+        elif item.startswith('WP'):
+            p.wp = True
+        elif item.startswith('PB'):
+            p.pb = True
+        elif item.startswith('E'):
+            f = fielder(item)
+            if f:
+                p.errors.append((f, 'F'))
+
+
+def parse_modifiers(p, mods):
+    for mod in mods:
+        m = BATTEDBALL_RE.match(mod)
+        if m:
+            kind = m.group(1)
+            p.batted_ball = kind[-1]
+            p.bunt = p.bunt or kind.startswith('B')
+            p.loc = (m.group(2) or '').rstrip('+-')
+            if p.loc.endswith('F'):
+                p.foul = True
+            continue
+
+        if mod == 'SH':
+            p.sh = True
+        elif mod == 'SF':
+            p.sf = True
+        elif mod == 'FL':
+            p.foul = True
+        elif mod.endswith('TP'):
+            p.tp = True
+        elif mod.endswith('DP') and mod != 'NDP':
+            p.dp = True
+
+        # the double/triple play modifiers also give the batted ball type
+        if mod in ('GDP', 'GTP', 'BGDP'):
+            p.batted_ball = p.batted_ball or 'G'
+        elif mod in ('LDP', 'LTP'):
+            p.batted_ball = p.batted_ball or 'L'
+        elif mod == 'FDP':
+            p.batted_ball = p.batted_ball or 'F'
+        elif mod == 'BPDP':
+            p.batted_ball = p.batted_ball or 'P'
+        if mod in ('BGDP', 'BPDP'):
+            p.bunt = True
+
+
+def parse_advances(p, text):
+    for item in text.split(';'):
+        m = ADVANCE_RE.match(item.strip())
+        if not m:
+            continue
+        who = 0 if m.group(1) == 'B' else int(m.group(1))
+        target = BASE[m.group(3)]
+        is_out = m.group(2) == 'X'
+        p.explicit[who] = True
+
+        for group in PARENS_RE.findall(m.group(4)):
+            if group == 'UR':
+                target = 5 if target == 4 else target
+            elif group == 'TUR':
+                target = 6 if target == 4 else target
+            elif group in ('NR', 'NORBI'):
+                p.rbi[who] = False
+            elif group == 'RBI':
+                p.rbi[who] = True
+            elif group == 'WP':
+                p.wp = True
+            elif group == 'PB':
+                p.pb = True
+            elif group[:1].isdigit() or group[:1] == 'E':
+                seq = group.split('/')[0]
+                if 'E' in seq:
+                    p.credit(seq, throwing='/TH' in group)
+                    if who == 0:
+                        p.safe_on_error = True
+                    is_out = False
+                elif is_out:
+                    p.credit(seq)
+                    p.play_tx[who] = seq
+
+        if is_out:
+            p.out[who] = True
+            p.dest[who] = 0
+        else:
+            p.out[who] = False
+            p.dest[who] = target
+
+
+def parse_play(text, occupied):
+    ''' Interpret the event text of a play record. `occupied` holds the
+    occupancy of first, second and third base (index 1-3) before the play.
+    '''
+    p = Play()
+    p.uncertain = '#' in text
+    text = text.replace('#', '').replace('!', '').replace('?', '')
+
+    main, _, advances = text.partition('.')
+    pieces = split_outside_parens(main, '/')
+    basic, mods = pieces[0], pieces[1:]
+    basic, _, extra = basic.partition('+')
+    throwing = any(mod.startswith('TH') for mod in mods)
+
+    parse_modifiers(p, mods)
+
+    if basic.startswith('K'):
+        p.event_cd = STRIKEOUT
+        seq = basic[1:]
+        if seq and seq[0].isdigit():
+            parse_fielding(p, seq)
+            p.fielded_by = 0
+        else:
+            p.put_out(0, '2')
+            p.putouts.append(2)
+        if extra:
+            parse_runner_event(p, extra)
+    elif basic == 'NP':
+        p.event_cd = NONE
+    elif basic.startswith('IW') or basic == 'I':
+        p.event_cd = INTENTIONAL_WALK
+        p.dest[0] = 1
+        if extra:
+            parse_runner_event(p, extra)
+    elif basic.startswith('WP'):
+        p.event_cd = WILD_PITCH
+        p.wp = True
+    elif basic.startswith('W'):
+        p.event_cd = WALK
+        p.dest[0] = 1
+        if extra:
+            parse_runner_event(p, extra)
+    elif basic.startswith('HP'):
+        p.event_cd = HIT_BY_PITCH
+        p.dest[0] = 1
+    elif basic.startswith('H'):
+        p.event_cd = HOME_RUN
+        p.fielded_by = fielder(basic)
+        p.dest[0] = 4
+    elif basic.startswith('SB'):
+        p.event_cd = STOLEN_BASE
+        parse_runner_event(p, basic)
+    elif basic.startswith('S'):
+        p.event_cd = SINGLE
+        p.fielded_by = fielder(basic)
+        p.dest[0] = 1
+    elif basic.startswith('DI'):
+        p.event_cd = INDIFFERENCE
+    elif basic.startswith('D'):
+        p.event_cd = DOUBLE
+        p.fielded_by = 0 if basic.startswith('DGR') else fielder(basic)
+        p.dest[0] = 2
+    elif basic.startswith('T'):
+        p.event_cd = TRIPLE
+        p.fielded_by = fielder(basic)
+        p.dest[0] = 3
+    elif basic.startswith('POCS') or basic.startswith('CS'):
+        p.event_cd = CAUGHT_STEALING
+        parse_runner_event(p, basic)
+    elif basic.startswith('PO'):
+        p.event_cd = PICKOFF
+        parse_runner_event(p, basic)
+    elif basic.startswith('PB'):
+        p.event_cd = PASSED_BALL
+        p.pb = True
+    elif basic.startswith('C'):
+        p.event_cd = INTERFERENCE
+        p.dest[0] = 1
+        for mod in mods:
+            if mod[:1] == 'E' and fielder(mod):
+                p.errors.append((fielder(mod), 'F'))
+    elif basic.startswith('FC'):
+        p.event_cd = FIELDERS_CHOICE
+        p.fielded_by = fielder(basic)
+        p.dest[0] = 1
+    elif basic.startswith('FLE'):
+        p.event_cd = FOUL_ERROR
+        p.fielded_by = fielder(basic)
+        p.errors.append((p.fielded_by, 'F'))
+    elif basic.startswith('E'):
+        p.event_cd = ERROR
+        p.fielded_by = fielder(basic)
+        p.errors.append((p.fielded_by, 'T' if throwing else 'F'))
+        p.safe_on_error = True
+        p.dest[0] = 1
+    elif basic.startswith('BK'):
+        p.event_cd = BALK
+    elif basic.startswith('OA'):
+        p.event_cd = OTHER_ADVANCE
+    elif basic.startswith('99'):
+        p.event_cd = GENERIC_OUT
+        p.unknown_out = True
+        p.put_out(0, '')
+    elif basic[:1].isdigit():
+        p.event_cd = GENERIC_OUT
+        parse_fielding(p, basic)
+
+    if advances:
+        parse_advances(p, advances)
+
+    # runners forced by a walk, hit batsman or interference move up even
+    # when the file does not say so
+    if p.event_cd in NOT_AT_BAT and p.dest[0] == 1:
+        forced = True
+        for base in (1, 2, 3):
+            forced = forced and occupied[base]
+            if forced and not p.explicit[base] and not p.out[base]:
+                p.dest[base] = max(p.dest[base], base + 1)
+
+    return p
+
+
+def pitch_counts(pitches):
+    ''' Ball and strike counts of a pitch sequence, in the order of the
+    PA_*_CT fields.
+    '''
+    c = dict((ch, pitches.count(ch)) for ch in set(pitches))
+    called_ball = c.get(CALLED_BALL, 0)
+    intent = c.get(INTENT_BALL, 0)
+    pitchout = c.get(PITCHOUT_BALL, 0)
+    hitbatter = c.get(HITBATTER_BALL, 0)
+    other_ball = c.get(OTHER_BALL, 0)
+    called = c.get(CALLED_STRIKE, 0)
+    swingmiss = sum(c.get(ch, 0) for ch in SWINGMISS_STRIKE)
+    foul = sum(c.get(ch, 0) for ch in FOUL_STRIKE)
+    inplay = sum(c.get(ch, 0) for ch in INPLAY_STRIKE)
+    other_strike = c.get(OTHER_STRIKE, 0)
+    return (called_ball + intent + pitchout + hitbatter + other_ball,
+            called_ball, intent, pitchout, hitbatter, other_ball,
+            called + swingmiss + foul + inplay + other_strike,
+            called, swingmiss, foul, inplay, other_strike)
+
+
+def parse_count(count):
+    balls = int(count[0]) if count[:1].isdigit() else 0
+    strikes = int(count[1]) if count[1:2].isdigit() else 0
+    return balls, strikes
+
+
+def read_rosters(path, year):
+    ''' Read the year's .ROS files in `path`, or in its archive there, into
+    a dictionary of player_id: (bats, throws).
+    '''
+    hands = {}
+    season = archives.Season(path, int(year))
+    for name in season.roster_files():
+        for row in csv.reader(season.open(name)):
+            if len(row) >= 5:
+                hands[row[0]] = (row[3], row[4])
+    return hands
+
+
+def read_games(fp):
+    ''' Split an event file into (game_id, records) pairs, one per game. '''
+    game_id = None
+    records = []
+    for rec in csv.reader(fp):
+        if not rec:
+            continue
+        if rec[0] == 'id':
+            if game_id is not None:
+                yield game_id, records
+            game_id = rec[1].strip()
+            records = []
+        elif game_id is not None:
+            records.append(rec)
+    if game_id is not None:
+        yield game_id, records
+
+
+class Runner(object):
+    __slots__ = ('pid', 'slot', 'origin', 'resp_pit', 'resp_cat', 'fate')
+
+    def __init__(self, pid, slot, origin, resp_pit, resp_cat, fate):
+        self.pid = pid
+        self.slot = slot
+        self.origin = origin
+        self.resp_pit = resp_pit
+        self.resp_cat = resp_cat
+        self.fate = fate
+
+
+class Game(object):
+    ''' Replays the records of one game, keeping track of the lineups, the
+    base/out state and the score, and builds the cwevent and cwgame rows.
+    '''
+
+    def __init__(self, game_id, records, hands):
+        self.game_id = game_id
+        self.records = records
+        self.hands = hands
+        self.info = {}
+
+        self.lineup = [[''] * 10, [''] * 10]
+        self.fielders = [[''] * 11, [''] * 11]
+        self.position = {}
+        self.slot_of = {}
+        self.starters = set()
+        self.start_lineup = [[('', 0)] * 10, [('', 0)] * 10]
+        self.start_pitcher = ['', '']
+
+        self.inning = 1
+        self.half = 0
+        self.outs = 0
+        self.score = [0, 0]
+        self.hits = [0, 0]
+        self.errors = [0, 0]
+        self.lob = [0, 0]
+        self.bases = [None, None, None, None]
+        self.game_pa = [0, 0]
+        self.inn_pa = 0
+        self.inn_runs = 0
+        self.event_id = 0
+
+        self.pa_count = (0, 0)
+        self.pa_new = True
+        self.removed_ph = None
+        self.removed_pr = [None, None, None, None]
+        self.resp_pit = None
+        self.resp_bat = None
+        self.bat_hand_adj = None
+        self.pit_hand_adj = None
+        self.pending_runner = None
+
+        self.half_rows = []
+        self.rows = []
+
+    ##########################
+    def run(self):
+        for rec in self.records:
+            kind = rec[0]
+            if kind == 'play':
+                self.play(rec)
+            elif kind == 'info':
+                self.info[rec[1]] = rec[2] if len(rec) > 2 else ''
+            elif kind == 'start':
+                self.start(rec)
+            elif kind == 'sub':
+                self.sub(rec)
+            elif kind == 'badj':
+                self.bat_hand_adj = (rec[1], rec[2])
+            elif kind == 'padj':
+                self.pit_hand_adj = (rec[1], rec[2])
+            elif kind == 'radj':
+                self.pending_runner = (rec[1], int(rec[2]))
+
+        self.end_half()
+        if self.rows:
+            self.rows[-1][FIELD_INDEX['GAME_END_FL']] = 'T'
+        return self.rows
+
+    ##########################
+    def place(self, pid, team, slot, pos):
+        if slot > 0:
+            self.lineup[team][slot] = pid
+            self.slot_of[pid] = slot
+        self.position[pid] = pos
+        if 1 <= pos <= 10:
+            self.fielders[team][pos] = pid
+
+    def start(self, rec):
+        pid, team, slot, pos = rec[1], int(rec[3]), int(rec[4]), int(rec[5])
+        self.place(pid, team, slot, pos)
+        self.starters.add(pid)
+        if slot > 0:
+            self.start_lineup[team][slot] = (pid, pos)
+        if pos == 1:
+            self.start_pitcher[team] = pid
+
+    def sub(self, rec):
+        pid, team, slot, pos = rec[1], int(rec[3]), int(rec[4]), int(rec[5])
+        old = self.lineup[team][slot] if slot > 0 else self.fielders[team][1]
+        balls, strikes = self.pa_count
+
+        if pos == 11:
+            self.removed_ph = (old, self.position.get(old, 0))
+            if strikes == 2:
+                self.resp_bat = old
+        elif pos == 12:
+            for base in (1, 2, 3):
+                runner = self.bases[base]
+                if runner is not None and runner.pid == old:
+                    runner.pid = pid
+                    self.removed_pr[base] = old
+        elif pos == 1:
+            prev = self.fielders[team][1]
+            if prev and prev != pid and balls > strikes and balls >= 2:
+                self.resp_pit = prev
+
+        self.place(pid, team, slot, pos)
+
+    ##########################
+    def new_half(self, inning, half):
+        self.end_half()
+        self.inning = inning
+        self.half = half
+        self.outs = 0
+        self.inn_pa = 0
+        self.inn_runs = 0
+        self.bases = [None, None, None, None]
+        self.pa_count = (0, 0)
+        self.pa_new = True
+        if self.pending_runner is not None:
+            pid, base = self.pending_runner
+            self.bases[base] = Runner(pid, self.slot_of.get(pid, 0), 0,
+                                      self.fielders[1 - half][1], self.fielders[1 - half][2], base)
+            self.pending_runner = None
+
+    def end_half(self):
+        ''' Fill in the fields that depend on the rest of the half inning. '''
+        rows = self.half_rows
+        if not rows:
+            return
+        self.lob[self.half] += sum(1 for r in self.bases[1:] if r is not None)
+
+        F = FIELD_INDEX
+        total = sum(row[F['EVENT_RUNS_CT']] for row, runners in rows)
+        so_far = 0
+        for row, runners in rows:
+            so_far += row[F['EVENT_RUNS_CT']]
+            row[F['INN_RUNS_CT']] = total
+            row[F['FATE_RUNS_CT']] = total - so_far
+            for i, name in enumerate(('BAT_FATE_ID', 'RUN1_FATE_ID', 'RUN2_FATE_ID', 'RUN3_FATE_ID')):
+                runner = runners[i]
+                if isinstance(runner, Runner):
+                    row[F[name]] = runner.fate
+                else:
+                    row[F[name]] = runner
+
+        last = rows[-1][0]
+        last[F['INN_END_FL']] = 'T'
+        if last[F['BAT_EVENT_FL']] == 'F':
+            last[F['PA_TRUNC_FL']] = 'T'
+
+        self.half_rows = []
+
+    ##########################
+    def hand(self, pid, which):
+        hands = self.hands.get(pid)
+        return hands[which] if hands else '?'
+
+    def play(self, rec):
+        inning, half = int(rec[1]), int(rec[2])
+        batter, count, pitches, text = rec[3], rec[4], rec[5], rec[6].strip()
+        if (inning, half) != (self.inning, self.half) or self.outs >= 3:
+            self.new_half(inning, half)
+
+        self.pa_count = parse_count(count)
+        if text == 'NP':
+            return
+
+        bt, ft = half, 1 - half
+        bases = self.bases
+        occupied = [False] + [r is not None for r in bases[1:]]
+        p = parse_play(text, occupied)
+        self.event_id += 1
+        F = FIELD_INDEX
+
+        pitcher = self.fielders[ft][1]
+        catcher = self.fielders[ft][2]
+        batter_event = p.event_cd in BATTER_EVENTS
+        slot = self.slot_of.get(batter, 0)
+        balls, strikes = self.pa_count
+
+        # hands, including switch hitters and the badj/padj records
+        pit_hand = self.hand(pitcher, 1)
+        if self.pit_hand_adj and self.pit_hand_adj[0] == pitcher:
+            pit_hand = self.pit_hand_adj[1]
+        bat_hand = self.hand(batter, 0)
+        if bat_hand == 'B':
+            bat_hand = {'R': 'L', 'L': 'R'}.get(pit_hand, '?')
+        if self.bat_hand_adj and self.bat_hand_adj[0] == batter:
+            bat_hand = self.bat_hand_adj[1]
+
+        resp_batter = self.resp_bat if self.resp_bat and p.event_cd == STRIKEOUT else batter
+        resp_pitcher = self.resp_pit if self.resp_pit and p.event_cd in (WALK, INTENTIONAL_WALK) else pitcher
+        resp_bat_hand = bat_hand if resp_batter == batter else self.hand(resp_batter, 0)
+        resp_pit_hand = pit_hand if resp_pitcher == pitcher else self.hand(resp_pitcher, 1)
+
+        # move the runners
+        start_bases = sum(1 << (b - 1) for b in (1, 2, 3) if bases[b] is not None)
+        start_score = list(self.score)
+        new_bases = [None, None, None, None]
+        runs = 0
+        outs = 0
+        dests = [0, 0, 0, 0]
+        for base in (3, 2, 1):
+            runner = bases[base]
+            if runner is None:
+                continue
+            if p.out[base]:
+                runner.fate = 0
+                outs += 1
+            elif p.dest[base] >= 4:
+                runner.fate = 4
+                runs += 1
+                dests[base] = p.dest[base]
+            else:
+                new_bases[p.dest[base]] = runner
+                runner.fate = p.dest[base]
+                dests[base] = p.dest[base]
+
+        batter_runner = 0
+        if batter_event or p.explicit[0]:
+            if p.out[0]:
+                outs += 1
+            elif p.dest[0] >= 4:
+                runs += 1
+                dests[0] = p.dest[0]
+                batter_runner = 4
+            elif p.dest[0] > 0:
+                dests[0] = p.dest[0]
+                batter_runner = Runner(batter, slot, self.event_id, resp_pitcher, catcher, p.dest[0])
+                new_bases[p.dest[0]] = batter_runner
+
+        rbi = 0
+        for who in (0, 1, 2, 3):
+            if dests[who] < 4:
+                continue
+            if p.rbi[who] is True:
+                rbi += 1
+            elif p.rbi[who] is None:
+                if p.event_cd in RBI_EVENTS and not (p.dp and p.event_cd == GENERIC_OUT):
+                    rbi += 1
+                elif p.event_cd == ERROR and who == 3 and self.outs < 2:
+                    rbi += 1
+
+        self.score[bt] += runs
+        if p.event_cd in (SINGLE, DOUBLE, TRIPLE, HOME_RUN):
+            self.hits[bt] += 1
+        self.errors[ft] += len(p.errors)
+
+        errors = (p.errors + [(0, 'N')] * 3)[:3]
+        putouts = (p.putouts + [0] * 3)[:3]
+        assists = (p.assists + [0] * 10)[:10]
+        counts = pitch_counts(pitches)
+        end_bases = sum(1 << (b - 1) for b in (1, 2, 3) if new_bases[b] is not None)
+        on_deck = self.lineup[bt][slot % 9 + 1] if slot else ''
+        in_hold = self.lineup[bt][(slot + 1) % 9 + 1] if slot else ''
+        fld_id = self.fielders[ft][p.fielded_by] if p.fielded_by else ''
+        bat_fld = self.position.get(batter, 0)
+        removed_ph = self.removed_ph if self.removed_ph else ('', 0)
+
+        def runner_id(base):
+            return bases[base].pid if bases[base] is not None else ''
+
+        def runner_fld(base):
+            return self.position.get(bases[base].pid, 0) if bases[base] is not None else 0
+
+        def runner_slot(base):
+            return bases[base].slot if bases[base] is not None else 0
+
+        def runner_origin(base):
+            return bases[base].origin if bases[base] is not None else 0
+
+        def runner_pit(base):
+            return bases[base].resp_pit if bases[base] is not None else ''
+
+        def runner_cat(base):
+            return bases[base].resp_cat if bases[base] is not None else ''
+
+        row = [
+            self.game_id, self.info.get('visteam', ''), self.inning, bt,
+            self.outs, balls, strikes, pitches,
+            start_score[0], start_score[1], batter, bat_hand,
+            resp_batter, resp_bat_hand, pitcher, pit_hand,
+            resp_pitcher, resp_pit_hand] + \
+            [self.fielders[ft][pos] for pos in range(2, 10)] + \
+            [runner_id(1), runner_id(2), runner_id(3), text,
+             flag(self.inn_pa == 0), flag(bat_fld == 11), bat_fld, slot,
+             p.event_cd, flag(batter_event),
+             flag(batter_event and p.event_cd not in NOT_AT_BAT and not p.sh and not p.sf),
+             max(0, p.event_cd - FIELDERS_CHOICE) if p.event_cd >= SINGLE else 0,
+             flag(p.sh), flag(p.sf), outs, flag(p.dp), flag(p.tp), rbi,
+             flag(p.wp), flag(p.pb), p.fielded_by, p.batted_ball,
+             flag(p.bunt), flag(p.foul), p.loc, len(p.errors),
+             errors[0][0], errors[0][1], errors[1][0], errors[1][1],
+             errors[2][0], errors[2][1],
+             dests[0] if batter_event or p.explicit[0] else 0,
+             dests[1], dests[2], dests[3],
+             p.play_tx[0], p.play_tx[1], p.play_tx[2], p.play_tx[3]] + \
+            [flag(p.sb[b] and bases[b] is not None) for b in (1, 2, 3)] + \
+            [flag(p.cs[b] and bases[b] is not None) for b in (1, 2, 3)] + \
+            [flag(p.pk[b] and bases[b] is not None) for b in (1, 2, 3)] + \
+            [runner_pit(1), runner_pit(2), runner_pit(3),
+             flag(self.event_id == 1), 'F'] + \
+            [flag(self.removed_pr[b]) for b in (1, 2, 3)] + \
+            [self.removed_pr[b] or '' for b in (1, 2, 3)] + \
+            [removed_ph[0], removed_ph[1]] + \
+            putouts + assists[:5] + \
+            [self.event_id,
+             # extended fields
+             self.info.get('hometeam', ''), self.info.get('hometeam' if bt else 'visteam', ''),
+             self.info.get('visteam' if bt else 'hometeam', ''),
+             bt if self.info.get('htbf', 'false') != 'true' else 1 - bt,
+             flag(not self.half_rows), 'F', start_score[bt], start_score[ft],
+             0, self.game_pa[bt], self.inn_pa, flag(self.pa_new), 'F',
+             start_bases, end_bases,
+             flag(batter in self.starters), flag(resp_batter in self.starters),
+             on_deck, in_hold,
+             flag(pitcher in self.starters), flag(resp_pitcher in self.starters),
+             runner_fld(1), runner_slot(1), runner_origin(1),
+             runner_fld(2), runner_slot(2), runner_origin(2),
+             runner_fld(3), runner_slot(3), runner_origin(3),
+             runner_cat(1), runner_cat(2), runner_cat(3)] + \
+            list(counts) + \
+            [runs, fld_id,
+             flag(occupied[1]), flag(occupied[1] and occupied[2]),
+             flag(occupied[1] and occupied[2] and occupied[3]),
+             flag(p.safe_on_error and batter_runner != 0),
+             0, 0, 0, 0, 0] + \
+            assists[5:] + \
+            [flag(p.unknown_out), flag(p.uncertain)]
+
+        self.rows.append(row)
+        self.half_rows.append((row, [batter_runner if batter_event or p.explicit[0] else 0,
+                                     bases[1] if bases[1] is not None else 0,
+                                     bases[2] if bases[2] is not None else 0,
+                                     bases[3] if bases[3] is not None else 0]))
+
+        # advance the state
+        self.bases = new_bases
+        self.outs = min(3, self.outs + outs)
+        self.inn_runs += runs
+        self.removed_pr = [None, None, None, None]
+        self.removed_ph = None
+        if batter_event:
+            self.game_pa[bt] += 1
+            self.inn_pa += 1
+            self.pa_count = (0, 0)
+            self.pa_new = True
+            self.resp_bat = None
+            self.resp_pit = None
+            self.bat_hand_adj = None
+            self.pit_hand_adj = None
+        else:
+            self.pa_new = False
+
+    ##########################
+    def summary(self):
+        ''' The cwgame row of the game; call after run(). '''
+        info = self.info
+        date = info.get('date', '0000/00/00')
+        try:
+            weekday = WEEKDAYS[datetime.date(int(date[0:4]), int(date[5:7]), int(date[8:10])).weekday()]
+        except ValueError:
+            weekday = ''
+        start_time = re.sub(r'[^0-9]', '', info.get('starttime', '')) or '0'
+
+        def number(key, default=0):
+            try:
+                return int(info.get(key, default))
+            except ValueError:
+                return default
+
+        row = [self.game_id, date[2:4] + date[5:7] + date[8:10], number('number'),
+               weekday, int(start_time),
+               flag(info.get('usedh', 'false') == 'true'),
+               info.get('daynight', '')[:1].upper(),
+               info.get('visteam', ''), info.get('hometeam', ''), info.get('site', ''),
+               self.start_pitcher[0], self.start_pitcher[1],
+               info.get('umphome', ''), info.get('ump1b', ''), info.get('ump2b', ''),
+               info.get('ump3b', ''), info.get('umplf', ''), info.get('umprf', ''),
+               number('attendance'), info.get('scorer', ''), info.get('translator', ''),
+               info.get('inputter', ''), info.get('inputtime', ''), info.get('edittime', ''),
+               HOWSCORED.get(info.get('howscored'), 0), PITCHES.get(info.get('pitches'), 0),
+               number('temp'), WINDDIR.get(info.get('winddir'), 0), number('windspeed', -1),
+               FIELDCOND.get(info.get('fieldcond'), 0), PRECIP.get(info.get('precip'), 0),
+               SKY.get(info.get('sky'), 0), number('timeofgame'), self.inning,
+               self.score[0], self.score[1], self.hits[0], self.hits[1],
+               self.errors[0], self.errors[1], self.lob[0], self.lob[1],
+               info.get('wp', ''), info.get('lp', ''), info.get('save', ''), info.get('gwrbi', '')]
+        for team in (0, 1):
+            for slot in range(1, 10):
+                row.extend(self.start_lineup[team][slot])
+        row.extend([self.fielders[0][1], self.fielders[1][1]])
+        return row
+
+
+def iter_file(file, hands):
+    ''' Yield (game row, event rows) for every game in the event `file`, a
+    file name or an open file. '''
+    for game_id, records in read_games(open(file) if isinstance(file, basestring) else file):
+        game = Game(game_id, records, hands)
+        rows = game.run()
+        yield tuple(game.summary()), [tuple(row) for row in rows]
+
+
+class CsvStream(object):
+    ''' A read-only file-like object producing csv text (with a header line)
+    from an iterator of rows, for csv.reader and psycopg2's copy_expert.
+    By default text values are quoted and numbers are not, like Chadwick's
+    output; with csv.QUOTE_MINIMAL, None and empty values are written bare,
+    which COPY reads as NULL.
+    '''
+
+    def __init__(self, header, rows, quoting=csv.QUOTE_NONNUMERIC):
+        self.buffer = StringIO()
+        self.writer = csv.writer(self.buffer, quoting=quoting, lineterminator='\n')
+        self.lines = self.generate(header, rows)
+        self.pending = ''
+
+    def generate(self, header, rows):
+        for row in [header] if header else []:
+            yield self.format(row)
+        for row in rows:
+            yield self.format(row)
+
+    def format(self, row):
+        self.writer.writerow(row)
+        line = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return line
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.pending:
+            line, self.pending = self.pending, ''
+            return line
+        return self.lines.next()
+
+    def readline(self, size=-1):
+        try:
+            return self.next()
+        except StopIteration:
+            return ''
+
+    def read(self, size=-1):
+        chunks = [self.pending]
+        length = len(self.pending)
+        self.pending = ''
+        for line in self.lines:
+            chunks.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = ''.join(chunks)
+        if 0 <= size < len(data):
+            data, self.pending = data[:size], data[size:]
+        return data
+
+    def close(self):
+        pass
+
+
+def stream(path, year):
+    ''' A CsvStream of the cwevent rows of `year`, and the list of its cwgame
+    rows, which fills up as the stream is read and is complete at its end. '''
+    hands = read_rosters(path, year)
+    season = archives.Season(path, year)
+    games = []
+
+    def events():
+        for name in season.event_files():
+            for summary, rows in iter_file(season.open(name), hands):
+                games.append(summary)
+                for row in rows:
+                    yield row
+
+    return CsvStream(EVENT_FIELDS, events()), games
+
+
+def part_file(csvpath, kind, name):
+    ''' The csv of the `kind` ('events' or 'games') rows of the event file
+    `name`, written by run_native and read by merge. '''
+    return '%s/parts/%s.%s.csv' % (csvpath, os.path.basename(name), kind)
+
+
+def file_jobs(path, year, csvpath):
+    ''' The run_native jobs of the event files of `year`, one per file, as
+    (name, (year, file), path, csvpath) tuples. '''
+    if not os.path.isdir('%s/parts' % csvpath):
+        os.makedirs('%s/parts' % csvpath)
+    return [('native %s' % name, (year, name), path, csvpath) for name in archives.Season(path, year).event_files()]
+
+
+def run_native(job):
+    ''' Process pool entry point with the same contract as parse.run_chadwick:
+    convert one event file into the csv parts of its events and games,
+    written atomically, and return (name, exit code).
+    '''
+    name, (year, file), path, csvpath = job
+    outputs = [part_file(csvpath, kind, file) for kind in ('events', 'games')]
+    tmps = ['%s.tmp' % output for output in outputs]
+    try:
+        hands = read_rosters(path, year)
+        events = open(tmps[0], 'w')
+        try:
+            games = open(tmps[1], 'w')
+            try:
+                writers = [csv.writer(out, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n') for out in (events, games)]
+                for summary, rows in iter_file(archives.Season(path, year).open(file), hands):
+                    writers[0].writerows(rows)
+                    writers[1].writerow(summary)
+            finally:
+                games.close()
+        finally:
+            events.close()
+    except Exception, e:
+        print 'cannot convert %s: %s' % (name, e)
+        for tmp in tmps:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return name, 1
+
+    for tmp, output in zip(tmps, outputs):
+        os.rename(tmp, output)
+    return name, 0
+
+
+def merge(path, year, csvpath):
+    ''' Join the parts of the event files of `year` into csv/events-YYYY.csv
+    and csv/games-YYYY.csv, with their header lines, and remove the parts.
+    Returns False, writing nothing, when a part is missing because its file
+    failed to convert. '''
+    names = archives.Season(path, year).event_files()
+    parts = dict((kind, [part_file(csvpath, kind, name) for name in names]) for kind in ('events', 'games'))
+    if not all(os.path.isfile(part) for kind in parts for part in parts[kind]):
+        return False
+
+    for kind, header in [('events', EVENT_FIELDS), ('games', GAME_FIELDS)]:
+        output = '%s/%s-%d.csv' % (csvpath, kind, year)
+        out = open('%s.tmp' % output, 'w')
+        try:
+            out.write(CsvStream(header, []).read())
+            for part in parts[kind]:
+                with open(part) as fp:
+                    shutil.copyfileobj(fp, out)
+        finally:
+            out.close()
+        os.rename('%s.tmp' % output, output)
+
+    for kind in parts:
+        for part in parts[kind]:
+            os.remove(part)
+    return True
+
+
+def merge_jobs(jobs):
+    ''' merge() the seasons of the run_native `jobs`, once they have run. '''
+    for path, year, csvpath in sorted(set((job[2], job[1][0], job[3]) for job in jobs)):
+        merge(path, year, csvpath)
+
+
+def compare(native, chadwick, fields):
+    ''' Count the differing values per field between two csv files. '''
+    mismatches = dict((f, 0) for f in fields)
+    rows = 0
+    for a, b in zip(csv.reader(open(native)), csv.reader(open(chadwick))):
+        rows += 1
+        for f, x, y in zip(fields, a, b):
+            if x.strip() != y.strip():
+                mismatches[f] += 1
+    return rows, mismatches
+
+
+CHADWICK = {'events': ('cwevent', ['-f', '0-96', '-x', '0-62'], EVENT_FIELDS),
+            'games': ('cwgame', ['-f', '0-83'], GAME_FIELDS)}
+
+
+def chadwick_csv(path, year, chadwick, kind, output):
+    ''' Write the cwevent or cwgame (`kind` 'events' or 'games') output for
+    the event files of `year` to `output`. Returns the exit code. '''
+    binary, args, fields = CHADWICK[kind]
+    season = archives.Season(path, year)
+    out = open(output, 'w')
+    try:
+        with archives.directory(season.location()) as cwd:
+            return subprocess.call(['%s/%s' % (chadwick, binary), '-q', '-n'] + args + ['-y', str(year)] + season.event_files(),
+                                   stdout=out, cwd=cwd)
+    finally:
+        out.close()
+
+
+def benchmark(path, years, chadwick, num_workers):
+    ''' Time the native parser against cwevent/cwgame on the same files and
+    report the fields on which their output differs.
+    '''
+    outdir = '%s/benchmark' % path
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    jobs = [job for y in years for job in file_jobs(path, y, outdir)]
+    start = time.time()
+    pool = multiprocessing.Pool(num_workers)
+    pool.map(run_native, jobs)
+    pool.close()
+    pool.join()
+    merge_jobs(jobs)
+    print 'native parser %.2fs' % (time.time() - start)
+
+    if not chadwick:
+        return
+
+    for kind in ('events', 'games'):
+        binary, args, fields = CHADWICK[kind]
+        start = time.time()
+        for y in years:
+            chadwick_csv(path, y, chadwick, kind, '%s/chadwick-%s-%d.csv' % (outdir, kind, y))
+        print '%s: %s %.2fs (one process)' % (kind, binary, time.time() - start)
+
+        for y in years:
+            rows, mismatches = compare('%s/%s-%d.csv' % (outdir, kind, y),
+                                       '%s/chadwick-%s-%d.csv' % (outdir, kind, y), fields)
+            print '%s %d: %d rows compared' % (kind, y, rows)
+            for f in fields:
+                if mismatches[f]:
+                    print '   %-28s %d differences' % (f, mismatches[f])
+
+
+def main():
+    opts, args = getopt.getopt(sys.argv[1:], 'by:c:w:')
+    opts = dict(opts)
+    path = os.path.abspath(args[0] if args else '.')
+    years = [int(y) for y in opts['-y'].split(',')] if '-y' in opts else sorted(archives.seasons(path))
+    num_workers = int(opts.get('-w', multiprocessing.cpu_count()))
+
+    if '-b' in opts:
+        benchmark(path, years, opts.get('-c'), num_workers)
+        return
+
+    csvpath = '%s/csv' % path
+    if not os.path.exists(csvpath):
+        os.makedirs(csvpath)
+    jobs = [job for year in years for job in file_jobs(path, year, csvpath)]
+    pool = multiprocessing.Pool(num_workers)
+    for name, code in pool.imap_unordered(run_native, jobs):
+        print '%s %s' % (name, 'done' if code == 0 else 'failed')
+    pool.close()
+    pool.join()
+    merge_jobs(jobs)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,52 +1,444 @@
-import urllib
+import urllib2
+import urlparse
+import httplib
+import socket
+import random
 import os
+import re
+import json
+import time
+import hashlib
 import threading
-import Queue
 import zipfile
+from classes import timing
+
+TIMEOUT = 60 # seconds without data before a download is retried
+REDIRECTS = 5
+
+
+class Response(object):
+    ''' A response of HttpClient.open, read like the urllib2 ones. Closing
+    it frees its concurrency slot, and puts its connection back for the
+    next request of the thread unless the body was left unread. '''
+
+    def __init__(self, client, key, conn, response):
+        self.client = client
+        self.key = key
+        self.conn = conn
+        self.response = response
+        self.closed = False
+
+    def read(self, size=-1):
+        return self.response.read() if size < 0 else self.response.read(size)
+
+    def getcode(self):
+        return self.response.status
+
+    def info(self):
+        return self.response.msg
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if not self.response.isclosed() or self.response.will_close:
+            self.response.close()
+            self.client.drop(self.key)
+        self.client.slots.release()
+
+
+class HttpClient(object):
+    ''' HTTP client shared by the Fetcher threads. Every thread keeps its
+    connections alive, one per host, instead of connecting for every file.
+    At most `concurrency` requests are in flight across all threads, and no
+    more than `rate` requests per second are started per host (no limit
+    when 0). '''
+
+    def __init__(self, concurrency, rate=0):
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_start = {}
+        self.local = threading.local()
+
+    def wait_turn(self, host):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_start.get(host, 0))
+            self.next_start[host] = start + 1.0 / self.rate
+        time.sleep(max(0, start - now))
+
+    def connections(self):
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        return self.local.connections
+
+    def connect(self, key):
+        conns = self.connections()
+        if key not in conns:
+            scheme, host = key
+            conns[key] = (httplib.HTTPSConnection if scheme == 'https' else httplib.HTTPConnection)(host, timeout=TIMEOUT)
+        return conns[key]
+
+    def drop(self, key):
+        conn = self.connections().pop(key, None)
+        if conn:
+            conn.close()
+
+    def request(self, key, path, headers):
+        ''' Send a GET over the thread's connection to `key`, once more over
+        a new connection if the kept alive one turns out to be closed. '''
+        for attempt in range(2):
+            reused = key in self.connections()
+            conn = self.connect(key)
+            try:
+                conn.request('GET', path, headers=headers)
+                return conn, conn.getresponse()
+            except (httplib.BadStatusLine, httplib.CannotSendRequest, socket.error):
+                self.drop(key)
+                if not reused or attempt:
+                    raise
+
+    def open(self, url, headers=None):
+        ''' GET `url`, following redirects. Raises urllib2.HTTPError for
+        other answers than 200 and 206, like urllib2.urlopen. '''
+        headers = dict(headers or {})
+        for redirect in range(REDIRECTS + 1):
+            parts = urlparse.urlsplit(url)
+            key = (parts.scheme, parts.netloc)
+            path = parts.path + ('?' + parts.query if parts.query else '')
+
+            self.wait_turn(parts.netloc)
+            self.slots.acquire()
+            try:
+                conn, response = self.request(key, path, headers)
+            except:
+                self.slots.release()
+                raise
+            result = Response(self, key, conn, response)
+
+            if response.status in (200, 206):
+                return result
+
+            body = response.read()
+            result.close()
+            if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                url = urlparse.urljoin(url, response.getheader('Location'))
+                continue
+            raise urllib2.HTTPError(url, response.status, response.reason, response.msg, None)
+
+        raise urllib2.HTTPError(url, response.status, 'too many redirects', response.msg, None)
+
+    def read(self, url):
+        ''' The body of the page at `url`. '''
+        response = self.open(url)
+        try:
+            return response.read()
+        finally:
+            response.close()
+
+class DownloadCache(object):
+    ''' The ETag, Last-Modified, sha1 and extracted files of every archive
+    downloaded, kept in a json file in the download directory and shared by
+    the Fetcher threads. Archives whose files are all still there are
+    requested conditionally, and those that did not change are neither
+    downloaded again (when the server answers 304) nor extracted.
+    '''
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+        self.changed = []
+        try:
+            self.entries = json.load(open(file))
+        except (IOError, ValueError):
+            self.entries = {}
+
+    def headers(self, url, path):
+        ''' Conditional request headers for `url`, if its files are in `path`. '''
+        entry = self.entries.get(url)
+        if not entry or not all(os.path.isfile('%s/%s' % (path, name)) for name in entry['files']):
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def unchanged(self, url, sha1, path):
+        ''' Whether the archive downloaded from `url` is the one extracted
+        into `path` last time. '''
+        entry = self.entries.get(url)
+        return bool(entry) and entry['sha1'] == sha1 and \
+            all(os.path.isfile('%s/%s' % (path, name)) for name in entry['files'])
+
+    def files(self, url):
+        ''' The files recorded for `url` last time. '''
+        entry = self.entries.get(url)
+        return entry['files'] if entry else []
+
+    def update(self, url, entry):
+        with self.lock:
+            self.entries[url] = entry
+            self.changed.append(os.path.basename(url))
+
+    def revalidate(self, url, info):
+        ''' Record the ETag and Last-Modified of an unchanged download of
+        `url`, so the next run requests it conditionally against them instead
+        of the stale ones. Its season did not change. '''
+        with self.lock:
+            self.entries[url].update({'etag': info.getheader('ETag'), 'last_modified': info.getheader('Last-Modified')})
+
+    def seasons(self):
+        ''' The seasons of the archives that changed in this run. '''
+        years = set()
+        for name in self.changed:
+            m = re.search(r'(\d{4})', name)
+            if m:
+                years.add(int(m.group(1)))
+        return sorted(years)
+
+    def save(self):
+        ''' Write the cache atomically, so an interrupted run keeps the
+        previous version. '''
+        tmp = '%s.tmp' % self.file
+        with self.lock:
+            fp = open(tmp, 'w')
+            try:
+                json.dump(self.entries, fp, indent=2, sort_keys=True, separators=(',', ': '))
+            finally:
+                fp.close()
+            os.rename(tmp, self.file)
+
+
+def retryable(error):
+    ''' Whether a download that failed with `error` is worth another try:
+    server errors, rate limiting, dropped connections and corrupt archives,
+    but not missing files. '''
+    if isinstance(error, urllib2.HTTPError):
+        return error.code in (408, 429) or error.code >= 500
+    return isinstance(error, (urllib2.URLError, httplib.HTTPException, socket.error, IOError, zipfile.BadZipfile))
+
+
+def file_sha1(file):
+    sha1 = hashlib.sha1()
+    fp = open(file, 'rb')
+    try:
+        for block in iter(lambda: fp.read(65536), ''):
+            sha1.update(block)
+    finally:
+        fp.close()
+    return sha1.hexdigest()
+
+
+def intact(file):
+    ''' Whether the zip `file` reads back with matching checksums. '''
+    if not zipfile.is_zipfile(file):
+        return False
+    zip = zipfile.ZipFile(file, "r")
+    try:
+        return zip.testzip() is None
+    except Exception:
+        return False
+    finally:
+        zip.close()
+
 
 class Fetcher(threading.Thread):
 
-    def __init__(self, queue, path, options):
+    def __init__(self, queue, path, options, cache=None, failures=None, client=None, extractor=None, done=None):
         threading.Thread.__init__(self)
         self.queue = queue
         self.path = path
         self.options = options
+        self.cache = cache
+        self.failures = failures if failures is not None else []
+        self.client = client or HttpClient(1)
+        self.extractor = extractor # pool to extract archives on, or None
+        self.done = done # queue of the urls whose files are in place, or None
 
     def run(self):
-    
+
         # loop
         while 1:
-        
-            # grab something from the queue
-            # exit if queue empty
+
+            # grab something from the queue, which is filled while the
+            # threads run
+            # exit on None, queued once per thread after the last url
+            url = self.queue.get()
+            if url is None:
+                break
+
+            # a failed file must not take the thread, and the rest of its
+            # share of the queue, down with it
             try:
-                url = self.queue.get_nowait()
-            except Queue.Empty:
+                timing.profiled('download', os.path.basename(url), self.fetch, url)
+            except Exception, e:
+                print "Failed to fetch %s: %s" % (url, e)
+                self.failures.append((url, str(e)))
+
+    def finished(self, url):
+        ''' Pass `url` on to the next stage, once its files are in place. '''
+        if self.done is not None:
+            self.done.put(url)
+
+    def fetch(self, url):
+
+        # extract file name from url
+        filename = os.path.basename(url)
+
+        # log
+        if(self.options['verbose']):
+            print "Fetching " + filename
+
+        # determine the local path
+        f = "%s/%s" % (self.path, filename)
+
+        # save file, unless it did not change since the cached download,
+        # retrying with exponential backoff and jitter
+        retries = self.options.get('retries', 5)
+        for attempt in range(retries + 1):
+            try:
+                result = self.download(url, f)
                 break
+            except Exception, e:
+                if attempt == retries or not retryable(e):
+                    raise
+                delay = random.uniform(0, self.options.get('backoff', 1.0) * 2 ** attempt)
+                print "Fetching %s failed (%s), retrying in %.1fs" % (filename, e, delay)
+                time.sleep(delay)
+
+        if result is None:
+            if(self.options['verbose']):
+                print "Not modified: " + filename
+            self.finished(url)
+            return
+        sha1, info = result
+
+        if self.cache and self.cache.unchanged(url, sha1, self.path):
+            if(self.options['verbose']):
+                print "Unchanged: " + filename
+            self.cache.revalidate(url, info)
+            if zipfile.is_zipfile(f) and self.options.get('extract', True):
+                os.remove(f)
+            self.finished(url)
+            return
+
+        # unzip on the extraction pool, so this thread moves on to the next
+        # download right away
+        if self.extractor:
+            self.extractor.apply_async(self.extract_safely, (url, f, sha1, info))
+        else:
+            self.extract(url, f, sha1, info)
+
+    def extract_safely(self, url, f, sha1, info):
+        try:
+            self.extract(url, f, sha1, info)
+        except Exception, e:
+            print "Failed to extract %s: %s" % (os.path.basename(f), e)
+            self.failures.append((url, str(e)))
 
-            # extract file name from url
-            filename = os.path.basename(url)
+    def extract(self, url, f, sha1, info):
+        ''' Extract the downloaded file `f`, if it is a zip file and archives
+        are extracted, and record it in the cache. '''
+        filename = os.path.basename(f)
 
-            # log
+        # is this a zip file?
+        files = [filename]
+        if not self.options.get('extract', True):
+
+            # keep the archive, and drop the files extracted from an older
+            # version of it, which would be read instead
+            if self.cache:
+                for name in self.cache.files(url):
+                    if name != filename and os.path.isfile('%s/%s' % (self.path, name)):
+                        os.remove('%s/%s' % (self.path, name))
+
+        elif (zipfile.is_zipfile(f)):
+
+            #log
             if(self.options['verbose']):
-                print "Fetching " + filename
-
-            # determine the local path
-            f = "%s/%s" % (self.path, filename)
-            
-            # save file
-            urllib.urlretrieve(url, f)
-
-            # is this a zip file?
-            if (zipfile.is_zipfile(f)):
-            
-                #log
-                if(self.options['verbose']):
-                    print "Zip file detected. Extracting " + filename
-                
-                # extract the zip file
+                print "Zip file detected. Extracting " + filename
+
+            # extract the zip file
+            with timing.timed('extract', filename) as counts:
                 zip = zipfile.ZipFile(f, "r")
                 zip.extractall(self.path)
+                files = [name for name in zip.namelist() if not name.endswith('/')]
+                counts['bytes'] = sum(info.file_size for info in zip.infolist())
+                zip.close()
+
+            # remove the zip file
+            os.remove(f)
+
+        if self.cache:
+            self.cache.update(url, {'etag': info.getheader('ETag'), 'last_modified': info.getheader('Last-Modified'),
+                                    'sha1': sha1, 'files': files})
+        self.finished(url)
+
+    def download(self, url, f):
+        ''' Stream `url` into `f`.part, resuming a part left by an earlier
+        attempt with a Range request when the server validates it (If-Range),
+        and rename it to `f` once it is complete and, for zip files, intact.
+        Returns the sha1 and headers of the file, or None if the server
+        answered that the cached download is current. '''
+        part = '%s.part' % f
+        meta = '%s.json' % part
+
+        headers = self.cache.headers(url, self.path) if self.cache else {}
+        offset = 0
+        try:
+            validator = json.load(open(meta))
+        except (IOError, ValueError):
+            validator = {}
+        if os.path.isfile(part) and validator.get('url') == url and (validator.get('etag') or validator.get('last_modified')):
+            offset = os.path.getsize(part)
+            headers = {'Range': 'bytes=%d-' % offset, 'If-Range': validator.get('etag') or validator.get('last_modified')}
+
+        start = time.time()
+        try:
+            response = self.client.open(url, headers)
+        except urllib2.HTTPError, e:
+            if e.code == 304:
+                timing.record('download', os.path.basename(f), time.time() - start, bytes=0, status=304)
+                return None
+            if e.code == 416 and offset:
+                # the part is no prefix of the file, e.g. complete already
+                # but not renamed: start over from the first byte
+                os.remove(part)
+                os.remove(meta)
+                return self.download(url, f)
+            raise
+
+        info = response.info()
+        if response.getcode() != 206:
+            offset = 0 # the whole file: no range support, or it changed
+        with open(meta, 'w') as fp:
+            json.dump({'url': url, 'etag': info.getheader('ETag'), 'last_modified': info.getheader('Last-Modified')}, fp)
+
+        received = 0
+        out = open(part, 'ab' if offset else 'wb')
+        try:
+            for block in iter(lambda: response.read(65536), ''):
+                out.write(block)
+                received += len(block)
+        finally:
+            out.close()
+            response.close()
+        timing.record('download', os.path.basename(f), time.time() - start, bytes=received, status=response.getcode())
+
+        length = info.getheader('Content-Length')
+        if length and received != int(length):
+            raise IOError('incomplete download, %d of %s bytes' % (offset + received, offset + int(length)))
+
+        if f.endswith('.zip') and not intact(part):
+            os.remove(part)
+            raise zipfile.BadZipfile('corrupt archive %s' % os.path.basename(f))
 
-                # remove the zip file
-                os.remove(f)
\ No newline at end of file
+        os.rename(part, f)
+        os.remove(meta)
+        return file_sha1(f), info
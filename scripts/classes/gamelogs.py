@@ -0,0 +1,98 @@
+'''
+Reader for Retrosheet game logs (GLyyyy.TXT), one line and 161 fields per
+game, as described in http://www.retrosheet.org/gamelogs/glfields.txt
+
+iter_gamelog() yields one tuple per game with the fields in GAMELOG_FIELDS
+order: counts are ints, and fields left blank in the file (unknown
+attendance, no save, ...) are None.
+'''
+
+import os
+import re
+import csv
+import glob
+
+
+def team_fields(team):
+    ''' Fields 22-49 (visiting team) or 50-77 (home team). '''
+    offense = ['AB', 'H', '2B', '3B', 'HR', 'RBI', 'SH', 'SF', 'HP', 'BB', 'IBB', 'SO', 'SB', 'CS', 'GDP', 'XI', 'LOB']
+    pitching = ['PIT', 'ER', 'TER', 'WP', 'BK']
+    defense = ['PO', 'A', 'E', 'PB', 'DP', 'TP']
+    return ['%s_%s_CT' % (team, stat) for stat in offense + pitching + defense]
+
+
+def people_fields(prefixes):
+    ''' ID and name fields of umpires, managers and pitchers. '''
+    fields = []
+    for prefix in prefixes:
+        fields.extend(['%s_ID' % prefix, '%s_NAME_TX' % prefix])
+    return fields
+
+
+def lineup_fields(team):
+    ''' Fields 106-132 (visiting team) or 133-159 (home team). '''
+    fields = []
+    for slot in range(1, 10):
+        fields.extend(['%s_LINEUP%d_BAT_ID' % (team, slot),
+                       '%s_LINEUP%d_BAT_NAME_TX' % (team, slot),
+                       '%s_LINEUP%d_FLD_CD' % (team, slot)])
+    return fields
+
+
+GAMELOG_FIELDS = [
+    'GAME_DT', 'GAME_CT', 'GAME_DY', 'AWAY_TEAM_ID', 'AWAY_TEAM_LEAGUE_ID',
+    'AWAY_TEAM_GAME_CT', 'HOME_TEAM_ID', 'HOME_TEAM_LEAGUE_ID',
+    'HOME_TEAM_GAME_CT', 'AWAY_SCORE_CT', 'HOME_SCORE_CT', 'LENGTH_OUTS_CT',
+    'DAYNIGHT_PARK_CD', 'COMPLETION_TX', 'FORFEIT_TX', 'PROTEST_TX', 'PARK_ID',
+    'ATTEND_PARK_CT', 'MINUTES_GAME_CT', 'AWAY_LINESCORE_TX',
+    'HOME_LINESCORE_TX'] + \
+    team_fields('AWAY') + team_fields('HOME') + \
+    people_fields(['UMP_HOME', 'UMP_1B', 'UMP_2B', 'UMP_3B', 'UMP_LF', 'UMP_RF',
+                   'AWAY_MANAGER', 'HOME_MANAGER', 'WIN_PIT', 'LOSE_PIT',
+                   'SAVE_PIT', 'GWRBI_BAT', 'AWAY_START_PIT', 'HOME_START_PIT']) + \
+    lineup_fields('AWAY') + lineup_fields('HOME') + \
+    ['ADDITIONAL_INFO_TX', 'ACQUISITION_INFO_TX']
+
+INT_FIELDS = frozenset(['GAME_DT', 'AWAY_TEAM_GAME_CT', 'HOME_TEAM_GAME_CT',
+                        'AWAY_SCORE_CT', 'HOME_SCORE_CT', 'LENGTH_OUTS_CT',
+                        'ATTEND_PARK_CT', 'MINUTES_GAME_CT'] +
+                       team_fields('AWAY') + team_fields('HOME') +
+                       ['%s_LINEUP%d_FLD_CD' % (team, slot) for team in ('AWAY', 'HOME') for slot in range(1, 10)])
+
+INT_MASK = [f in INT_FIELDS for f in GAMELOG_FIELDS]
+
+
+def convert(row):
+    values = []
+    for value, is_int in zip(row, INT_MASK):
+        value = value.strip()
+        if not value:
+            values.append(None)
+        elif is_int:
+            try:
+                values.append(int(value))
+            except ValueError:
+                values.append(None)
+        else:
+            values.append(value)
+    return tuple(values)
+
+
+def iter_gamelog(fp):
+    ''' Yield the games of the game log read from the file object `fp`. '''
+    for row in csv.reader(fp):
+        if len(row) != len(GAMELOG_FIELDS):
+            continue
+        yield convert(row)
+
+
+def gamelog_files(path, years=None):
+    ''' Map the seasons of the game logs in `path` to their file names,
+    optionally only for `years`. The gl<yyyy>.zip archive of a season is
+    used when its text file was not extracted. '''
+    files = {}
+    for file in glob.glob('%s/gl*.zip' % path) + glob.glob('%s/GL*.TXT' % path) + glob.glob('%s/gl*.txt' % path):
+        m = re.match(r'gl(\d{4})\.(txt|zip)$', os.path.basename(file), re.I)
+        if m and (not years or int(m.group(1)) in years):
+            files[int(m.group(1))] = file
+    return files
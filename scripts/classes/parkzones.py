@@ -0,0 +1,85 @@
+'''
+Time zones of the ballparks, for the UTC times of the Value Added variables.
+
+The time zone of every park in external_data/seamheads_parks.json is kept in
+external_data/seamheads_parks_tz.json, so computeValueAdded does not have to
+load tzwhere's shape database (slow, and hundreds of MB) to look them up
+again on every run. Rebuild it with tzwhere after the parks file changes:
+
+   python classes/parkzones.py [-p parks.json] [-o zones.json]
+
+ParkZones reads the table and caches the UTC offset of each park and date,
+so pytz is asked once per park and day instead of once per event.
+'''
+
+import os
+import sys
+import json
+import getopt
+import datetime
+import pytz
+
+PARKS_FILE = 'external_data/seamheads_parks.json'
+ZONES_FILE = 'external_data/seamheads_parks_tz.json'
+
+
+class ParkZones(object):
+    ''' The time zones of the parks in the table `ifile`, with the UTC
+    offsets of the dates asked for so far. '''
+
+    def __init__(self, ifile=ZONES_FILE):
+        self.zones = json.load(open(ifile, 'r'))
+        self.offsets = {}
+
+    def zone(self, park):
+        return self.zones[park]
+
+    def offset(self, park, date):
+        ''' The UTC offset (a timedelta) of `park` on `date`. Daylight saving
+        changes in the early morning, so the offset at noon holds for every
+        game of the day. '''
+        key = (park, date)
+        if not key in self.offsets:
+            tzi = pytz.timezone(self.zones[park])
+            noon = datetime.datetime(date.year, date.month, date.day, 12)
+            self.offsets[key] = tzi.localize(noon).utcoffset()
+        return self.offsets[key]
+
+    def utc(self, park, when):
+        ''' The naive UTC datetime of the local time `when` at `park`. '''
+        return when - self.offset(park, when.date())
+
+
+def build(parks):
+    ''' Look up the time zone of every park in `parks` (seamheads parks data)
+    from its latitude and longitude with tzwhere. Parks on the shore that fall
+    just outside the zone shapes get the nearest zone. '''
+    from tzwhere import tzwhere
+
+    tzw = tzwhere.tzwhere(forceTZ=True)
+    zones = {}
+    for park, info in parks.items():
+        lat, lon = float(info['Latitude']), float(info['Longitude'])
+        zones[park] = tzw.tzNameAt(lat, lon) or tzw.tzNameAt(lat, lon, forceTZ=True)
+    return zones
+
+
+def main():
+    opts, args = getopt.getopt(sys.argv[1:], 'p:o:')
+    opts = dict(opts)
+    ofile = opts.get('-o', ZONES_FILE)
+
+    zones = build(json.load(open(opts.get('-p', PARKS_FILE), 'r')))
+    missing = sorted(park for park, zone in zones.items() if zone is None)
+    if missing:
+        print 'no time zone found for', ', '.join(missing)
+        raise SystemExit(1)
+
+    with open(ofile + '.tmp', 'w') as fp:
+        json.dump(zones, fp, indent=2, sort_keys=True, separators=(',', ': '))
+    os.rename(ofile + '.tmp', ofile)
+    print 'wrote the time zones of %d parks to %s' % (len(zones), ofile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+'''
+Altitude and azimuth of the sun for arrays of times and places, in place of
+one PyEphem Sun.compute per event.
+
+position() follows the low precision solar coordinates of Meeus
+(Astronomical Algorithms, ch. 25) with nutation and aberration, the apparent
+sidereal time, the solar parallax and the refraction model of PyEphem's
+libastro (refract.c), all as numpy array operations. Over 1900-2100 it
+agrees with PyEphem's Sun seen from an Observer at the same place and time
+to within TOLERANCE degrees, in altitude and in azimuth along the sky (the
+azimuth difference times the cosine of the altitude, as the azimuth itself
+is undefined at the zenith). The largest differences are near the horizon,
+where refraction magnifies them; a minute of game time moves the sun by
+0.25 degrees. Run this file to check on random times and places:
+
+   python classes/solar.py [-n samples]
+'''
+
+import sys
+import getopt
+import calendar
+import datetime
+import numpy as np
+
+TOLERANCE = 0.02 # degrees
+
+# PyEphem's default atmosphere
+PRESSURE = 1010.0 # mbar
+TEMPERATURE = 15.0 # degrees C
+
+J2000 = 2451545.0
+UNIX_EPOCH_JD = 2440587.5
+PARALLAX = 8.794 / 3600 # equatorial horizontal parallax of the sun, degrees
+
+
+def unix_seconds(when):
+    ''' Seconds since 1970-01-01 UTC of the datetime `when`, which is UTC
+    when it has no time zone. '''
+    return calendar.timegm(when.utctimetuple()) + when.microsecond / 1e6
+
+
+def equatorial(jd):
+    ''' Apparent right ascension and declination of the sun, and the
+    apparent sidereal time at Greenwich, in radians, at the julian dates
+    `jd`. '''
+    d = jd - J2000
+    t = d / 36525.0
+
+    l0 = 280.46646 + 36000.76983 * t + 0.0003032 * t**2
+    m = np.radians(357.52911 + 35999.05029 * t - 0.0001537 * t**2)
+    c = (1.914602 - 0.004817 * t - 0.000014 * t**2) * np.sin(m) + \
+        (0.019993 - 0.000101 * t) * np.sin(2 * m) + 0.000289 * np.sin(3 * m)
+    omega = np.radians(125.04 - 1934.136 * t)
+    lam = np.radians(l0 + c - 0.00569 - 0.00478 * np.sin(omega))
+
+    eps0 = 23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - 0.001813 * t))) / 60) / 60
+    eps = np.radians(eps0 + 0.00256 * np.cos(omega))
+
+    ra = np.arctan2(np.cos(eps) * np.sin(lam), np.cos(lam))
+    dec = np.arcsin(np.sin(eps) * np.sin(lam))
+
+    gmst = 280.46061837 + 360.98564736629 * d + 0.000387933 * t**2 - t**3 / 38710000.0
+    nutation = -0.004778 * np.sin(omega) # in longitude, degrees
+    gast = np.radians(gmst + nutation * np.cos(eps))
+    return ra, dec, gast
+
+
+def unrefract(aa, pressure, temperature):
+    ''' True altitude of the apparent altitudes `aa`, both in degrees, as
+    libastro's unrefract computes it. '''
+    low = np.clip(aa, -90, 15.5)
+    a = ((2e-5 * low + 1.96e-2) * low + 1.594e-1) * pressure
+    b = (273 + temperature) * ((8.45e-2 * low + 5.05e-1) * low + 1)
+    r = a / b
+    lt15 = np.where((aa < 0) & (r < 0), aa, aa - r)
+
+    high = np.clip(aa, 14.5, 90)
+    ge15 = aa - np.degrees(7.888888e-5 * pressure / ((273 + temperature) * np.tan(np.radians(high))))
+
+    blend = np.clip((aa - 14.5) / (15.5 - 14.5), 0, 1)
+    return lt15 + (ge15 - lt15) * blend
+
+
+def refract(ta, pressure, temperature, iterations=20):
+    ''' Apparent altitude of the true altitudes `ta`, in degrees, found with
+    the secant method like libastro's refract, to 0.1 arcseconds. '''
+    t = unrefract(ta, pressure, temperature)
+    d = 0.8 * (ta - t)
+    t0 = t
+    a = ta.copy()
+    active = np.ones(ta.shape, bool)
+    for i in range(iterations):
+        a = np.where(active, a + d, a)
+        t = unrefract(a, pressure, temperature)
+        active &= np.abs(ta - t) > 0.1 / 3600
+        if not active.any():
+            break
+        step = t0 - t
+        d = np.where(active & (step != 0), d * -(ta - t) / np.where(step != 0, step, 1), 0)
+        t0 = t
+    return a
+
+
+def position(unix, lat, lon, pressure=PRESSURE, temperature=TEMPERATURE):
+    ''' Apparent altitude and azimuth (from north through east) of the sun
+    in degrees, at the UTC times `unix` (seconds since 1970-01-01) seen from
+    latitudes `lat` and longitudes `lon` (degrees, east positive). The
+    arguments broadcast against each other. Refraction is for `pressure`
+    (mbar) and `temperature` (C), PyEphem's defaults unless given; a
+    pressure of 0 leaves it out. '''
+    unix, lat, lon = np.broadcast_arrays(np.asarray(unix, float), np.asarray(lat, float), np.asarray(lon, float))
+    ra, dec, gast = equatorial(unix / 86400.0 + UNIX_EPOCH_JD)
+
+    phi = np.radians(lat)
+    h = gast + np.radians(lon) - ra
+    alt = np.degrees(np.arcsin(np.sin(phi) * np.sin(dec) + np.cos(phi) * np.cos(dec) * np.cos(h)))
+    az = np.degrees(np.arctan2(-np.cos(dec) * np.sin(h),
+                               np.sin(dec) * np.cos(phi) - np.cos(dec) * np.cos(h) * np.sin(phi))) % 360
+
+    alt = alt - PARALLAX * np.cos(np.radians(alt))
+    if pressure:
+        alt = refract(alt, pressure, temperature)
+    return alt, az
+
+
+def validate(samples=10000, seed=0):
+    ''' Compare position() with PyEphem on `samples` random times between
+    1900 and 2100 and places between latitudes -66 and 66. Returns the
+    largest altitude and azimuth (along the sky) differences, in degrees. '''
+    import ephem
+
+    rng = np.random.RandomState(seed)
+    start = unix_seconds(datetime.datetime(1900, 1, 1))
+    unix = rng.uniform(start, unix_seconds(datetime.datetime(2100, 1, 1)), samples)
+    lat = rng.uniform(-66, 66, samples)
+    lon = rng.uniform(-180, 180, samples)
+    alt, az = position(unix, lat, lon)
+
+    sun = ephem.Sun()
+    obs = ephem.Observer()
+    dalt = np.zeros(samples)
+    daz = np.zeros(samples)
+    for i in range(samples):
+        obs.lat = np.radians(lat[i])
+        obs.long = np.radians(lon[i])
+        obs.date = datetime.datetime.utcfromtimestamp(0) + datetime.timedelta(seconds=unix[i])
+        sun.compute(obs)
+        dalt[i] = abs(np.degrees(float(sun.alt)) - alt[i])
+        daz[i] = abs((np.degrees(float(sun.az)) - az[i] + 180) % 360 - 180) * np.cos(float(sun.alt))
+    return dalt.max(), daz.max()
+
+
+def main():
+    opts, args = getopt.getopt(sys.argv[1:], 'n:')
+    opts = dict(opts)
+    dalt, daz = validate(int(opts.get('-n', 10000)))
+    print 'largest difference from PyEphem: altitude %.5f, azimuth %.5f degrees (tolerance %g)' % (dalt, daz, TOLERANCE)
+    if max(dalt, daz) > TOLERANCE:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+'''
+Synthetic Retrosheet data for benchmarks: event files (.EVA/.EVN), roster
+files (.ROS) and TEAM files in the real formats, for any number of seasons,
+teams and games.
+
+The games are random but valid: every plate appearance is one of a handful
+of outcomes (strikeout, ground out, fly out, walk, single, double, home run)
+with explicit runner advances, so both cwevent/cwgame and
+eventparser.py read them. The same seed always writes the same files, and
+the parks come from external_data/seamheads_parks.json so that
+retrosheet_sql_tools.computeValueAdded can place them.
+'''
+
+import os
+import json
+import random
+import datetime
+
+# event, weight, bases the batter reaches (0 = out), count, pitches
+OUTCOMES = [('K', 20, 0, '02', 'CSS'), ('63/G', 20, 0, '00', 'X'), ('8/F', 24, 0, '10', 'BX'),
+            ('W', 9, 1, '30', 'BBBB'), ('S8/G', 16, 1, '01', 'CX'), ('D7/L', 6, 2, '00', 'X'),
+            ('HR/F78', 5, 4, '11', 'BCX')]
+
+POSITIONS = [6, 4, 8, 3, 9, 5, 7, 2, 10] # batting order, 10 = designated hitter
+
+TOTAL_WEIGHT = sum(o[1] for o in OUTCOMES)
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def team_ids(teams):
+    ''' Ids of letters only, e.g. TAB: the year of a roster file such as
+    TAB2013.ROS is read from its digits. '''
+    return ['T%s%s' % (LETTERS[i // 26], LETTERS[i % 26]) for i in range(teams)]
+
+
+def league(team):
+    return 'A' if LETTERS.index(team[2]) % 2 == 0 else 'N'
+
+
+def players(team):
+    ''' The 9 hitters and 5 starting pitchers of `team`, as (id, first, last,
+    bats, throws, position) tuples. '''
+    people = []
+    for i in range(14):
+        pid = '%sp%04d' % (team.lower(), i)
+        hand = 'LRB'[i % 3] if i < 9 else 'LR'[i % 2]
+        people.append((pid, 'First%d' % i, 'Last%s' % team, hand, 'R' if i < 9 else hand, 'P' if i >= 9 else 'X'))
+    return people
+
+
+def schedule(rng, teams, games):
+    ''' Pair up `teams` for `games` days, returning (day, away, home) tuples. '''
+    pairs = []
+    for day in range(games):
+        order = list(teams)
+        rng.shuffle(order)
+        for i in range(0, len(order) - 1, 2):
+            pairs.append((day, order[i], order[i + 1]))
+    return pairs
+
+
+def advance(bases, reached, forced=False):
+    ''' Move the runners `reached` bases ahead, or only those `forced` by a
+    walk. Returns the new bases (list of 3 runner ids or None), the advance
+    notation and the runs scored. '''
+    new = [None, None, None]
+    moves = []
+    runs = 0
+    for base in (2, 1, 0):
+        runner = bases[base]
+        if runner is None:
+            continue
+        if forced and not all(bases[:base]):
+            target = base
+        else:
+            target = base + reached
+        if target == base:
+            new[base] = runner
+            continue
+        if target >= 3:
+            runs += 1
+            moves.append('%d-H' % (base + 1))
+        else:
+            new[target] = runner
+            moves.append('%d-%d' % (base + 1, target + 1))
+    return new, moves, runs
+
+
+def play_lines(rng, inning, half, lineup, slot):
+    ''' Simulate a half inning. Returns the play records, the runs scored and
+    the next batting order slot. '''
+    lines = []
+    outs = runs = 0
+    bases = [None, None, None]
+    while outs < 3:
+        pick = rng.uniform(0, TOTAL_WEIGHT)
+        for text, weight, reached, count, pitches in OUTCOMES:
+            pick -= weight
+            if pick <= 0:
+                break
+
+        batter = lineup[slot]
+        moves = []
+        if reached == 0:
+            outs += 1
+        elif reached == 4:
+            bases, moves, scored = advance(bases, 3)
+            runs += scored + 1
+        else:
+            bases, moves, scored = advance(bases, reached, text == 'W')
+            bases[reached - 1] = batter
+            runs += scored
+
+        event = text + ('.' + ';'.join(moves) if moves else '')
+        lines.append('play,%d,%d,%s,%s,%s,%s' % (inning, half, batter, count, pitches, event))
+        slot = (slot + 1) % 9
+    return lines, runs, slot
+
+
+def game_lines(rng, game_id, away, home, date, number, park):
+    ''' The records of one game, lineups included. '''
+    lineups = {}
+    lines = ['id,%s' % game_id, 'version,2',
+             'info,visteam,%s' % away, 'info,hometeam,%s' % home,
+             'info,site,%s' % park, 'info,date,%s' % date.strftime('%Y/%m/%d'),
+             'info,number,0', 'info,starttime,%d:%02dPM' % (rng.choice([1, 7]), rng.choice([5, 10, 35])),
+             'info,daynight,night', 'info,usedh,true',
+             'info,timeofgame,%d' % rng.randint(140, 220), 'info,attendance,%d' % rng.randint(10000, 50000)]
+
+    for side, team in enumerate([away, home]):
+        people = players(team)
+        hitters = people[:9]
+        pitcher = people[9 + number % 5]
+        lineups[side] = [p[0] for p in hitters]
+        for slot, (p, pos) in enumerate(zip(hitters, POSITIONS)):
+            lines.append('start,%s,"%s %s",%d,%d,%d' % (p[0], p[1], p[2], side, slot + 1, pos))
+        lines.append('start,%s,"%s %s",%d,0,1' % (pitcher[0], pitcher[1], pitcher[2], side))
+
+    score = [0, 0]
+    slots = [0, 0]
+    inning = 1
+    while True:
+        for half in (0, 1):
+            if half == 1 and inning >= 9 and score[1] > score[0]:
+                break
+            plays, runs, slots[half] = play_lines(rng, inning, half, lineups[half], slots[half])
+            lines.extend(plays)
+            score[half] += runs
+        if inning >= 9 and score[0] != score[1]:
+            break
+        inning += 1
+    return lines
+
+
+def write_season(path, year, teams=30, games=162, seed=0):
+    ''' Write the event, roster and TEAM files of a synthetic `year` into the
+    directory `path`, with `teams` teams playing `games` games each. Returns
+    the number of games written. '''
+    rng = random.Random('%s-%s' % (seed, year))
+    ids = team_ids(teams)
+    parks = sorted(json.load(open(os.path.join(os.path.dirname(__file__), '..', 'external_data', 'seamheads_parks.json'))))
+    home_park = dict((team, parks[i % len(parks)]) for i, team in enumerate(ids))
+
+    with open('%s/TEAM%d' % (path, year), 'w') as out:
+        for team in ids:
+            out.write('%s,%s,City%s,Club%s\n' % (team, league(team), team, team))
+
+    for team in ids:
+        with open('%s/%s%d.ROS' % (path, team, year), 'w') as out:
+            for pid, first, last, bats, throws, pos in players(team):
+                out.write('%s,%s,%s,%s,%s,%s,%s\n' % (pid, last, first, bats, throws, team, pos))
+
+    opening = datetime.date(year, 4, 1)
+    events = dict((team, []) for team in ids)
+    played = dict((team, 0) for team in ids)
+    pairs = schedule(rng, ids, games)
+    for day, away, home in pairs:
+        date = opening + datetime.timedelta(days=day)
+        game_id = '%s%s0' % (home, date.strftime('%Y%m%d'))
+        events[home].extend(game_lines(rng, game_id, away, home, date, played[home], home_park[home]))
+        played[home] += 1
+
+    for team in ids:
+        with open('%s/%d%s.EV%s' % (path, year, team, league(team)), 'w') as out:
+            out.write('\n'.join(events[team]) + '\n')
+
+    return len(pairs)
@@ -0,0 +1,121 @@
+'''
+Timing and throughput records for download.py, parse.py and
+retrosheet_sql_tools.py.
+
+Every timed step is recorded with the stage it belongs to ('download',
+'extract', 'convert', 'load', 'query', ...), a name (file, season or query),
+its wall time in seconds and optional counts such as bytes or rows. With
+`[debug] timing_log` set, the records are appended to that file as JSON lines
+as they happen, including those of worker processes. report() prints a
+summary per stage for the records of the current process.
+
+With `[debug] profile_dir` set, the steps run through profiled() are also run
+under cProfile and their stats dumped to <profile_dir>/<stage>-<name>.prof,
+for use with pstats or snakeviz.
+'''
+
+import os
+import re
+import sys
+import json
+import time
+import cProfile
+import threading
+import contextlib
+
+_lock = threading.Lock()
+_records = []
+_settings = {'log': None, 'profile': None}
+
+
+def configure(config):
+    ''' Read the log file and profile directory from the [debug] section of
+    `config`. Both are off when missing or empty. '''
+    for key, option in [('log', 'timing_log'), ('profile', 'profile_dir')]:
+        value = config.get('debug', option) if config.has_option('debug', option) else ''
+        _settings[key] = os.path.abspath(value) if value else None
+
+    if _settings['profile'] and not os.path.isdir(_settings['profile']):
+        os.makedirs(_settings['profile'])
+
+
+def record(stage, name, seconds, **counts):
+    ''' Record one step of `stage`. '''
+    entry = {'time': round(time.time(), 3), 'pid': os.getpid(), 'stage': stage,
+             'name': name, 'seconds': round(seconds, 4)}
+    entry.update(counts)
+
+    line = json.dumps(entry, sort_keys=True)
+    with _lock:
+        _records.append(entry)
+        if _settings['log']:
+            # a single write per line, so that lines of concurrent
+            # processes appending to the same file do not interleave
+            fd = os.open(_settings['log'], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+            try:
+                os.write(fd, line + '\n')
+            finally:
+                os.close(fd)
+
+
+@contextlib.contextmanager
+def timed(stage, name, **counts):
+    ''' Time the body of a with statement as one step of `stage`. The body
+    can add counts to the yielded dictionary, e.g. counts['rows'] = n. A step
+    that raises is recorded with its error. '''
+    counts = dict(counts)
+    start = time.time()
+    try:
+        yield counts
+    except Exception, e:
+        counts['error'] = str(e).strip()
+        raise
+    finally:
+        record(stage, name, time.time() - start, **counts)
+
+
+def profiled(stage, name, func, *args, **kwargs):
+    ''' Call func(*args, **kwargs), under cProfile when a profile directory
+    is configured. '''
+    if not _settings['profile']:
+        return func(*args, **kwargs)
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        file = re.sub(r'[^\w.-]+', '_', '%s-%s' % (stage, name))
+        profile.dump_stats('%s/%s.prof' % (_settings['profile'], file))
+
+
+def rate(amount, seconds):
+    return amount / max(seconds, 0.001)
+
+
+def report(out=sys.stdout):
+    ''' Print the steps, total seconds and throughput of every stage, and
+    its slowest step. '''
+    with _lock:
+        records = list(_records)
+    if not records:
+        return
+
+    stages = []
+    for entry in records:
+        if entry['stage'] not in stages:
+            stages.append(entry['stage'])
+
+    print >>out, 'stage        steps   seconds   throughput        slowest'
+    for stage in stages:
+        entries = [e for e in records if e['stage'] == stage]
+        seconds = sum(e['seconds'] for e in entries)
+        slowest = max(entries, key=lambda e: e['seconds'])
+
+        throughput = ''
+        if any('bytes' in e for e in entries):
+            throughput = '%.2f MB/s' % rate(sum(e.get('bytes', 0) for e in entries) / 1e6, seconds)
+        elif any('rows' in e for e in entries):
+            throughput = '%.0f rows/s' % rate(sum(e.get('rows', 0) for e in entries), seconds)
+
+        print >>out, ('%-10s %7d %9.1f   %-15s   %s (%.1fs)' % (stage, len(entries), seconds, throughput,
+                                                              slowest['name'][:60], slowest['seconds'])).rstrip()
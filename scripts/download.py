@@ -1,26 +1,34 @@
-import urllib
 import os
 import ConfigParser
 import Queue
 import re
 import getopt
 import sys
-from classes.fetcher import Fetcher
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from classes.fetcher import Fetcher, DownloadCache, HttpClient
+from classes import timing
 
 # load configs
 config = ConfigParser.ConfigParser()
 config.readfp(open('config.ini'))
+timing.configure(config)
 
 # initialize variables / set defaults
 queue = Queue.Queue()
 YEAR = False
 threads = []
+failures = []
 num_threads = config.getint('download', 'num_threads')
+rate_limit = 0 if not config.has_option('download', 'rate_limit') else config.getfloat('download', 'rate_limit')
 
 # load settings into separate var
 # can this be replaced by config var in the future?
 options = {}
 options['verbose'] = config.getboolean('debug', 'verbose')
+options['retries'] = 5 if not config.has_option('download', 'retries') else config.getint('download', 'retries')
+options['backoff'] = 1.0 if not config.has_option('download', 'backoff') else config.getfloat('download', 'backoff')
+options['extract'] = True if not config.has_option('download', 'extract') else config.getboolean('download', 'extract')
 
 # load and evaluate download directory
 path = config.get('download', 'directory')
@@ -35,17 +43,41 @@ except OSError:
     os.makedirs(absolute_path)
 
 
-# parse options list. Look for -y <year> or --year <year> options
+# parse options list. Look for -y <year> or --year <year> options, and -f or
+# --force to download everything again regardless of the download cache
 # exit on unrecognized option or option without argument
 try:
-    opts, args = getopt.getopt(sys.argv[1:], "y:", ["year="])
+    opts, args = getopt.getopt(sys.argv[1:], "y:f", ["year=", "force"])
 except getopt.GetoptError as e:
     print 'Invalid arguments. Exiting.'
     raise SystemExit
 
 # set year if passed in
+force = False
 for o, a in opts:
     if o in ('-y', '--year'): YEAR = a
+    if o in ('-f', '--force'): force = True
+
+# ETag, Last-Modified and checksum of the archives already downloaded
+cache = DownloadCache('%s/downloads.json' % absolute_path)
+if force:
+    cache.entries = {}
+
+##################
+# Download Files #
+##################
+
+# at most num_threads requests at a time, over connections kept alive by
+# every thread, while the archives are unzipped on a pool of their own
+client = HttpClient(num_threads, rate_limit)
+extractor = ThreadPool(max(1, multiprocessing.cpu_count() / 2))
+
+# spin up threads, which start on the urls as soon as they are queued
+for i in range(num_threads):
+    t = Fetcher(queue, absolute_path, options, cache, failures, client, extractor)
+    t.daemon = True # don't outlive a failure to read the listing pages
+    t.start()
+    threads.append(t)
     
 ##################################
 # Queue Event Files for Download #
@@ -62,7 +94,7 @@ if config.getboolean('download', 'dl_eventfiles'):
     # parse retrosheet page for files and add urls to the queue
     retrosheet_url = config.get('retrosheet', 'eventfiles_url')
     pattern = r'(\d{4}?)eve\.zip'
-    html = urllib.urlopen(retrosheet_url).read()
+    html = client.read(retrosheet_url)
     matches = re.finditer(pattern, html, re.S)
     for match in matches:
     
@@ -89,7 +121,7 @@ if config.getboolean('download', 'dl_gamelogs'):
     # parse retrosheet page for files and add urls to the queue
     retrosheet_url = config.get('retrosheet', 'gamelogs_url')
     pattern = r'gl(\d{4})\.zip'
-    html = urllib.urlopen(retrosheet_url).read()
+    html = client.read(retrosheet_url)
     matches = re.finditer(pattern, html, re.S)
     for match in matches:
     
@@ -101,16 +133,30 @@ if config.getboolean('download', 'dl_gamelogs'):
         url = 'http://www.retrosheet.org/gamelogs/gl%s.zip' % match.group(1)
         queue.put(url)
 
-##################
-# Download Files #
-##################
-        
-# spin up threads
-for i in range(num_threads):
-    t = Fetcher(queue, absolute_path, options)
-    t.start()
-    threads.append(t)
+# no more urls: stop the threads once the queue is drained
+for thread in threads:
+    queue.put(None)
 
-# wait for all threads to finish
+# wait for all threads and extractions to finish
 for thread in threads:
     thread.join()
+extractor.close()
+extractor.join()
+
+cache.save()
+
+# seasons to pass on to parse.py -y
+seasons = cache.seasons()
+if seasons:
+    print "%d files changed, seasons: %s" % (len(cache.changed), ','.join(str(year) for year in seasons))
+else:
+    print "No files changed"
+
+timing.report()
+
+# files that could not be fetched after all retries
+if failures:
+    print "%d downloads failed:" % len(failures)
+    for url, error in sorted(failures):
+        print "  %s: %s" % (url, error)
+    raise SystemExit(1)
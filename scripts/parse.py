@@ -1,5 +1,7 @@
 import os
 import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import ConfigParser
 import threading
 import Queue
@@ -10,9 +12,18 @@ import glob
 import re
 import getopt
 import sys
+import json
+import hashlib
+import tempfile
+from classes import eventparser
+from classes import gamelogs
+from classes import timing
+from classes import archives
 
 
-def connect(config):
+def get_engine(config, pool_size=5):
+    """Create the sqlalchemy engine for the database in `config`. Other than
+    on sqlite, its pool holds at most `pool_size` connections."""
     try:
         ENGINE = config.get('database', 'engine')
         DATABASE = config.get('database', 'database')
@@ -34,58 +45,305 @@ def connect(config):
             dbString = ENGINE + '://%s@%s/%s' % (USER, HOST, DATABASE)
         else:
             dbString = ENGINE + '://%s/%s' % (HOST, DATABASE)
+
+    if ENGINE.startswith('mysql'):
+        dbString += '?local_infile=1' # needed by LOAD DATA LOCAL INFILE
         
-    db = sqlalchemy.create_engine(dbString)
-    conn = db.connect()
-    
-    return conn
+    if ENGINE == 'sqlite':
+        return sqlalchemy.create_engine(dbString)
+    return sqlalchemy.create_engine(dbString, pool_size=pool_size, max_overflow=0)
+
+
+def connect(config):
+    return get_engine(config).connect()
+
+
+def table_keys(conn, table, columns):
+    """Return the set of `columns` value tuples, as strings, in `table`."""
+    return set(tuple(str(v) for v in row) for row in conn.execute('SELECT %s FROM %s' % (', '.join(columns), table)))
+
+
+def insert_rows(conn, table, rows, bound_param):
+    """Insert `rows` into `table` with one `executemany` in one transaction."""
+    if not rows:
+        return 0
+
+    sql = "INSERT INTO %s VALUES (%s)" % (table, ", ".join([bound_param] * len(rows[0])))
+    trans = conn.begin()
+    try:
+        conn.execute(sql, rows)
+        trans.commit()
+    except:
+        trans.rollback()
+        raise
+    return len(rows)
 
 
-def parse_rosters(file, conn, bound_param):
+def parse_rosters(file, conn, bound_param, known=None, fp=None):
+    """Insert the players of a roster file that are not in `known`, the set
+    of (year, player_id, team_tx) keys already loaded, which is updated.
+    The keys are read from the rosters table if `known` is not given. The
+    file is read from `fp` if given, e.g. a member of a season archive."""
     print "processing %s" % file
     
     try:
-        year = re.search(r"\d{4}", os.path.basename(file)).group(0)
+        # the trailing digits, team ids may have digits of their own
+        year = re.search(r"(\d{4})\.ROS$", os.path.basename(file)).group(1)
     except:
         print 'cannot get year from roster file %s' % file
         return None
 
-    reader = csv.reader(open(file))
+    if known is None:
+        known = table_keys(conn, 'rosters', ['year', 'player_id', 'team_tx'])
 
-    for row in reader:
+    rows = []
+    for row in csv.reader(fp or open(file)):
+        if len(row) != 7:
+            continue
         row.insert(0, year) # Insert year
 
-        sql = 'SELECT * FROM rosters WHERE year = %s AND player_id = %s AND team_tx = %s'
-        res = conn.execute(sql, [row[0], row[1], row[6]])
-        
-        if res.rowcount == 1:
+        key = (row[0], row[1], row[6])
+        if key in known:
             continue
-        
-        sql = "INSERT INTO rosters VALUES (%s)" % ", ".join([bound_param] * len(row))
-        conn.execute(sql, row)
-    
+        known.add(key)
+        rows.append(row)
+
+    insert_rows(conn, 'rosters', rows, bound_param)
     return True
 
 
-def parse_teams(file, conn, bound_param):
+def parse_teams(file, conn, bound_param, known=None, fp=None):
+    """Insert the teams of a team file that are not in `known`, the set of
+    (team_id,) keys already loaded, which is updated. The keys are read from
+    the teams table if `known` is not given. The file is read from `fp` if
+    given."""
     print "processing %s" % file
 
-    reader = csv.reader(open(file))
-    for row in reader:
+    if known is None:
+        known = table_keys(conn, 'teams', ['team_id'])
+
+    rows = []
+    for row in csv.reader(fp or open(file)):
         if len(row) != 4:
             continue
-
-        sql = 'SELECT * FROM teams WHERE team_id = %s'
-        res = conn.execute(sql, [row[0]])
-        
-        if res.rowcount == 1:
+        if (row[0],) in known:
             continue
+        known.add((row[0],))
+        rows.append(row)
+
+    insert_rows(conn, 'teams', rows, bound_param)
+
+
+def chunked(reader, chunk_size):
+    """Yield lists of up to `chunk_size` rows from `reader`."""
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def clear_games(conn, table, game_ids, cleared, bound_param, batch_size=500):
+    """Delete the rows of the `game_ids` not in the set `cleared` from `table`
+    and add them to it, so a game whose rows span several chunks is only
+    deleted before its first chunk. The lookups use the index on the leading
+    game_id primary key column, in batches of `batch_size` values to stay
+    under the bound parameter limits of sqlite and friends."""
+    new = sorted(set(game_ids) - cleared)
+    for i in range(0, len(new), batch_size):
+        batch = new[i:i + batch_size]
+        conn.execute('DELETE FROM %s WHERE game_id IN (%s)' % (table, ', '.join([bound_param] * len(batch))), batch)
+    cleared.update(new)
+
+
+def load_csv(fp, conn, table, bound_param, chunk_size, replace=True):
+    """Load chadwick csv rows (with header) read from the file object `fp`
+    into `table` using one `executemany` per chunk of `chunk_size` rows, and
+    one transaction per chunk (per file on sqlite, which locks the whole
+    database for each write transaction anyway). Games already in the table
+    are replaced, so loading the same file twice leaves one copy; pass
+    `replace=False` when the table is known not to hold any of them.
+    Returns the number of rows inserted."""
+    reader = csv.reader(fp)
+    headers = reader.next()
+    game_id = [h.lower() for h in headers].index('game_id')
+    sql = 'INSERT INTO %s(%s) VALUES(%s)' % (table, ','.join(headers), ','.join([bound_param] * len(headers)))
+    per_file = conn.engine.name == 'sqlite'
+
+    loaded = 0
+    cleared = set()
+    trans = conn.begin() if per_file else None
+    try:
+        for rows in chunked(reader, chunk_size):
+            if not per_file:
+                trans = conn.begin()
+            if replace:
+                clear_games(conn, table, [row[game_id] for row in rows], cleared, bound_param)
+            conn.execute(sql, rows)
+            if not per_file:
+                trans.commit()
+            loaded += len(rows)
+        if per_file:
+            trans.commit()
+    except:
+        if trans is not None:
+            trans.rollback()
+        raise
+
+    return loaded
+
+
+def copy_csv(fp, conn, table, replace=True):
+    """Replace the games in the csv rows (with header) read from the file
+    object `fp` in `table`, using postgres' `COPY ... FROM STDIN` into a
+    temporary staging table. Only the games found in the staging table are
+    deleted, through the game_id primary key index, so the cost does not grow
+    with the size of `table`. Without `replace` the rows are copied straight
+    into `table`. Returns the number of rows copied."""
+    headers = csv.reader([fp.readline()]).next()
+    columns = ','.join(headers)
+    stage = 'stage_%s' % table
+
+    trans = conn.begin()
+    try:
+        cursor = conn.connection.cursor()
+        if not replace:
+            cursor.copy_expert('COPY %s(%s) FROM STDIN WITH CSV' % (table, columns), fp)
+            loaded = cursor.rowcount
+        else:
+            conn.execute('CREATE TEMPORARY TABLE %s (LIKE %s INCLUDING DEFAULTS) ON COMMIT DROP' % (stage, table))
+            cursor.copy_expert('COPY %s(%s) FROM STDIN WITH CSV' % (stage, columns), fp)
+            loaded = cursor.rowcount
+            conn.execute('ANALYZE %s' % stage)
+            conn.execute('DELETE FROM %s WHERE game_id IN (SELECT DISTINCT game_id FROM %s)' % (table, stage))
+            conn.execute('INSERT INTO %s(%s) SELECT %s FROM %s' % (table, columns, columns, stage))
+        trans.commit()
+    except:
+        trans.rollback()
+        raise
+
+    return loaded
+
+
+def load_data(fp, conn, table, replace=True):
+    """Load the csv rows (with header) read from the file object `fp` into
+    `table` with MySQL's `LOAD DATA LOCAL INFILE`, mapping the columns by the
+    csv header. A pipe is spooled to a temporary file first. The games in
+    the file are deleted from `table` beforehand unless `replace` is False.
+    Unique and foreign key checks are off for the session while loading;
+    unlike `ALTER TABLE ... DISABLE KEYS`, which only applies to MyISAM
+    tables, this works on InnoDB and does not commit the caller's
+    transaction. Returns the number of rows loaded."""
+    spool = None
+    if not os.path.isfile(getattr(fp, 'name', '')):
+        spool = tempfile.NamedTemporaryFile(suffix='.csv')
+
+    def lines():
+        for line in fp:
+            if spool:
+                spool.write(line)
+            yield line
+
+    # one reader over the whole file, as quoted fields may span lines
+    reader = csv.reader(lines())
+    headers = reader.next()
+    game_id = [h.lower() for h in headers].index('game_id')
+    game_ids = set(row[game_id] for row in reader)
+
+    if spool:
+        spool.flush()
+        infile = spool.name
+    else:
+        infile = os.path.abspath(fp.name)
+
+    sql = "LOAD DATA LOCAL INFILE %%s INTO TABLE %s CHARACTER SET utf8 " \
+          "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' " \
+          "LINES TERMINATED BY '\\n' IGNORE 1 LINES (%s)" % (table, ','.join(headers))
+
+    checks = conn.execute('SELECT @@session.unique_checks, @@session.foreign_key_checks').fetchone()
+    trans = conn.begin()
+    try:
+        conn.execute('SET unique_checks = 0, foreign_key_checks = 0')
+        if replace:
+            clear_games(conn, table, game_ids, set(), '%s')
+        loaded = conn.execute(sql, [infile]).rowcount
+        trans.commit()
+    except:
+        trans.rollback()
+        raise
+    finally:
+        conn.execute('SET unique_checks = %d, foreign_key_checks = %d' % tuple(checks))
+        if spool:
+            spool.close()
+
+    return loaded
+
 
-        sql = "INSERT INTO teams VALUES (%s)" % ", ".join([bound_param] * len(row))
-        conn.execute(sql, row)
+def is_partitioned(conn, table):
+    """Whether the postgres `table` is partitioned (see partitions.postgres.sql)."""
+    res = conn.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table]).fetchone()
+    return res is not None and res[0] == 'p'
 
 
-def parse_games(file, conn, bound_param):
+def copy_partition(fp, conn, table, year):
+    """Replace the `year` partition of the partitioned postgres `table` with
+    the csv rows (with header) read from the file object `fp`. The rows are
+    copied into a new table whose year_id defaults to `year`, its primary key
+    is built once the data is in, and it is then swapped in for the old
+    partition, all in one transaction. Returns the number of rows copied."""
+    headers = csv.reader([fp.readline()]).next()
+    partition = '%s_%d' % (table, year)
+    load = '%s_load' % partition
+    key = 'year_id, game_id' if table == 'games' else 'year_id, game_id, event_id'
+
+    trans = conn.begin()
+    try:
+        conn.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS)' % (load, table))
+        conn.execute('ALTER TABLE %s ALTER COLUMN year_id SET DEFAULT %d, ADD CHECK (year_id = %d)' % (load, year, year))
+        cursor = conn.connection.cursor()
+        cursor.copy_expert('COPY %s(%s) FROM STDIN WITH CSV' % (load, ','.join(headers)), fp)
+        loaded = cursor.rowcount
+        conn.execute('ALTER TABLE %s ADD PRIMARY KEY (%s)' % (load, key))
+
+        if conn.execute('SELECT to_regclass(%s)', [partition]).fetchone()[0] is not None:
+            conn.execute('ALTER TABLE %s DETACH PARTITION %s' % (table, partition))
+            conn.execute('DROP TABLE %s' % partition)
+        conn.execute('ALTER TABLE %s RENAME TO %s' % (load, partition))
+        conn.execute('ALTER TABLE %s ATTACH PARTITION %s FOR VALUES IN (%d)' % (table, partition, year))
+        conn.execute('ANALYZE %s' % partition)
+        trans.commit()
+    except:
+        trans.rollback()
+        raise
+
+    return loaded
+
+
+def load_season(fp, conn, table, bound_param, chunk_size, replace=True, year=None):
+    """Load one season of chadwick csv output read from `fp` into `table`
+    with the bulk path suited to the database engine. `year` is needed to
+    load partitioned postgres tables."""
+    start = time.time()
+
+    if conn.engine.driver == 'psycopg2' and is_partitioned(conn, table):
+        loaded = copy_partition(fp, conn, table, int(year))
+    elif conn.engine.driver == 'psycopg2':
+        loaded = copy_csv(fp, conn, table, replace)
+    elif conn.engine.name == 'mysql':
+        loaded = load_data(fp, conn, table, replace)
+    else:
+        loaded = load_csv(fp, conn, table, bound_param, chunk_size, replace)
+
+    elapsed = time.time() - start
+    timing.record('load', '%s %s' % (table, year), elapsed, rows=loaded)
+    print "loaded %d rows into %s in %.1fs (%.0f rows/sec)" % (loaded, table, elapsed, loaded / max(elapsed, 0.001))
+    return loaded
+
+
+def parse_games(file, conn, bound_param, chunk_size=10000, replace=True):
     print "processing %s" % file
 
     try:
@@ -93,25 +351,11 @@ def parse_games(file, conn, bound_param):
     except:
         print 'cannot get year from game file %s' % file
         return None
- 
-    if conn.engine.driver == 'psycopg2':
-        conn.execute('DELETE FROM games WHERE game_id LIKE \'%%' + year + '%%\'')
-        conn.execute('COPY games FROM %s WITH CSV HEADER', file)
-    else:
-        reader = csv.reader(open(file))
-        headers = reader.next()
-        for row in reader:
-            sql = 'SELECT * FROM games WHERE game_id = %s'
-            res = conn.execute(sql, [row[0]])
-            
-            if res.rowcount == 1:
-                continue
 
-            sql = 'INSERT INTO games(%s) VALUES(%s)' % (','.join(headers), ','.join([bound_param] * len(headers)))
-            conn.execute(sql, row)
+    return load_season(open(file), conn, 'games', bound_param, chunk_size, replace, year)
 
 
-def parse_events(file, conn, bound_param):
+def parse_events(file, conn, bound_param, chunk_size=10000, replace=True):
     print "processing %s" % file
 
     try:
@@ -120,22 +364,529 @@ def parse_events(file, conn, bound_param):
         print 'cannot get year from event file %s' % file
         return None
 
-    if conn.engine.driver == 'psycopg2':
-        conn.execute('DELETE FROM events WHERE game_id LIKE \'%%' + year + '%%\'')
-        conn.execute('COPY events FROM %s WITH CSV HEADER', file)
-        conn.execute('COMMIT')
+    return load_season(open(file), conn, 'events', bound_param, chunk_size, replace, year)
+
+
+def load_gamelog(fp, conn, year, bound_param, chunk_size):
+    """Replace the `year` season of the gamelogs table with the game log read
+    from the file object `fp`, in one transaction, using `COPY` on postgres
+    and chunked `executemany` elsewhere. Returns the number of games
+    loaded."""
+    rows = gamelogs.iter_gamelog(fp)
+    columns = ','.join(gamelogs.GAMELOG_FIELDS)
+
+    trans = conn.begin()
+    try:
+        # game_dt leads the primary key, so this only reads the season's rows
+        conn.execute('DELETE FROM gamelogs WHERE game_dt BETWEEN %d AND %d' % (year * 10000, year * 10000 + 9999))
+        if conn.engine.driver == 'psycopg2':
+            cursor = conn.connection.cursor()
+            cursor.copy_expert('COPY gamelogs(%s) FROM STDIN WITH CSV' % columns,
+                               eventparser.CsvStream(None, rows, csv.QUOTE_MINIMAL))
+            loaded = cursor.rowcount
+        else:
+            sql = 'INSERT INTO gamelogs(%s) VALUES(%s)' % (columns, ','.join([bound_param] * len(gamelogs.GAMELOG_FIELDS)))
+            loaded = 0
+            for chunk in chunked(rows, chunk_size):
+                conn.execute(sql, chunk)
+                loaded += len(chunk)
+        trans.commit()
+    except:
+        trans.rollback()
+        raise
+
+    return loaded
+
+
+def run_gamelog(job):
+    """Process pool entry point: load one game log over a database connection
+    of its own. Returns (year, games loaded, error message, seconds)."""
+    config, year, file, bound_param, chunk_size = job
+    start = time.time()
+    try:
+        conn = connect(config)
+        try:
+            loaded = load_gamelog(archives.open_text(file), conn, year, bound_param, chunk_size)
+        finally:
+            conn.close()
+    except Exception, e:
+        return year, None, str(e), time.time() - start
+
+    elapsed = time.time() - start
+    print "loaded %d games from %s in %.1fs" % (loaded, os.path.basename(file), elapsed)
+    return year, loaded, None, elapsed
+
+
+def cwevent_args(chadwick, year, files):
+    return ['%s/cwevent' % chadwick, '-q', '-n', '-f', '0-96', '-x', '0-62', '-y', str(year)] + files
+
+
+def cwgame_args(chadwick, year, files):
+    return ['%s/cwgame' % chadwick, '-q', '-n', '-f', '0-83', '-y', str(year)] + files
+
+
+def event_files(path, year):
+    """Names of the event files for `year` in the directory `path`, or in the
+    season's archive there."""
+    return archives.Season(path, year).event_files()
+
+
+def chadwick_jobs(years, chadwick, path, csvpath):
+    """Build the list of cwevent/cwgame jobs for `years` whose csv output
+    does not exist yet. Each job is a (name, args, cwd, output) tuple, where
+    cwd is the season's archive when its event files were not extracted."""
+    jobs = []
+    for year in years:
+        season = archives.Season(path, year)
+        files = season.event_files()
+
+        output = '%s/events-%d.csv' % (csvpath, year)
+        if not os.path.isfile(output):
+            jobs.append(('cwevent %d' % year, cwevent_args(chadwick, year, files), season.location(), output))
+
+        output = '%s/games-%d.csv' % (csvpath, year)
+        if not os.path.isfile(output):
+            jobs.append(('cwgame %d' % year, cwgame_args(chadwick, year, files), season.location(), output))
+
+    return jobs
+
+
+def native_jobs(years, path, csvpath):
+    """Like chadwick_jobs, but for the built-in event file parser, with one
+    eventparser.run_native job per event file of the seasons whose csv
+    output does not exist yet. eventparser.merge_jobs joins their output."""
+    jobs = []
+    for year in years:
+        if not all(os.path.isfile('%s/%s-%d.csv' % (csvpath, kind, year)) for kind in ('events', 'games')):
+            jobs.extend(eventparser.file_jobs(path, year, csvpath))
+
+    return jobs
+
+
+def stream_native(year, path, conn, bound_param, chunk_size, verbose, fresh=()):
+    """Load `year` into the games and events tables straight from the output
+    of the built-in event file parser. Returns the same (failed, loaded) pair
+    as stream_season. The season is parsed once: the games are collected
+    while the events load, and loaded after them."""
+    if verbose:
+        print "streaming native %d" % year
+    events, games = eventparser.stream(path, year)
+    loaded = {}
+    loaded['events'] = load_season(events, conn, 'events', bound_param, chunk_size, 'events' not in fresh, year)
+    loaded['games'] = load_season(eventparser.CsvStream(eventparser.GAME_FIELDS, games), conn, 'games', bound_param, chunk_size, 'games' not in fresh, year)
+
+    return [], loaded
+
+
+def stream_season(year, chadwick, path, conn, bound_param, chunk_size, verbose, fresh=()):
+    """Pipe cwgame and cwevent output for `year` straight into the games and
+    events tables without writing csv files. The games of tables in `fresh`,
+    which were empty before this run, are not cleared first. Returns the list of
+    (name, exit code) pairs of the chadwick commands that failed and a
+    dictionary of the rows loaded per table."""
+    season = archives.Season(path, year)
+    files = season.event_files()
+    steps = [('cwgame %d' % year, cwgame_args(chadwick, year, files), 'games'),
+             ('cwevent %d' % year, cwevent_args(chadwick, year, files), 'events')]
+
+    failed = []
+    loaded = {}
+    for name, args, table in steps:
+        if verbose:
+            print "streaming '%s'" % ' '.join(args)
+
+        start = time.time()
+        with archives.directory(season.location()) as cwd:
+            proc = subprocess.Popen(args, stdout=subprocess.PIPE, cwd=cwd)
+            try:
+                loaded[table] = load_season(proc.stdout, conn, table, bound_param, chunk_size, table not in fresh, year)
+            finally:
+                proc.stdout.close()
+                code = proc.wait()
+        # chadwick and the load overlap, so this is also the load time
+        timing.record('stream', name, time.time() - start, code=code)
+
+        if code != 0:
+            failed.append((name, code))
+
+    return failed, loaded
+
+
+def run_chadwick(job):
+    """Run a single chadwick job. Output goes to a temporary file that is only
+    renamed to its final name if the command succeeds, so an interrupted run
+    never leaves a partial csv behind. An archive as cwd is unzipped into a
+    temporary directory for the duration of the job. Returns (name, exit
+    code)."""
+    name, args, cwd, output = job
+    tmp = '%s.tmp' % output
+
+    out = open(tmp, 'w')
+    try:
+        with archives.directory(cwd) as cwd:
+            code = subprocess.call(args, stdout=out, cwd=cwd)
+    except OSError, e:
+        print 'cannot run %s: %s' % (name, e)
+        code = -1
+    finally:
+        out.close()
+
+    if code == 0:
+        os.rename(tmp, output)
+    else:
+        os.remove(tmp)
+
+    return name, code
+
+
+def timed_job(item):
+    """Process pool entry point: run the job of a (runner, job) pair,
+    profiled when a profile directory is configured. Returns the result of
+    the runner and the seconds it took."""
+    runner, job = item
+    start = time.time()
+    result = timing.profiled('convert', job[0], runner, job)
+    return result, time.time() - start
+
+
+def convert(jobs, num_workers, verbose, runner=run_chadwick):
+    """Run chadwick `jobs` on a pool of `num_workers` processes, each job
+    through `runner` (run_chadwick or eventparser.run_native). Returns the
+    list of (name, exit code) pairs of the jobs that failed."""
+    if verbose:
+        for job in jobs:
+            print "calling '%s'" % (' '.join(job[1]) if runner is run_chadwick else job[0])
+
+    pool = multiprocessing.Pool(max(1, min(num_workers, len(jobs))))
+    try:
+        results = pool.map(timed_job, [(runner, job) for job in jobs])
+    finally:
+        pool.close()
+        pool.join()
+
+    for (name, code), seconds in results:
+        timing.record('convert', name, seconds, code=code)
+
+    if runner is eventparser.run_native:
+        eventparser.merge_jobs(jobs)
+
+    return [(name, code) for (name, code), seconds in results if code != 0]
+
+
+SQLITE_BULK_PRAGMAS = [('journal_mode', 'MEMORY'),
+                       ('synchronous', 'OFF'),
+                       ('cache_size', '-262144'), # KiB
+                       ('temp_store', 'MEMORY')]
+TABLE_KEY_RE = re.compile(r',\s*PRIMARY\s+KEY\s*\(([^)]*)\)', re.I)
+COLUMN_KEY_RE = re.compile(r'([(,]\s*)(\w+)(\s[^,]*?)\s+PRIMARY\s+KEY', re.I)
+
+
+def sqlite_pragmas(conn, pragmas):
+    """Set the sqlite `pragmas`, a list of (name, value) pairs, and return
+    the previous values in the same form."""
+    previous = []
+    for name, value in pragmas:
+        previous.append((name, conn.execute('PRAGMA %s' % name).fetchone()[0]))
+        conn.execute('PRAGMA %s = %s' % (name, value))
+    return previous
+
+
+def strip_primary_key(sql):
+    """Remove the primary key from a CREATE TABLE statement. Returns the new
+    statement and the key columns (None if there was no primary key)."""
+    m = TABLE_KEY_RE.search(sql)
+    if m:
+        return sql[:m.start()] + sql[m.end():], m.group(1)
+    m = COLUMN_KEY_RE.search(sql)
+    if m:
+        return sql[:m.start()] + m.group(1) + m.group(2) + m.group(3) + sql[m.end():], m.group(2)
+    return sql, None
+
+
+def sqlite_defer_indexes(conn, tables):
+    """Drop the indexes of the empty sqlite `tables`, recreating them without
+    their primary key, so a full build appends rows without any index
+    maintenance. Returns {table: statements that build its indexes}, with
+    the primary keys as unique indexes."""
+    deferred = {}
+    for table in tables:
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND lower(name) = ?", [table]).fetchone()[0]
+        indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND lower(tbl_name) = ? AND sql IS NOT NULL", [table]).fetchall()
+
+        statements = deferred.setdefault(table, [])
+        sql, key = strip_primary_key(sql)
+        if key:
+            statements.append('CREATE UNIQUE INDEX IF NOT EXISTS %s_pkey ON %s(%s)' % (table, table, key))
+        for name, index_sql in indexes:
+            conn.execute('DROP INDEX %s' % name)
+            statements.append(index_sql)
+        if key:
+            conn.execute('DROP TABLE %s' % table)
+            conn.execute(sql)
+
+    return deferred
+
+
+# secondary indexes for the lookups of retrosheet_sql_tools.py, as (table,
+# index, column). year_id only exists once updateSchema has run or the
+# tables are partitioned, and is left out otherwise
+SECONDARY_INDEXES = [
+    ('events', 'events_bat_id_idx', 'bat_id'),
+    ('events', 'events_pit_id_idx', 'pit_id'),
+    ('events', 'events_year_id_idx', 'year_id'),
+    ('games', 'games_year_id_idx', 'year_id'),
+    ('games', 'games_park_id_idx', 'park_id'),
+]
+
+
+def is_empty(conn, table):
+    return conn.execute('SELECT 1 FROM %s LIMIT 1' % table).fetchone() is None
+
+
+def drop_index(conn, table, name):
+    if conn.engine.name == 'mysql':
+        conn.execute('DROP INDEX %s ON %s' % (name, table))
+    else:
+        conn.execute('DROP INDEX %s' % name)
+
+
+def defer_indexes(conn, tables, fresh):
+    """Drop the non-unique indexes of `tables` before a full rebuild and, on
+    postgres, the primary keys of the `fresh` (empty) ones, which are not
+    needed to replace games. mysql keeps its clustered primary keys. Returns
+    {table: statements that rebuild them}."""
+    inspector = sqlalchemy.inspect(conn)
+    deferred = {}
+    for table in tables:
+        statements = deferred.setdefault(table, [])
+        key = inspector.get_pk_constraint(table)
+        if conn.engine.driver == 'psycopg2' and table in fresh and key.get('name'):
+            conn.execute('ALTER TABLE %s DROP CONSTRAINT %s' % (table, key['name']))
+            statements.append('ALTER TABLE %s ADD CONSTRAINT %s PRIMARY KEY (%s)' % (table, key['name'], ', '.join(key['constrained_columns'])))
+        for index in inspector.get_indexes(table):
+            if index['unique']:
+                continue
+            drop_index(conn, table, index['name'])
+            statements.append('CREATE INDEX %s ON %s (%s)' % (index['name'], table, ', '.join(index['column_names'])))
+
+    return deferred
+
+
+def add_secondary_indexes(conn, tables, deferred):
+    """Add the statements creating the SECONDARY_INDEXES missing from
+    `tables` to `deferred`, unless they are already there."""
+    inspector = sqlalchemy.inspect(conn)
+    for table, name, column in SECONDARY_INDEXES:
+        if table not in tables:
+            continue
+        if column == 'year_id' and conn.engine.driver == 'psycopg2' and is_partitioned(conn, table):
+            continue # the partition key
+
+        columns = [c['name'].lower() for c in inspector.get_columns(table)]
+        existing = [i['name'].lower() for i in inspector.get_indexes(table)]
+        planned = ' '.join(deferred.get(table, []))
+        if column in columns and name not in existing and not re.search(r'\b%s\b' % name, planned, re.I):
+            deferred.setdefault(table, []).append('CREATE INDEX %s ON %s (%s)' % (name, table, column))
+
+
+def build_indexes(db, conn, deferred, workers, verbose):
+    """Run the `deferred` index statements once the data is loaded, the
+    tables in parallel on connections of their own when `workers` > 1."""
+    def build(item):
+        table, statements = item
+        start = time.time()
+        table_conn = conn if workers == 1 else db.connect()
+        try:
+            for sql in statements:
+                if verbose:
+                    print sql
+                table_conn.execute(sql)
+        finally:
+            if table_conn is not conn:
+                table_conn.close()
+        elapsed = time.time() - start
+        timing.record('index', table, elapsed, indexes=len(statements))
+        print 'built %d indexes on %s in %.1fs' % (len(statements), table, elapsed)
+
+    items = [(table, statements) for table, statements in sorted(deferred.items()) if statements]
+    if workers > 1 and len(items) > 1:
+        pool = ThreadPool(min(workers, len(items)))
+        try:
+            pool.map(build, items)
+        finally:
+            pool.close()
+            pool.join()
     else:
-        reader = csv.reader(open(file))
-        headers = reader.next()
-        for row in reader:
-            sql = 'SELECT * FROM events WHERE game_id = %s AND event_id = %s'
-            res = conn.execute(sql, [row[0], row[96]])
-            
-            if res.rowcount == 1:
-                return True
-
-            sql = 'INSERT INTO events(%s) VALUES(%s)' % (','.join(headers), ','.join([bound_param] * len(headers)))
-            conn.execute(sql, row)
+        map(build, items)
+
+
+def restore_indexes(conn, manifest_file, database, verbose):
+    """Build the keys and indexes that a load deferred but did not get to
+    build because it was killed, as recorded in the manifest. Without them
+    the tables would no longer look fresh, and the next loads would replace
+    games through unindexed deletes. Runs even with -f, which otherwise
+    ignores the manifest."""
+    manifest = read_manifest(manifest_file)
+    if manifest.get('database') != database or not manifest.get('deferred'):
+        return
+
+    print 'restoring the indexes of an interrupted load'
+    for table, statements in sorted(manifest['deferred'].items()):
+        for sql in statements:
+            if verbose:
+                print sql
+            try:
+                conn.execute(sql)
+            except Exception, e:
+                # built before the load was interrupted
+                print 'cannot restore %s: %s' % (table, str(e).strip())
+
+    del manifest['deferred']
+    write_manifest(manifest_file, manifest)
+
+
+def prepare_tables(conn, tables, force, sqlite_bulk):
+    """Defer the indexes of `tables` for the load. A full rebuild (empty
+    tables, or `force`) loads without secondary indexes, and without primary
+    keys where the tables are empty, and builds them once the data is in.
+    Returns the empty (fresh) tables and the deferred index statements."""
+    fresh = [t for t in tables if is_empty(conn, t)]
+    rebuild = tables if force else fresh
+    deferred = {}
+    if conn.engine.name == 'sqlite':
+        if sqlite_bulk:
+            deferred = sqlite_defer_indexes(conn, fresh)
+        rebuild = [t for t in rebuild if t not in deferred]
+    elif conn.engine.driver == 'psycopg2':
+        rebuild = [t for t in rebuild if not is_partitioned(conn, t)] # copy_partition builds its own
+    deferred.update(defer_indexes(conn, rebuild, fresh))
+    return fresh, deferred
+
+
+def load_teams(year, conn, options, team_keys):
+    """Load the TEAM files of `year` whose teams are not in `team_keys`."""
+    season = archives.Season(options['path'], year)
+    for file in season.names('TEAM%d*' % year):
+        parse_teams(file, conn, options['bound_param'], team_keys, season.open(file))
+
+
+def load_year(year, conn, options, sources, previous, roster_keys, fresh):
+    """Load the rosters, games and events of one season in a single
+    transaction on `conn`, from csv files or streamed from the event files.
+    `previous` is the season's manifest entry of the last load, whose
+    unchanged csv files are skipped. Returns (manifest entry or None on
+    failure, list of problems)."""
+    modules = options['modules']
+    bound_param = options['bound_param']
+    chunk_size = options['chunk_size']
+    entry = {'sources': sources, 'csv': {}, 'rows': {}}
+    problems = []
+
+    trans = conn.begin()
+    try:
+        if 'rosters' in modules:
+            season = archives.Season(options['path'], year)
+            for file in season.names('*%d.ROS' % year):
+                parse_rosters(file, conn, bound_param, roster_keys, season.open(file))
+
+        if options['stream'] and ('games' in modules or 'events' in modules):
+            if options['native']:
+                failed, loaded = stream_native(year, options['path'], conn, bound_param, chunk_size, options['verbose'], fresh)
+            else:
+                failed, loaded = stream_season(year, options['chadwick'], options['path'], conn, bound_param, chunk_size,
+                                               options['verbose'], fresh)
+            problems.extend('%s failed with exit code %s' % (name, code) for name, code in failed)
+            entry['rows'].update(loaded)
+
+        for table, parse in [('games', parse_games), ('events', parse_events)]:
+            if options['stream'] or table not in modules:
+                continue
+
+            file = '%s/%s-%d.csv' % (options['csvpath'], table, year)
+            if not os.path.isfile(file):
+                problems.append('no %s' % file)
+                continue
+
+            entry['csv'][table] = file_hash(file)
+            if entry['csv'][table] == previous.get('csv', {}).get(table):
+                print 'skipping unchanged %s' % file
+                entry['rows'][table] = previous.get('rows', {}).get(table)
+                continue
+
+            entry['rows'][table] = parse(file, conn, bound_param, chunk_size, table not in fresh)
+
+        if problems:
+            trans.rollback()
+        else:
+            trans.commit()
+    except Exception, e:
+        trans.rollback()
+        problems.append(str(e).strip())
+
+    return None if problems else entry, problems
+
+
+def parse_years(values):
+    """Expand -y arguments such as '2004', '1990-1995' or '1990,1992-1993'
+    into a sorted list of years."""
+    years = set()
+    for value in values:
+        for part in value.split(','):
+            part = part.strip()
+            if '-' in part:
+                first, last = part.split('-', 1)
+                years.update(range(int(first), int(last) + 1))
+            elif part:
+                years.add(int(part))
+    return sorted(years)
+
+
+def file_hash(file):
+    """sha1 hex digest of the contents of `file`."""
+    digest = hashlib.sha1()
+    fp = open(file, 'rb')
+    try:
+        for block in iter(lambda: fp.read(1 << 20), ''):
+            digest.update(block)
+    finally:
+        fp.close()
+    return digest.hexdigest()
+
+
+def season_sources(path, year):
+    """Map the event, roster and team files of `year` in `path` to their
+    content hashes, or the season's archive to its hash when they were not
+    extracted."""
+    season = archives.Season(path, year)
+    if season.archive:
+        return {os.path.basename(season.archive): file_hash(season.archive)}
+    files = glob.glob('%s/%d*.EV*' % (path, year)) + glob.glob('%s/*%d.ROS' % (path, year)) + \
+        glob.glob('%s/TEAM%d' % (path, year))
+    return dict((os.path.basename(f), file_hash(f)) for f in files)
+
+
+def read_manifest(file):
+    """Read the load manifest in `file`, or return an empty one."""
+    if not os.path.isfile(file):
+        return {}
+    try:
+        return json.load(open(file))
+    except ValueError:
+        print 'ignoring unreadable manifest %s' % file
+        return {}
+
+
+def write_manifest(file, manifest):
+    """Write the load manifest atomically, so an interrupted run keeps the
+    previous version."""
+    tmp = '%s.tmp' % file
+    fp = open(tmp, 'w')
+    try:
+        json.dump(manifest, fp, indent=2, sort_keys=True, separators=(',', ': '))
+    finally:
+        fp.close()
+    os.rename(tmp, file)
+
 
 def env_to_config(config):
     """If certain environment variables are set have them override existing
@@ -145,14 +896,23 @@ def env_to_config(config):
                  {'section': 'database', 'option': 'database'},
                  {'section': 'database', 'option': 'user'},
                  {'section': 'database', 'option': 'password'},
+                 {'section': 'database', 'option': 'chunk_size'},
+                 {'section': 'database', 'option': 'sqlite_bulk'},
+                 {'section': 'database', 'option': 'load_workers'},
                  {'section': 'download', 'option': 'directory'},
                  {'section': 'download', 'option': 'num_threads'},
+                 {'section': 'download', 'option': 'extract'},
                  {'section': 'download', 'option': 'dl_eventfiles'},
                  {'section': 'download', 'option': 'dl_gamelogs'},
                  {'section': 'chadwick', 'option': 'directory'},
+                 {'section': 'chadwick', 'option': 'num_workers'},
+                 {'section': 'chadwick', 'option': 'stream'},
+                 {'section': 'chadwick', 'option': 'native'},
                  {'section': 'retrosheet', 'option': 'eventfiles_url'},
                  {'section': 'retrosheet', 'option': 'gamelogs_url'},
-                 {'section': 'debug', 'option': 'verbose'}]
+                 {'section': 'debug', 'option': 'verbose'},
+                 {'section': 'debug', 'option': 'timing_log'},
+                 {'section': 'debug', 'option': 'profile_dir'}]
     for item in cfg_items:
         env_var_name = (item['section']+'_'+item['option']).upper()
         env_var_value = os.environ.get(env_var_name)
@@ -160,89 +920,226 @@ def env_to_config(config):
             config.set(item['section'], item['option'], env_var_value)
     return config
 
+def read_options(config):
+    """The load settings in `config`, as a dictionary shared by main() and
+    pipeline.py."""
+    sqlite = config.get('database', 'engine') == 'sqlite'
+    load_workers = 4 if not config.has_option('database', 'load_workers') else config.getint('database', 'load_workers')
+    path = os.path.abspath(config.get('download', 'directory'))
+
+    options = {}
+    options['sqlite']       = sqlite
+    options['load_workers'] = 1 if sqlite else max(1, load_workers) # sqlite allows a single writer at a time
+    options['verbose']      = config.getboolean('debug', 'verbose')
+    options['chadwick']     = config.get('chadwick', 'directory')
+    options['path']         = path
+    options['csvpath']      = '%s/csv' % path
+    options['bound_param']  = '?' if sqlite else '%s'
+    options['chunk_size']   = 10000 if not config.has_option('database', 'chunk_size') else config.getint('database', 'chunk_size')
+    options['sqlite_bulk']  = sqlite and (not config.has_option('database', 'sqlite_bulk') or config.getboolean('database', 'sqlite_bulk'))
+    options['stream']       = config.has_option('chadwick', 'stream') and config.getboolean('chadwick', 'stream')
+    options['native']       = config.has_option('chadwick', 'native') and config.getboolean('chadwick', 'native')
+    options['num_workers']  = multiprocessing.cpu_count() if not config.has_option('chadwick', 'num_workers') else config.getint('chadwick', 'num_workers')
+    options['modules']      = ['teams', 'rosters', 'events', 'games'] # items to process
+
+    if config.has_option('download', 'dl_gamelogs') and config.getboolean('download', 'dl_gamelogs'):
+        options['modules'].append('gamelogs')
+
+    return options
+
+
+def check_chadwick(options):
+    """Exit unless cwevent and cwgame are there, or not needed."""
+    chadwick = options['chadwick']
+    if not options['native'] and (not os.path.exists(chadwick) \
+        or not os.path.exists('%s/cwevent' % chadwick) \
+        or not os.path.exists('%s/cwgame' % chadwick)):
+        print 'chadwick does not exist in %s - exiting' % chadwick
+        raise SystemExit
+
+
 def main():
     config = ConfigParser.ConfigParser()
     config.readfp(open('config.ini'))
     config = env_to_config(config)
+    timing.configure(config)
+    options = read_options(config)
 
     try:
-        conn = connect(config)
+        # conn stays checked out, next to one connection per load worker
+        db = get_engine(config, options['load_workers'] + 1)
+        conn = db.connect()
     except Exception, e:
         print('Cannot connect to database: %s' % e)
         raise SystemExit
     
-    useyear     = False # Use a single year or all years
-    verbose     = config.getboolean('debug', 'verbose')
-    chadwick    = config.get('chadwick', 'directory')
-    path        = os.path.abspath(config.get('download', 'directory'))
-    csvpath     = '%s/csv' % path
-    files       = []
-    years       = []
-    opts, args  = getopt.getopt(sys.argv[1:], "y:")
-    bound_param = '?' if config.get('database', 'engine') == 'sqlite' else '%s'
-    modules     = ['teams', 'rosters', 'events', 'games'] # items to process
-
-    if not os.path.exists(chadwick) \
-        or not os.path.exists('%s/cwevent' % chadwick) \
-        or not os.path.exists('%s/cwgame' % chadwick):
-        print 'chadwick does not exist in %s - exiting' % chadwick
-        raise SystemExit
+    load_workers = options['load_workers']
+    verbose      = options['verbose']
+    chadwick     = options['chadwick']
+    path         = options['path']
+    csvpath      = options['csvpath']
+    opts, args   = getopt.getopt(sys.argv[1:], "y:f")
+    force        = ('-f', '') in opts # ignore the manifest and reload everything
+    bound_param  = options['bound_param']
+    chunk_size   = options['chunk_size']
+    stream       = options['stream']
+    native       = options['native']
+    num_workers  = options['num_workers']
+    modules      = options['modules']
+
+    check_chadwick(options)
     
     os.chdir(path) # Chadwick seems to need to be in the directory
     
     if not os.path.exists('csv'):
         os.makedirs('csv')
 
-    for file in glob.glob("%s/*.EV*" % path):
-        files.append(file)
+    # -y takes years, ranges and lists (-y 2004, -y 1990-1995, -y 1990,1995)
+    # and may be repeated
+    try:
+        requested = parse_years([a for o, a in opts if o == '-y'])
+    except ValueError:
+        print 'invalid -y argument, use e.g. 2004, 1990-1995 or 1990,1992'
+        raise SystemExit
 
-    if len(opts) > 0:
-        for o, a in opts:
-            if o == '-y':
-                yearfile = '%s/%s*.EV*' % (path, a)
-                if len(glob.glob(yearfile)) > 0 and a not in years:
-                    years.append(int(a))
-                    useyear = True
-    else:
-        for file in files:
-            year = re.search(r"^\d{4}", os.path.basename(file)).group(0)
-            if year not in years:
-                years.append(int(year))
+    available = archives.seasons(path)
+    years = [year for year in requested if year in available] if requested else sorted(available)
 
-    for year in years:
-        if not os.path.isfile('%s/events-%d.csv' % (csvpath, year)):
-            cmd = "%s/cwevent -q -n -f 0-96 -x 0-62 -y %d %d*.EV* > %s/events-%d.csv" % (chadwick, year, year, csvpath, year)
-            if(verbose):
-                print "calling '" + cmd + "'"
-            subprocess.call(cmd, shell=True)
-
-        if not os.path.isfile('%s/games-%d.csv' % (csvpath, year)):
-            cmd = "%s/cwgame -q -n -f 0-83 -y %d %d*.EV* > %s/games-%d.csv" % (chadwick, year, year, csvpath, year)
-            if(verbose):
-                print "calling '" + cmd + "'"
-            subprocess.call(cmd, shell=True)
+    manifest_file = '%s/manifest.json' % csvpath
+    database = '%s/%s' % (config.get('database', 'engine'), config.get('database', 'database'))
+    restore_indexes(conn, manifest_file, database, verbose)
+    manifest = {} if force else read_manifest(manifest_file)
+    if manifest.get('database') != database:
+        manifest = {'database': database, 'seasons': {}}
+    seasons = manifest['seasons']
 
+    # only seasons whose event, roster or team files changed since they were
+    # last loaded into this database are converted and loaded again
+    sources = dict((year, season_sources(path, year)) for year in years)
+    changed = [year for year in years if seasons.get(str(year), {}).get('sources') != sources[year]]
+    print '%d of %d seasons changed since the last load' % (len(changed), len(years))
+
+    if not stream:
+        for year in changed:
+            if str(year) not in seasons:
+                continue
+            for kind in ('events', 'games'):
+                output = '%s/%s-%d.csv' % (csvpath, kind, year)
+                if os.path.isfile(output):
+                    os.remove(output) # converted from an older version of the sources
+
+        if native:
+            jobs, runner = native_jobs(changed, path, csvpath), eventparser.run_native
+        else:
+            jobs, runner = chadwick_jobs(changed, chadwick, path, csvpath), run_chadwick
+        if jobs:
+            failed = convert(jobs, num_workers, verbose, runner)
+            for name, code in failed:
+                print '%s failed with exit code %s' % (name, code)
+
+    # existing team and roster keys, read once and updated as files are loaded
+    team_keys = table_keys(conn, 'teams', ['team_id']) if changed and 'teams' in modules else set()
+    roster_keys = table_keys(conn, 'rosters', ['year', 'player_id', 'team_tx']) if changed and 'rosters' in modules else set()
+
+    # teams are shared by all seasons (and referenced by rosters), so they
+    # are loaded up front, one file at a time
     if 'teams' in modules:
-        mask = "TEAM*" if not useyear else "TEAM%s*" % years[0]
-        for file in glob.glob(mask):
-            parse_teams(file, conn, bound_param)
+        for year in changed:
+            load_teams(year, conn, options, team_keys)
+
+    def run_year(year):
+        """Load one season, on a connection of its own unless seasons are
+        loaded one at a time. Returns (year, manifest entry or None on
+        failure, list of problems, seconds)."""
+        start = time.time()
+        try:
+            year_conn = conn if load_workers == 1 else db.connect()
+        except Exception, e:
+            return year, None, ['cannot connect: %s' % str(e).strip()], time.time() - start
+        try:
+            entry, problems = load_year(year, year_conn, options, sources[year], seasons.get(str(year), {}),
+                                        roster_keys, fresh)
+        finally:
+            if year_conn is not conn:
+                year_conn.close()
+
+        return year, entry, problems, time.time() - start
+
+    def profiled_year(year):
+        return timing.profiled('load', 'season %d' % year, run_year, year)
+
+    # sqlite bulk mode also relaxes durability for the duration of the load
+    tables = [t for t in ('games', 'events') if t in modules]
+    fresh, deferred, saved_pragmas = [], {}, []
+    if changed:
+        if options['sqlite_bulk']:
+            saved_pragmas = sqlite_pragmas(conn, SQLITE_BULK_PRAGMAS)
+        fresh, deferred = prepare_tables(conn, tables, force, options['sqlite_bulk'])
+        manifest['deferred'] = deferred # until they are built
+        write_manifest(manifest_file, manifest)
+
+    # the sqlite connection can only be used from the thread that opened it,
+    # so a single worker loads in this thread
+    report = []
+    pool = ThreadPool(min(load_workers, len(changed))) if load_workers > 1 and len(changed) > 1 else None
+    results = pool.imap_unordered(profiled_year, changed) if pool else (profiled_year(year) for year in changed)
+    try:
+        for year, entry, problems, elapsed in results:
+            timing.record('season', str(year), elapsed, failed=bool(problems))
+            report.append((year, problems, elapsed))
+            if entry is not None:
+                entry['loaded'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                seasons[str(year)] = entry
+                write_manifest(manifest_file, manifest)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if changed:
+            add_secondary_indexes(conn, tables, deferred)
+            build_indexes(db, conn, deferred, load_workers, verbose)
+            del manifest['deferred']
+            write_manifest(manifest_file, manifest)
+        if saved_pragmas:
+            sqlite_pragmas(conn, saved_pragmas)
+
+    if report:
+        print 'season   result   seconds'
+        for year, problems, elapsed in sorted(report):
+            print ('%6d   %-6s %9.1f   %s' % (year, 'failed' if problems else 'ok', elapsed, '; '.join(problems))).rstrip()
+        print '%d of %d seasons loaded' % (len([r for r in report if not r[1]]), len(report))
 
-    if 'rosters' in modules:
-        mask = "*.ROS" if not useyear else "*%s*.ROS" % years[0]
-        for file in glob.glob(mask):
-            parse_rosters(file, conn, bound_param)
+    if 'gamelogs' in modules:
+        # game logs also cover seasons without event files, so they are
+        # selected by -y directly rather than through `years`
+        logs = manifest.setdefault('gamelogs', {})
+        digests = {}
+        jobs = []
+        for year, file in sorted(gamelogs.gamelog_files(path, requested).items()):
+            digests[year] = file_hash(file)
+            if logs.get(str(year), {}).get('source') != digests[year]:
+                jobs.append((config, year, file, bound_param, chunk_size))
+        print '%d game logs changed since the last load' % len(jobs)
 
-    if 'games' in modules:
-        mask = '%s/games-*.csv' % csvpath if not useyear else '%s/games-%s*.csv' % (csvpath, years[0])
-        for file in glob.glob(mask):
-            parse_games(file, conn, bound_param)
+        if jobs:
+            pool = multiprocessing.Pool(max(1, min(load_workers, len(jobs))))
+            try:
+                results = pool.map(run_gamelog, jobs)
+            finally:
+                pool.close()
+                pool.join()
 
-    if 'events' in modules:
-        mask = '%s/events-*.csv' % csvpath if not useyear else '%s/events-%s*.csv' % (csvpath, years[0])
-        for file in glob.glob(mask):
-            parse_events(file, conn, bound_param)
+            for year, loaded, error, seconds in results:
+                timing.record('gamelog', str(year), seconds, rows=loaded or 0)
+                if error is not None:
+                    print 'game log %d failed: %s' % (year, error)
+                    continue
+                logs[str(year)] = {'source': digests[year], 'rows': loaded,
+                                   'loaded': time.strftime('%Y-%m-%d %H:%M:%S')}
+            write_manifest(manifest_file, manifest)
 
     conn.close()
+    timing.report()
 
 
 if __name__ == '__main__':
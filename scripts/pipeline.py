@@ -0,0 +1,404 @@
+"""
+Download, convert and load the Retrosheet seasons in one run.
+
+download.py and parse.py run one after the other, and parse.py converts
+every season before it loads any. Here every season moves on to the next
+stage as soon as it is through the previous one:
+
+  download    `download` > `num_threads` Fetcher threads download and
+              extract the archives, as in download.py
+  convert     cwevent/cwgame (or the built-in parser) write the season's
+              csv files, `chadwick` > `num_workers` jobs at a time
+  load        the teams, rosters, games and events of the season are loaded
+              like parse.py does, `database` > `load_workers` seasons at a
+              time (one on sqlite), and game logs along with them
+
+The stages are connected by queues holding at most QUEUE_SIZE seasons, so
+a stage that falls behind holds up the ones before it instead of piling up
+work, and the run takes about as long as its slowest stage rather than as
+long as all of them together. Downloads, csv files and the load manifest
+are shared with download.py and parse.py, so both can still be used on
+their own.
+
+    python pipeline.py [-y years] [-f] [-n]
+
+-y takes the same years as parse.py, -f ignores the download cache and the
+load manifest, and -n skips the download and runs the seasons already in
+the download directory.
+"""
+
+import os
+import re
+import sys
+import time
+import Queue
+import getopt
+import threading
+import ConfigParser
+import multiprocessing
+import parse
+from classes.fetcher import Fetcher, DownloadCache, HttpClient
+from classes import eventparser
+from classes import gamelogs
+from classes import archives
+from classes import timing
+
+QUEUE_SIZE = 2 # seasons waiting between two stages
+
+
+class StageQueue(Queue.Queue):
+    """A queue of at most QUEUE_SIZE items between two stages. Once all of
+    the `consumers` reading it have died, put() drops the items, those
+    still queued included, instead of blocking for good, and keeps them in
+    `dropped` to be reported."""
+
+    def __init__(self):
+        Queue.Queue.__init__(self, QUEUE_SIZE)
+        self.consumers = []
+        self.dropped = []
+
+    def put(self, item):
+        while True:
+            try:
+                Queue.Queue.put(self, item, True, 1.0)
+                return
+            except Queue.Full:
+                if self.consumers and not any(t.is_alive() for t in self.consumers):
+                    while not self.empty():
+                        self.dropped.append(self.get_nowait())
+                    self.dropped.append(item)
+                    return
+
+
+def season_item(name):
+    """The (kind, year) of the archive `name`: ('season', year) for event
+    files, ('gamelog', year) for game logs, None for anything else."""
+    m = re.match(r'(\d{4})eve\.zip$', name)
+    if m:
+        return 'season', int(m.group(1))
+    m = re.match(r'gl(\d{4})\.zip$', name, re.I)
+    if m:
+        return 'gamelog', int(m.group(1))
+    return None
+
+
+def listing(client, config, years):
+    """The urls of the archives of `years` (all when empty) named on the
+    Retrosheet pages, like download.py queues them."""
+    sources = [('dl_eventfiles', 'eventfiles_url', r'(\d{4}?)eve\.zip', 'http://www.retrosheet.org/events/%seve.zip'),
+               ('dl_gamelogs', 'gamelogs_url', r'gl(\d{4})\.zip', 'http://www.retrosheet.org/gamelogs/gl%s.zip')]
+    urls = []
+    for option, page, pattern, url in sources:
+        if not config.getboolean('download', option):
+            continue
+        html = client.read(config.get('retrosheet', page))
+        for match in re.finditer(pattern, html, re.S):
+            # a season is queued once, however many links there are to it
+            if (not years or int(match.group(1)) in years) and url % match.group(1) not in urls:
+                urls.append(url % match.group(1))
+    return urls
+
+
+def local_names(options, years):
+    """The archive names of the seasons and game logs of `years` (all when
+    empty) already in the download directory, for runs without download."""
+    path = options['path']
+    names = ['%deve.zip' % year for year in sorted(archives.seasons(path)) if not years or year in years]
+    if 'gamelogs' in options['modules']:
+        names.extend('gl%d.zip' % year for year in sorted(gamelogs.gamelog_files(path, years)))
+    return names
+
+
+def convert_stage(inbox, outbox, pool, options, state):
+    """Convert the seasons of the archive urls read from `inbox` whose files
+    changed since they were loaded, and pass them on to `outbox` as (kind,
+    year, sources, problems). Game logs are passed on as they are."""
+    path, csvpath = options['path'], options['csvpath']
+    while True:
+        url = inbox.get()
+        if url is None:
+            break
+
+        item = season_item(os.path.basename(url))
+        if item is None:
+            continue
+        kind, year = item
+        if kind == 'gamelog':
+            outbox.put((kind, year, None, []))
+            continue
+
+        try:
+            sources = parse.season_sources(path, year)
+        except Exception, e:
+            outbox.put((kind, year, None, [str(e).strip()]))
+            continue
+        with state['lock']:
+            previous = state['manifest']['seasons'].get(str(year), {})
+        if not sources or previous.get('sources') == sources:
+            if options['verbose']:
+                print 'season %d did not change' % year
+            continue
+
+        # a season that fails is reported by the load stage, without
+        # stopping the others
+        problems = []
+        try:
+            if not options['stream']:
+                for table in ('events', 'games'):
+                    output = '%s/%s-%d.csv' % (csvpath, table, year)
+                    if previous and os.path.isfile(output):
+                        os.remove(output) # converted from an older version of the sources
+
+                if options['native']:
+                    jobs, runner = parse.native_jobs([year], path, csvpath), eventparser.run_native
+                else:
+                    jobs, runner = parse.chadwick_jobs([year], options['chadwick'], path, csvpath), parse.run_chadwick
+                for (name, code), seconds in pool.map(parse.timed_job, [(runner, job) for job in jobs]):
+                    timing.record('convert', name, seconds, code=code)
+                    if code != 0:
+                        problems.append('%s failed with exit code %s' % (name, code))
+                if options['native']:
+                    eventparser.merge_jobs(jobs)
+        except Exception, e:
+            problems.append(str(e).strip())
+
+        outbox.put((kind, year, sources, problems))
+
+
+def load_gamelog(year, conn, options, state):
+    """Load the game log of `year` unless it was loaded before."""
+    file = gamelogs.gamelog_files(options['path'], [year]).get(year)
+    if file is None:
+        return
+
+    digest = parse.file_hash(file)
+    with state['lock']:
+        logs = state['manifest'].setdefault('gamelogs', {})
+        if logs.get(str(year), {}).get('source') == digest:
+            return
+
+    try:
+        with timing.timed('gamelog', str(year)) as counts:
+            counts['rows'] = parse.load_gamelog(archives.open_text(file), conn, year, options['bound_param'],
+                                                options['chunk_size'])
+    except Exception, e:
+        print 'game log %d failed: %s' % (year, str(e).strip())
+        return
+
+    print 'loaded %d games from %s' % (counts['rows'], os.path.basename(file))
+    with state['lock']:
+        logs[str(year)] = {'source': digest, 'rows': counts['rows'], 'loaded': time.strftime('%Y-%m-%d %H:%M:%S')}
+        parse.write_manifest(state['manifest_file'], state['manifest'])
+
+
+def load_stage(inbox, db, options, state):
+    """Load the seasons and game logs read from `inbox` over a connection of
+    this thread's own, recording each season in the manifest. A season that
+    fails, or that finds no connection, is reported without stopping the
+    thread, which keeps reading `inbox` so the convert stage never waits on
+    it."""
+    try:
+        conn = db.connect()
+    except Exception, e:
+        conn, error = None, 'cannot connect: %s' % str(e).strip()
+    saved_pragmas = parse.sqlite_pragmas(conn, parse.SQLITE_BULK_PRAGMAS) if conn and options['sqlite_bulk'] else []
+    try:
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+
+            kind, year, sources, problems = item
+            if kind == 'gamelog':
+                if 'gamelogs' not in options['modules']:
+                    continue
+                if conn is None:
+                    print 'game log %d failed: %s' % (year, error)
+                else:
+                    load_gamelog(year, conn, options, state)
+                continue
+
+            start = time.time()
+            entry = None
+            if not problems and conn is None:
+                problems = [error]
+            elif not problems:
+                try:
+                    if 'teams' in options['modules']:
+                        # teams are shared by the seasons loaded at the same time
+                        with state['teams_lock']:
+                            parse.load_teams(year, conn, options, state['team_keys'])
+
+                    with state['lock']:
+                        previous = state['manifest']['seasons'].get(str(year), {})
+                    entry, problems = timing.profiled('load', 'season %d' % year, parse.load_year, year, conn, options,
+                                                      sources, previous, state['roster_keys'], state['fresh'])
+                except Exception, e:
+                    entry, problems = None, [str(e).strip()]
+
+            elapsed = time.time() - start
+            timing.record('season', str(year), elapsed, failed=bool(problems))
+            print ('season %d %s in %.1fs %s' % (year, 'failed' if problems else 'loaded', elapsed, '; '.join(problems))).rstrip()
+
+            with state['lock']:
+                state['report'].append((year, problems, elapsed))
+                if entry is not None:
+                    entry['loaded'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                    state['manifest']['seasons'][str(year)] = entry
+                    parse.write_manifest(state['manifest_file'], state['manifest'])
+    finally:
+        if saved_pragmas:
+            parse.sqlite_pragmas(conn, saved_pragmas)
+        if conn is not None:
+            conn.close()
+
+
+def start_threads(count, target, *args):
+    threads = []
+    for i in range(count):
+        t = threading.Thread(target=target, args=args)
+        t.daemon = True # don't outlive a failure of the main thread
+        t.start()
+        threads.append(t)
+    return threads
+
+
+def stop_threads(threads, queue):
+    """Queue a None for every thread reading `queue` and wait for them."""
+    for thread in threads:
+        queue.put(None)
+    for thread in threads:
+        thread.join()
+
+
+def main():
+    config = ConfigParser.ConfigParser()
+    config.readfp(open('config.ini'))
+    config = parse.env_to_config(config)
+    timing.configure(config)
+    options = parse.read_options(config)
+    parse.check_chadwick(options)
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "y:fn")
+        years = parse.parse_years([a for o, a in opts if o == '-y'])
+    except (getopt.GetoptError, ValueError):
+        print 'Invalid arguments, use e.g. -y 2004, -y 1990-1995, -f or -n'
+        raise SystemExit
+    force = ('-f', '') in opts
+    download = ('-n', '') not in opts
+
+    path = options['path']
+    if not os.path.exists(options['csvpath']):
+        os.makedirs(options['csvpath'])
+    os.chdir(path)
+
+    try:
+        # conn stays checked out, next to one connection per load worker
+        db = parse.get_engine(config, options['load_workers'] + 1)
+        conn = db.connect()
+    except Exception, e:
+        print('Cannot connect to database: %s' % e)
+        raise SystemExit
+
+    manifest_file = '%s/manifest.json' % options['csvpath']
+    database = '%s/%s' % (config.get('database', 'engine'), config.get('database', 'database'))
+    parse.restore_indexes(conn, manifest_file, database, options['verbose'])
+    manifest = {} if force else parse.read_manifest(manifest_file)
+    if manifest.get('database') != database:
+        manifest = {'database': database, 'seasons': {}}
+
+    modules = options['modules']
+    tables = [t for t in ('games', 'events') if t in modules]
+    fresh, deferred = parse.prepare_tables(conn, tables, force, options['sqlite_bulk'])
+    manifest['deferred'] = deferred # until they are built
+    parse.write_manifest(manifest_file, manifest)
+    state = {'lock': threading.Lock(), 'teams_lock': threading.Lock(),
+             'manifest': manifest, 'manifest_file': manifest_file, 'fresh': fresh, 'report': [],
+             'team_keys': parse.table_keys(conn, 'teams', ['team_id']) if 'teams' in modules else set(),
+             'roster_keys': parse.table_keys(conn, 'rosters', ['year', 'player_id', 'team_tx']) if 'rosters' in modules else set()}
+
+    # the worker processes are forked before any thread is started
+    pool = None if options['stream'] else multiprocessing.Pool(options['num_workers'])
+
+    downloaded = StageQueue()
+    converted = StageQueue()
+    failures = []
+    try:
+        # every season takes two conversion jobs, events and games
+        loaders = start_threads(options['load_workers'], load_stage, converted, db, options, state)
+        converters = start_threads(max(1, options['num_workers'] / 2), convert_stage, downloaded, converted,
+                                   pool, options, state)
+        converted.consumers, downloaded.consumers = loaders, converters
+
+        if download:
+            # the download threads extract the archives themselves, so a
+            # season is complete once it reaches `downloaded`
+            fetch_options = {}
+            fetch_options['verbose'] = options['verbose']
+            fetch_options['retries'] = 5 if not config.has_option('download', 'retries') else config.getint('download', 'retries')
+            fetch_options['backoff'] = 1.0 if not config.has_option('download', 'backoff') else config.getfloat('download', 'backoff')
+            fetch_options['extract'] = True if not config.has_option('download', 'extract') else config.getboolean('download', 'extract')
+
+            num_threads = config.getint('download', 'num_threads')
+            rate_limit = 0 if not config.has_option('download', 'rate_limit') else config.getfloat('download', 'rate_limit')
+            client = HttpClient(num_threads, rate_limit)
+            cache = DownloadCache('%s/downloads.json' % path)
+            if force:
+                cache.entries = {}
+
+            urls = Queue.Queue()
+            fetchers = []
+            for i in range(num_threads):
+                t = Fetcher(urls, path, fetch_options, cache, failures, client, done=downloaded)
+                t.daemon = True
+                t.start()
+                fetchers.append(t)
+
+            for url in listing(client, config, years):
+                urls.put(url)
+            stop_threads(fetchers, urls)
+            cache.save()
+        else:
+            for name in local_names(options, years):
+                downloaded.put(name)
+
+        stop_threads(converters, downloaded)
+        stop_threads(loaders, converted)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        parse.add_secondary_indexes(conn, tables, deferred)
+        parse.build_indexes(db, conn, deferred, options['load_workers'], options['verbose'])
+        with state['lock']:
+            del manifest['deferred']
+            parse.write_manifest(manifest_file, manifest)
+        conn.close()
+
+    # seasons left over by stages that died
+    report = state['report']
+    for name in downloaded.dropped:
+        item = season_item(os.path.basename(name)) if name else None
+        if item and item[0] == 'season':
+            report.append((item[1], ['not converted, the convert threads stopped'], 0.0))
+    for item in converted.dropped:
+        if item and item[0] == 'season':
+            report.append((item[1], ['not loaded, the load threads stopped'], 0.0))
+    if report:
+        print 'season   result   seconds'
+        for year, problems, elapsed in sorted(report):
+            print ('%6d   %-6s %9.1f   %s' % (year, 'failed' if problems else 'ok', elapsed, '; '.join(problems))).rstrip()
+    print '%d of %d changed seasons loaded' % (len([r for r in report if not r[1]]), len(report))
+
+    timing.report()
+
+    if failures:
+        print "%d downloads failed:" % len(failures)
+        for url, error in sorted(failures):
+            print "  %s: %s" % (url, error)
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
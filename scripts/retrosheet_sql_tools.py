@@ -21,13 +21,17 @@ It has two main purposes:
    - woba_pts_expected : placeholder for woba_pts expected 
                          from the matchup of batter vs pitcher. 
 
-   the location of the sun computations require PyEphem
-   http://rhodesmill.org/pyephem/
+   the location of the sun is computed for all the events of a batch at 
+   once with numpy (classes/solar.py), which matches PyEphem 
+   http://rhodesmill.org/pyephem/ to 0.02 degrees
 
    the time computations require timezone information, 
    to translate everything to a common timezone (UTC)
    pytz: http://pytz.sourceforge.net
-   tzwhere: https://github.com/pegler/pytzwhere/tree/master/tzwhere
+   the time zone of every park is read from 
+   external_data/seamheads_parks_tz.json (classes/parkzones.py), 
+   which is rebuilt with tzwhere: 
+   https://github.com/pegler/pytzwhere/tree/master/tzwhere
 
    This file can be imported to get access to the methods, or run via:
    python retrosheet_sql_tools.py 
@@ -57,7 +61,8 @@ It has two main purposes:
    maxyr = 2004
    rs = retrosheet_sql_tools.retrosheet_sql(cfgFile=configFileLocation)
    rs.updateSchema()
-   rs.computeValueAdded(minyr=minyr, maxyr=maxyr)
+   rs.writeSqlFile(rs.computeValueAdded(minyr=minyr, maxyr=maxyr), 'VARD.sql', 
+                   statements=rs.playoffFlagSql(minyr=minyr, maxyr=maxyr))
   
    q = 'select tto, avg(woba_pts) as wo, avg(woba_pts_expected) as wx from retrosheet.events where year_id=2004 and woba_pts>=0 and pit_start_fl=\'T\' group by tto'
    data = rs.sqlQueryToArray(q)
@@ -69,15 +74,116 @@ import json
 import sqlalchemy
 import ConfigParser
 import os, sys
+import time
 import datetime
 import decimal
+import itertools
 import numpy as np
-import ephem
-import pytz
-from tzwhere import tzwhere
+from classes import timing
+from classes import solar
+from classes import parkzones
 
 bump = 1
 
+# widest string column sized from the cursor description; wider or unknown
+# sizes are taken from the longest value instead
+MAX_DESCRIBED_WIDTH = 1024
+
+# first day of the playoffs of the seasons the median-games heuristic of 
+# makePlayoffFlags gets wrong, as (month, day)
+PLAYOFF_STARTS = {1950: (10, 4), 
+                  1951: (10, 4), 
+                  1952: (10, 1), 
+                  1953: (9, 30), 
+                  1981: (10, 6), 
+                  1994: (12, 31), 
+                  1995: (10, 3)}
+
+class ColumnBuffer(object):
+    ''' One column of a query result, filled a batch of rows at a time into
+    a numpy array that doubles in size when it is full. The type follows the
+    values that are not NULL: 'i4' (or 'i8' for long or large integers),
+    'f8' for floats and decimals, and strings as wide as the longest value.
+    NULLs are NaN, turning an integer column into 'f8', and empty strings.
+    '''
+
+    RANKS = {None: 0, 'i': 1, 'f': 2, 'S': 3}
+
+    def __init__(self, name, width=0, capacity=1024):
+        self.name = name
+        self.kind = None # until a value that is not NULL
+        self.width = width
+        self.longest = 1
+        self.wide = False
+        self.nulls = False
+        self.size = 0
+        self.data = np.empty(max(capacity, 1), 'f8')
+
+    def dtype(self):
+        if self.kind == 'S':
+            return 'S%d' % max(self.width, self.longest)
+        if self.kind == 'i' and not self.nulls:
+            return 'i8'
+        return 'f8'
+
+    def convert(self, values, kind):
+        if kind == 'i':
+            return np.array(values, 'i8')
+        if kind == 'S':
+            strs = ['' if x is None else x.encode('utf-8') if isinstance(x, unicode) else str(x) for x in values]
+            self.longest = max(self.longest, max(len(x) for x in strs))
+            return np.array(strs, 'S%d' % self.longest)
+        return np.array([np.nan if x is None else float(x) for x in values], 'f8')
+
+    def append(self, values):
+        types = set(type(x) for x in values)
+        if type(None) in types:
+            self.nulls = True
+            types.discard(type(None))
+        if long in types:
+            self.wide = True
+
+        if not types:
+            kind = None
+        elif types <= set([int, long, bool]):
+            kind = 'i'
+        elif types <= set([int, long, bool, float, decimal.Decimal]):
+            kind = 'f'
+        else:
+            kind = 'S'
+        if self.RANKS[kind] > self.RANKS[self.kind]:
+            self.kind = kind
+
+        batch = self.convert(values, 'f' if self.kind == 'i' and self.nulls else self.kind)
+        if self.kind == 'i' and len(batch) and (batch.min() < -2**31 or batch.max() >= 2**31):
+            self.wide = True
+
+        dtype = np.dtype(self.dtype())
+        if self.data.dtype != dtype:
+            self.data = self.data.astype(dtype)
+        if self.size + len(batch) > len(self.data):
+            grown = np.empty(max(2*len(self.data), self.size + len(batch)), dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:self.size + len(batch)] = batch
+        self.size += len(batch)
+
+    def resultDtype(self):
+        ''' The type of the finished column: integers narrowed to 'i4' and
+        strings to the longest value where they fit. '''
+        if self.kind == 'i' and not self.nulls and not self.wide:
+            return 'i4'
+        if self.kind == 'S':
+            return 'S%d' % self.longest
+        return self.dtype()
+
+    def take(self):
+        ''' The filled part of the column, which the buffer lets go of. '''
+        data = self.data[:self.size]
+        self.data = None
+        return data
+
+
 class retrosheet_sql:
 
 ##########################
@@ -109,6 +215,7 @@ class retrosheet_sql:
             raise SystemExit
 
         self.config=config
+        timing.configure(config)
         self.mysql_db = config.get('database', 'database')
 
         self.cursor = self.conn.connection.cursor()
@@ -116,14 +223,14 @@ class retrosheet_sql:
 
         self.TABLE_NAMES = {}
 
-        self.TABLE_NAMES['TBL_RETRO_PARKCODE'] = '%s.parkcode' % self.mysql_db
-        self.TABLE_NAMES['TBL_RETRO_EVENTS'] = '%s.events' % self.mysql_db
-        self.TABLE_NAMES['TBL_RETRO_GAMES'] = '%s.games' % self.mysql_db
-        self.TABLE_NAMES['TBL_RETRO_LAST_DAY'] = '%s.last_day' % self.mysql_db
+        # on sqlite the database is a file name, not a qualifier
+        prefix = '' if config.get('database', 'engine') == 'sqlite' else '%s.' % self.mysql_db
+        self.TABLE_NAMES['TBL_RETRO_PARKCODE'] = '%sparkcode' % prefix
+        self.TABLE_NAMES['TBL_RETRO_EVENTS'] = '%sevents' % prefix
+        self.TABLE_NAMES['TBL_RETRO_GAMES'] = '%sgames' % prefix
+        self.TABLE_NAMES['TBL_RETRO_LAST_DAY'] = '%slast_day' % prefix
         self.TABLE_NAMES['TBL_FGGUTS'] = 'mlb.fgGuts'
 
-        self.eventUpdateData = {}
-
         self.rad2deg = 180.0/np.pi
         self.deg2rad = 1.0/self.rad2deg
 
@@ -208,68 +315,68 @@ class retrosheet_sql:
 
 
 ###############
-    def resultToNpDtype(self, keys, row, vbose=0):
-        ''' Given a result row from a sql query, determine data type, 
-        and generate a corresponding numpy.dtype object 
+    def streamingCursor(self, conn=None):
+        ''' A cursor of conn (default self.conn) that leaves the result of 
+        its query on the server until it is fetched: a named cursor on 
+        postgres, an unbuffered one on mysql, and a plain one (self.cursor 
+        for self.conn) elsewhere. 
         '''
-        arr = []
-        for i, k in enumerate(keys):
-            x = row[i]
-            if vbose>=1:
-                print k, x, type(x)
-            if type(x)==type(1):
-                s = (k, 'i4')
-            elif type(x)==type(1L):
-                s = (k, 'i8')
-            elif type(x)==type(decimal.Decimal(1)):
-                s = (k, 'f8')
-            elif type(x)==type(1.0):
-                s = (k, 'f8')
-            else:
-                s = (k, 'S256')
-            arr.append(s)
-
-        dt = np.dtype(arr)
-        if vbose>=1:
-            print 'dtype', arr, dt
-        return dt
-
-###############
-    def descriptToKeys(self):
-        return [d[0] for d in self.cursor.description]
+        conn = conn or self.conn
+        driver = conn.engine.driver
+        if driver == 'psycopg2':
+            self.cursorCount = getattr(self, 'cursorCount', 0) + 1
+            return conn.connection.cursor('sql_query_to_array_%d' % self.cursorCount)
+        if driver == 'mysqldb':
+            import MySQLdb.cursors
+            return conn.connection.cursor(MySQLdb.cursors.SSCursor)
+        return self.cursor if conn is self.conn else conn.connection.cursor()
 
 ###############
-    def sqlQueryToArray(self, q, vbose=0):
+    def sqlQueryToArray(self, q, vbose=0, batchSize=10000):
         ''' Given a sql query, execute the query, and return the results 
-        in a numpy array. The data type of each column automatically 
-        determined, and an appropriate numpy.dtype object is created 
-        and filled.
+        in a numpy array. The rows are fetched batchSize at a time into 
+        a typed array per column (see ColumnBuffer), so the result is 
+        never held as python objects all at once. The data type of each 
+        column is determined from all of its values, NULLs included, 
+        and string columns are sized from the cursor description or 
+        their longest value. Returns [] if there are no rows.
         '''
-        self.cursor.execute(q)
-        rows = self.cursor.fetchall()
-        if len(rows)==0:
-            return []
-
-        row = rows[0]
-
-        keys = self.descriptToKeys()
-
-        dt = self.resultToNpDtype(keys, row, vbose=vbose)
-
-        data = []
-        for row in rows:
-            tmp = []
-            if vbose>=1:
-                print '********************'
-            for i, k in enumerate(keys):
-                x = row[i]
-                if vbose>=1:
-                    print k, row[i]
-                tmp.append(x)
-            data.append(tuple(tmp))
+        start = time.time()
+        cursor = self.streamingCursor()
+        try:
+            cursor.execute(q)
+            rows = cursor.fetchmany(batchSize)
+            if len(rows)==0:
+                timing.record('query', ' '.join(q.split())[:200], time.time()-start, rows=0)
+                return []
+
+            # sized for the first batch and doubled as needed: the rowcount
+            # of a streaming cursor is no row count (2**64-1 on an SSCursor)
+            columns = []
+            for d in cursor.description:
+                # display_size or internal_size, where the driver knows it
+                sizes = [x for x in d[2:4] if isinstance(x, (int, long)) and 0 < x <= MAX_DESCRIBED_WIDTH]
+                columns.append(ColumnBuffer(d[0], max(sizes) if sizes else 0, len(rows)))
+
+            n = 0
+            while rows:
+                for column, values in zip(columns, zip(*rows)):
+                    column.append(values)
+                n += len(rows)
+                rows = cursor.fetchmany(batchSize)
+        finally:
+            if cursor is not self.cursor:
+                cursor.close()
+        timing.record('query', ' '.join(q.split())[:200], time.time()-start, rows=n)
+
+        # move the columns into the record array one at a time
+        dt = np.dtype([(c.name, c.resultDtype()) for c in columns])
         if vbose>=1:
-            print data
-        return np.array(data, dtype=dt)
+            print 'dtype', dt
+        data = np.empty(n, dtype=dt)
+        for column in columns:
+            data[column.name] = column.take()
+        return data
 
 ###############
     def readFgGutsJson(self, gutsFile='external_data/fgGuts.json'):
@@ -360,8 +467,7 @@ class retrosheet_sql:
         if vbose:
             print q
 
-        self.cursor.execute(q)
-        rows = self.sqlQueryToArray()
+        rows = self.sqlQueryToArray(q)
 
         if lGrouped:
             data = {}
@@ -382,105 +488,71 @@ class retrosheet_sql:
 
 
 ##########################
-    def makePlayoffFlag(self, yrid, vbose=0):
-#        datetime.datetime.
-        ''' Use some heuristics to automatically determine which games 
-        are playoffs and which are regular season. Returns a dictionary. 
-        The key 'gids' has a value which is a dictionary of 
-        game_id-playoff_flag pairs. playoff_flag is an integer, 
-        0=regular season, 1=playoffs
+    def makePlayoffFlags(self, minyr=1950, maxyr=2014, vbose=0):
+        ''' Use some heuristics to tell the playoff games from the regular 
+        season ones, for all the seasons from minyr to maxyr at once, over 
+        one array of games: the regular season of a year ends on the last game day of the teams that played the median 
+        number of games, unless PLAYOFF_STARTS says otherwise. Returns a 
+        dictionary of year-last regular season day pairs, the day as an 
+        integer yyyymmdd. Games after that day are playoffs. 
         '''
-        data = {}
+        q = 'select distinct a.* from (select game_id, away_team_id, home_team_id from %s where substr(game_id,4,4)>=\'%04d\' and substr(game_id,4,4)<=\'%04d\') a ' % (self.TABLE_NAMES['TBL_RETRO_GAMES'], minyr, maxyr)
 
-        q = 'select a.* from (select game_id, home_team_id, away_team_id, cast(substr(game_id,4,4) as unsigned) as year_id, cast(substr(game_id,8,2) as unsigned) as mn_id, cast(substr(game_id,10,2) as unsigned) as day_id, game_ct from %s group by game_id ) a where year_id=%d order by year_id, mn_id, day_id, game_ct ' % (self.TABLE_NAMES['TBL_RETRO_GAMES'], yrid)
-
-        tmp = []
-        rows = self.sqlQueryToArray(q)
-        for row in rows:
-            aa = row['away_team_id']
-            hh = row['home_team_id']
-            for t in [aa, hh]:
-                if not t in data:
-                    data[t] = {}
-                    data[t]['gid'] = []
-                    data[t]['ngame'] = 0
-                data[t]['ngame'] += 1
-                data[t]['gid'].append(row['game_id'])
+        rows = self.sqlQueryToArray(q, vbose=vbose)
+        if len(rows)==0:
+            return {}
+
+        # yyyymmdd out of each game_id, e.g. NYA200404060
+        gids = rows['game_id'].astype('S12')
+        days = gids.view('S1').reshape(-1, 12)[:,3:11].copy().view('S8').ravel().astype(int)
+
+        # every game counts for both teams
+        teams = np.concatenate([rows['away_team_id'], rows['home_team_id']])
+        days = np.concatenate([days, days])
+        codes, team = np.unique(teams, return_inverse=True)
+        seasons, season = np.unique((days/10000)*len(codes) + team, return_inverse=True)
+        ngame = np.bincount(season)
+        last = np.zeros(len(seasons), int)
+        np.maximum.at(last, season, days)
+        years = seasons/len(codes)
+
+        cutoffs = {}
+        for yr in [int(y) for y in np.unique(years)]:
+            sel = years==yr
+            mm = int(np.median(ngame[sel]))
+            full = last[sel][ngame[sel]==mm]
+            # no team played the median number of games: all playoffs
+            cutoffs[yr] = int(full.max()) if len(full) else 0
+            if yr in PLAYOFF_STARTS:
+                mn, day = PLAYOFF_STARTS[yr]
+                tt = datetime.date(yr, mn, day) - datetime.timedelta(1)
+                cutoffs[yr] = int(tt.strftime('%Y%m%d'))
 
-        if vbose>=1:
-            print 'data', data
+            if vbose>=1:
+                print yr, mm, cutoffs[yr]
 
-        for k in data:
-            tmp.append(data[k]['ngame'])
-        tmp = np.array(tmp)
-        mm = int(np.median(tmp))
+        return cutoffs
 
-        if vbose>=1:
-            print '*************'
-            print yrid, mm
-
-        max_time = -1
-        for k in data:
-            ng = data[k]['ngame']
-            if not ng==mm:
-                continue
-            gid = data[k]['gid'][-1]
-            yr = int(gid[3:3+4])
-            mn = int(gid[7:7+2])
-            day = int(gid[9:9+2])
-            tt = datetime.datetime(yr, mn, day)
-            ttI = tt.toordinal()
-#            print gid, yr, mn, day, tt, ttI
-            if ttI>max_time:
-                max_time=ttI
-            newtt = datetime.datetime.fromordinal(ttI)
-            if vbose>=1:
-                print k, data[k]['gid'][-1], ttI, \
-                    datetime.datetime.fromordinal(ttI), \
-                    newtt.year, newtt.month, newtt.day
-
-        hack = {}
-        hack[1950] = [10, 4]
-        hack[1951] = [10, 4]
-        hack[1952] = [10, 1]
-        hack[1953] = [9, 30]
-        hack[1981] = [10, 6]
-        hack[1994] = [12, 31]
-        hack[1995] = [10, 3]
-
-        if yrid in hack:
-            mn, day = hack[yrid]
-            tt = datetime.datetime(yrid, mn, day)
-            ttI = tt.toordinal()
-            max_time = ttI-1
-
-        ndata = {}
-        ndata['gids'] = {}
-        for k in data:
-            for gid in data[k]['gid']:
-                yr = int(gid[3:3+4])
-                mn = int(gid[7:7+2])
-                day = int(gid[9:9+2])
-                tt = datetime.datetime(yr, mn, day)
-                ttI = tt.toordinal()
-                if ttI > max_time:
-                    pflag = 1
-                else:
-                    pflag = 0
-                ndata['gids'][gid] = pflag
+##########################
+    def playoffFlagSql(self, minyr=1950, maxyr=2014, vbose=0):
+        ''' SQL statements that set playoff_flag of the games and events 
+        from minyr to maxyr, with one set based update per table: the games 
+        compare their date to the last regular season day of their year 
+        (makePlayoffFlags), and the events take the flag of their game. 
+        '''
+        cutoffs = self.makePlayoffFlags(minyr=minyr, maxyr=maxyr, vbose=vbose)
+        if not cutoffs:
+            return []
 
-        if vbose>=1:
-            print ndata
-        ndata['mm'] = mm
+        cases = ' '.join(['WHEN \'%04d\' THEN \'%08d\'' % (yr, cutoffs[yr]) for yr in sorted(cutoffs)])
+        years = 'substr(game_id,4,4)>=\'%04d\' AND substr(game_id,4,4)<=\'%04d\'' % (minyr, maxyr)
 
+        qs = []
+        qs.append('UPDATE %s SET playoff_flag = CASE WHEN substr(game_id,4,8) > CASE substr(game_id,4,4) %s END THEN 1 ELSE 0 END WHERE %s' % (self.TABLE_NAMES['TBL_RETRO_GAMES'], cases, years))
+        qs.append('UPDATE %s AS e SET playoff_flag = (SELECT g.playoff_flag FROM %s g WHERE g.game_id=e.game_id) WHERE %s' % (self.TABLE_NAMES['TBL_RETRO_EVENTS'], self.TABLE_NAMES['TBL_RETRO_GAMES'], years.replace('game_id', 'e.game_id')))
         if vbose>=1:
-            print yr, max_time
-        newtt = datetime.datetime.fromordinal(max_time)
-        ndata['newtt'] = newtt
-        ndata['max_time'] = max_time
-        ndata['tmp'] = tmp
-
-        return ndata
+            print qs
+        return qs
 
 ##########################
     def computeWoba(self
@@ -551,19 +623,6 @@ class retrosheet_sql:
             ans = None
         return wpts, pa, ans
 
-###############
-    def getEventCount(self, minyr=1950, maxyr=2014, vbose=0):
-        ''' Simple query to find the max event_id for each game_id. 
-        This is useful for estimating time stamps.
-        '''
-        q = 'select game_id, max(event_id) as total_events from events group by game_id'
-        dd = self.sqlQueryToArray(q)
-        aa = {}
-        for d in dd:
-            aa[d['game_id']] = d['total_events']
-        del dd
-        return aa
-
 ###############
     def getEventWoba(self, ev, yrid, vbose=0):
         ''' Given an event_cd, and a year, return the wOBA value 
@@ -592,14 +651,37 @@ class retrosheet_sql:
 
 
 ###############
-    def computeValueAdded(self, minyr=1950, maxyr=2014, vbose=0):
+    def iterQuery(self, q, conn=None, batchSize=10000):
+        ''' Execute q on a streaming cursor of conn (default self.conn), 
+        and yield its rows as dictionaries keyed by lower case column name, 
+        fetching batchSize rows at a time. 
+        '''
+        start = time.time()
+        cursor = self.streamingCursor(conn)
+        n = 0
+        try:
+            cursor.execute(q)
+            keys = None
+            rows = cursor.fetchmany(batchSize)
+            while rows:
+                if keys is None:
+                    keys = [d[0].lower() for d in cursor.description]
+                for row in rows:
+                    yield dict(zip(keys, row))
+                n += len(rows)
+                rows = cursor.fetchmany(batchSize)
+        finally:
+            if cursor is not self.cursor:
+                cursor.close()
+            timing.record('query', ' '.join(q.split())[:200], time.time()-start, rows=n)
+
+###############
+    def computeValueAdded(self, minyr=1950, maxyr=2014, vbose=0, batchGames=500):
         ''' Compute the "Value Added" variables. 
 
         for games table:
-        - playoff_flag
         - year_id
         for events table:
-        - playoff_flag
         - year_id
         - time_since_1900 : an integer giving the number of seconds since Jan 1, 1900, UTC
         - tto : times through the order
@@ -607,6 +689,14 @@ class retrosheet_sql:
         - woba_pts : woba_pts for the event
         - woba_pts_expected : placeholder for woba_pts expected from the matchup of batter vs pitcher. 
 
+        This is a generator. The events are read a game at a time from a 
+        streaming cursor, on a connection of their own, and the values are 
+        yielded every batchGames games as 
+        {'TBL_RETRO_GAMES': [one dict per game], 
+         'TBL_RETRO_EVENTS': [one dict per event]}, 
+        so memory use does not grow with the number of years. 
+        playoff_flag is set for all of them at once by the statements of 
+        playoffFlagSql. 
 '''
 
         if self.guts is None:
@@ -615,25 +705,67 @@ class retrosheet_sql:
         if self.seamheads is None:
             self.seamheads = self.getSeamheadsParksData()
 
-        aptz = {}
-        tzw = tzwhere.tzwhere()
-        sun = ephem.Sun()
-
-        aa_total_events = self.getEventCount()
-        pflags = {}
+        zones = parkzones.ParkZones()
 
-
-        q = 'select a.*, b.event_id, b.event_cd, b.bat_id, b.pit_id, b.bat_lineup_id from (select game_id, start_game_tm, minutes_game_ct, park_id, daynight_park_cd, cast(substr(game_id, 4, 4) as unsigned) as year_id, cast(substr(game_id, 8, 2) as unsigned) as mn_id, cast(substr(game_id, 10, 2) as unsigned) as day_id from %s) a inner join %s b on a.game_id=b.game_id where a.year_id>=%d and a.year_id<=%d ' % (self.TABLE_NAMES['TBL_RETRO_GAMES'], self.TABLE_NAMES['TBL_RETRO_EVENTS'], minyr, maxyr)
+        q = 'select a.*, b.event_id, b.event_cd, b.bat_id, b.pit_id, b.bat_lineup_id from (select game_id, start_game_tm, minutes_game_ct, park_id, daynight_park_cd, cast(substr(game_id, 4, 4) as unsigned) as year_id, cast(substr(game_id, 8, 2) as unsigned) as mn_id, cast(substr(game_id, 10, 2) as unsigned) as day_id from %s) a inner join %s b on a.game_id=b.game_id where a.year_id>=%d and a.year_id<=%d order by a.year_id, a.game_id, b.event_id ' % (self.TABLE_NAMES['TBL_RETRO_GAMES'], self.TABLE_NAMES['TBL_RETRO_EVENTS'], minyr, maxyr)
 
         if vbose>=1:
             print q
-        data = self.sqlQueryToArray(q)
 
-        rdata = {}
-        rdata['TBL_RETRO_GAMES'] = []
-        rdata['TBL_RETRO_EVENTS'] = []
+        conn = self.conn.engine.connect()
+        stream = self.iterQuery(q, conn=conn)
+        try:
+            rdata = {'TBL_RETRO_GAMES': [], 'TBL_RETRO_EVENTS': []}
+            suns = []
+            for gid, rows in itertools.groupby(stream, lambda d: d['game_id']):
+                game, events = self.gameValueAdded(list(rows), zones, suns, vbose=vbose)
+                rdata['TBL_RETRO_GAMES'].append(game)
+                rdata['TBL_RETRO_EVENTS'].extend(events)
+
+                if len(rdata['TBL_RETRO_GAMES'])>=batchGames:
+                    self.addSunPosition(suns)
+                    yield rdata
+                    rdata = {'TBL_RETRO_GAMES': [], 'TBL_RETRO_EVENTS': []}
+                    suns = []
+
+            if rdata['TBL_RETRO_GAMES']:
+                self.addSunPosition(suns)
+                yield rdata
+        finally:
+            stream.close()
+            conn.close()
+
+###############
+    def addSunPosition(self, suns):
+        ''' Set sun_alt and sun_az of the events in suns, a list of (events 
+        table values, UTC seconds since 1970, park latitude, park longitude) 
+        tuples, with one vectorized solar.position call. The park altitude 
+        is left out, as it was for PyEphem at its default pressure. 
+        '''
+        if not suns:
+            return
+        mvals, unix, lat, lon = zip(*suns)
+        alt, az = solar.position(np.array(unix), np.array(lat), np.array(lon))
+        for mval, a, z in zip(mvals, alt, az):
+            mval['sun_alt'] = float(a)
+            mval['sun_az'] = float(z)
+
+###############
+    def gameValueAdded(self, rows, zones, suns, vbose=0):
+        ''' Compute the "Value Added" variables of one game from its event 
+        rows, in event_id order. zones is the parkzones.ParkZones of the 
+        parks. 
+        The events that need the position of the sun are added to suns, 
+        for addSunPosition. Returns the games table values and the list of 
+        events table values. 
+        '''
         aTTO = {}
-        for d in data:
+        events = []
+
+        # the events of the game are all here, so their number is too
+        total_events = max(d['event_id'] for d in rows)
+
+        for d in rows:
             mval = {}        
             if vbose>=1:
                 print d
@@ -647,22 +779,13 @@ class retrosheet_sql:
             mn = int(gid[7:7+2])
             dy = int(gid[9:9+2])
 
-            if not yr in pflags:
-                pflags[yr] = self.makePlayoffFlag(yr)['gids']
-
             mval['year_id'] = yr
-            mval['playoff_flag'] = pflags[yr][gid]
             
             park = d['park_id']
 
 
             lat = float(self.seamheads[park]['Latitude'])
             lon = float(self.seamheads[park]['Longitude'])
-            elev = float(self.seamheads[park]['Altitude'])
-            if not park in aptz:
-                aptz[park] = tzw.tzNameAt(lat, lon)
-            tz = aptz[park]
-            tzi = pytz.timezone(tz)
 
             dt = d['minutes_game_ct']
             st = d['start_game_tm']
@@ -675,27 +798,19 @@ class retrosheet_sql:
             tstart = datetime.datetime(yr, mn, dy, shrs, smins, 0, 0)
             x = datetime.timedelta(0,int(dt*60))
             tend = tstart + x
-            dn = (1.0*dt)/aa_total_events[gid]
+            dn = (1.0*dt)/total_events
 
             t0 = datetime.datetime(1900, 1, 1, 0, 0, 0)
-            t0 = tzi.localize(t0).astimezone(pytz.utc)
+            t0 = zones.utc(park, t0)
             
             if dt>0:
-                obs = ephem.Observer()
                 if vbose>=1:
                     print 'dn', dn, 'ev_id', ev_id
                 x = datetime.timedelta(0,np.floor(dn*(ev_id-1)*60)) 
-                blah = tzi.localize(tstart + x).astimezone(pytz.utc)
-                obs.date = blah
-                sun.compute(obs)
+                blah = zones.utc(park, tstart + x)
                 x_1900 = (blah-t0).days*86400 + (blah-t0).seconds
 
-                obs.lat  = lat*self.deg2rad
-                obs.long = lon*self.deg2rad
-                obs.elev = elev
-                                
-                mval['sun_alt'] = float(sun.alt)*self.rad2deg
-                mval['sun_az'] = float(sun.az)*self.rad2deg
+                suns.append((mval, solar.unix_seconds(blah), lat, lon))
                 mval['time_since_1900'] = x_1900
 
             k = '%s_%s' % (gid, pid)
@@ -706,76 +821,72 @@ class retrosheet_sql:
             aTTO[k][bl] += 1
             mval['tto'] = aTTO[k][bl]
 
-            if not gid in self.eventUpdateData:
-                self.eventUpdateData[gid] = {}
-            self.eventUpdateData[gid][ev_id] = {}
-            self.eventUpdateData[gid][ev_id]['tto'] = aTTO[k][bl]
-
             woba_pts = self.getEventWoba(ev_cd, yr, vbose=vbose)
             if not woba_pts is None:
-                self.eventUpdateData[gid][ev_id]['woba_pts'] = woba_pts
                 mval['woba_pts'] = woba_pts
             if vbose>=1:
-                print gid, ev_id, ev_cd, yr, aTTO[k][bl],  aa_total_events[gid]
+                print gid, ev_id, ev_cd, yr, aTTO[k][bl], total_events
             
-            tmp = {}
-
             mval['game_id'] = gid
             mval['event_id'] = ev_id
-            rdata['TBL_RETRO_GAMES'].append({'game_id' : mval['game_id'], 'playoff_flag' : mval['playoff_flag'], 'year_id' : mval['year_id']})
-            rdata['TBL_RETRO_EVENTS'].append(mval)
+            events.append(mval)
 
-        return rdata
+        game = {'game_id' : events[0]['game_id'], 'year_id' : events[0]['year_id']}
+        return game, events
 
 ##########################
-    def writeSqlFile(self, rdata, ofile, n2print=10000):
-        ''' Writes the data in rdata to the file ofile. Prints every 
-        n2print-th value to stdout.
+    def writeSqlFile(self, rdata, ofile, n2print=10000, statements=None):
+        ''' Writes the data in rdata to the file ofile. rdata is a 
+        dictionary of table keys and rows, or an iterable of them such as 
+        computeValueAdded, which is written a batch at a time. The SQL 
+        statements in statements, such as those of playoffFlagSql, are 
+        written first. Prints every n2print-th value to stdout. Returns the 
+        rows written per table key. 
         '''
  
         ofp = open(ofile, 'w')
 
-        pks = ['game_id', 'event_id']
-
-        gdone = {}
+        for ts in statements or []:
+            ofp.write('%s ; \n' % ts)
 
-        for t in rdata.keys():
-            tname = self.TABLE_NAMES[t]
-            for i, r in enumerate(rdata[t]):
-                ts = 'UPDATE %s SET ' % tname
-                ks = r.keys()
-                for pk in pks:
-                    try:
-                        ks.remove(pk)
-                    except ValueError:
-                        pass
-
-                for k in ks[0:-1]:
-                    ts += ' %s=%s, ' % (k, str(r[k]))
+        pks = ['game_id', 'event_id']
 
-                k = ks[-1]
-                ts += ' %s=%s ' % (k, str(r[k]))
+        counts = {}
+
+        batches = [rdata] if isinstance(rdata, dict) else rdata
+        for batch in batches:
+            for t in batch.keys():
+                tname = self.TABLE_NAMES[t]
+                for r in batch[t]:
+                    i = counts.get(t, 0)
+                    counts[t] = i + 1
+
+                    ts = 'UPDATE %s SET ' % tname
+                    ks = r.keys()
+                    for pk in pks:
+                        try:
+                            ks.remove(pk)
+                        except ValueError:
+                            pass
+
+                    for k in ks[0:-1]:
+                        ts += ' %s=%s, ' % (k, str(r[k]))
+
+                    k = ks[-1]
+                    ts += ' %s=%s ' % (k, str(r[k]))
             
-                if t=='TBL_RETRO_GAMES':
-                    ts += ' WHERE GAME_ID=%s' % r['game_id']
-                else:
-                    ts += ' WHERE GAME_ID=%s AND EVENT_ID=%d' % (r['game_id'], r['event_id'])
-
-                    
-                if t=='TBL_RETRO_GAMES':
-                    if r['game_id'] in gdone:
-                        continue
+                    if t=='TBL_RETRO_GAMES':
+                        ts += ' WHERE GAME_ID=%s' % r['game_id']
                     else:
-                        ofp.write('%s ; \n' % ts)
-                        gdone[r['game_id']] = 1
+                        ts += ' WHERE GAME_ID=%s AND EVENT_ID=%d' % (r['game_id'], r['event_id'])
 
-                else: 
                     ofp.write('%s ; \n' % ts)
 
-                if i%n2print==0:
-                    print t, 'rdata', i, r
+                    if i%n2print==0:
+                        print t, 'rdata', i, r
     
         ofp.close()
+        return counts
 
 ##########################
 if __name__=='__main__':
@@ -804,9 +915,14 @@ if __name__=='__main__':
     print 'updating schema...'
     rs.updateSchema(vbose=vbose)
 
-    print 'computing the Value Added quantities...'
-    rdata = rs.computeValueAdded()
+    # the values are written out as they are computed, a batch of games
+    # at a time
+    print 'computing the Value Added quantities into %s...' % ofile
+    with timing.timed('value_added', '%d-%d' % (minyr, maxyr)) as counts:
+        pflags = rs.playoffFlagSql(minyr=minyr, maxyr=maxyr, vbose=vbose)
+        rdata = rs.computeValueAdded(minyr=minyr, maxyr=maxyr, vbose=vbose)
+        written = timing.profiled('value_added', '%d-%d' % (minyr, maxyr), rs.writeSqlFile, rdata, ofile, n2print=n2print, statements=pflags)
+        counts['rows'] = written.get('TBL_RETRO_EVENTS', 0)
 
-    print 'writing output to %s...' % ofile
-    rs.writeSqlFile(rdata, ofile, n2print=n2print)
+    timing.report()
 
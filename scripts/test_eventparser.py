@@ -0,0 +1,95 @@
+"""
+Compare the built-in event file parser (classes/eventparser.py) with
+cwevent and cwgame on the sample season in test_data/: a game of event file
+2004ANA.EVA with hits, walks, errors, stolen bases, caught stealing, a wild
+pitch, double plays, a sacrifice fly and substitutions, and its rosters.
+
+Every field must match Chadwick's output, except those in
+eventparser.APPROXIMATE, whose differences are listed but allowed. Exits
+with status 1 when another field differs or the row counts do not match.
+
+    python test_eventparser.py [-c chadwick directory]
+
+The chadwick directory defaults to [chadwick] directory of config.ini.
+"""
+
+import os
+import sys
+import shutil
+import getopt
+import tempfile
+import ConfigParser
+from classes import eventparser
+
+SAMPLE = '%s/test_data' % os.path.dirname(os.path.abspath(__file__))
+YEAR = 2004
+
+
+def chadwick_directory(opts):
+    if '-c' in opts:
+        return opts['-c']
+    config = ConfigParser.ConfigParser()
+    config.read('config.ini')
+    return config.get('chadwick', 'directory') if config.has_option('chadwick', 'directory') else '/usr/local/bin'
+
+
+def count_lines(file):
+    with open(file) as fp:
+        return sum(1 for line in fp)
+
+
+def main():
+    opts, args = getopt.getopt(sys.argv[1:], "c:")
+    opts = dict(opts)
+    chadwick = chadwick_directory(opts)
+    for binary in ('cwevent', 'cwgame'):
+        if not os.path.exists('%s/%s' % (chadwick, binary)):
+            print '%s does not exist in %s - use -c' % (binary, chadwick)
+            raise SystemExit(1)
+
+    path = tempfile.mkdtemp(prefix='retrosheet-test-')
+    try:
+        for name in os.listdir(SAMPLE):
+            shutil.copy('%s/%s' % (SAMPLE, name), path)
+        csvpath = '%s/csv' % path
+
+        jobs = eventparser.file_jobs(path, YEAR, csvpath)
+        failed = [name for name, code in map(eventparser.run_native, jobs) if code != 0]
+        if failed or not eventparser.merge(path, YEAR, csvpath):
+            print 'the native parser failed on %s' % ', '.join(failed)
+            raise SystemExit(1)
+
+        errors = 0
+        for kind in ('events', 'games'):
+            binary, args, fields = eventparser.CHADWICK[kind]
+            native = '%s/%s-%d.csv' % (csvpath, kind, YEAR)
+            reference = '%s/chadwick-%s-%d.csv' % (path, kind, YEAR)
+            code = eventparser.chadwick_csv(path, YEAR, chadwick, kind, reference)
+            if code != 0:
+                print '%s failed with exit code %s' % (binary, code)
+                errors += 1
+                continue
+
+            # both have a header line
+            native_rows, chadwick_rows = count_lines(native) - 1, count_lines(reference) - 1
+            if native_rows != chadwick_rows:
+                print '%s: %d rows, %s wrote %d' % (kind, native_rows, binary, chadwick_rows)
+                errors += 1
+
+            rows, mismatches = eventparser.compare(native, reference, fields)
+            for f in fields:
+                if mismatches[f]:
+                    allowed = f in eventparser.APPROXIMATE
+                    print '%s %-28s %d differences%s' % (kind, f, mismatches[f], ' (approximated)' if allowed else '')
+                    errors += 0 if allowed else 1
+            print '%s: %d rows compared' % (kind, rows - 1) # and the header
+    finally:
+        shutil.rmtree(path)
+
+    if errors:
+        raise SystemExit(1)
+    print 'ok'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Download an archive with classes/fetcher.py from a local stand-in for
+retrosheet.org that injects faults, and check that the Fetcher recovers:
+
+  retry         the server answers 503 and then the archive
+  resume        the body is cut off halfway, and the retry resumes the
+                part with a Range request validated by If-Range
+  not modified  a second run requests the archive conditionally and gets 304
+  unchanged     the archive comes again under a new ETag, with the same
+                contents: it is not extracted again, and the new ETag is
+                recorded
+  changed       the archive changes while a part is left over: the server
+                ignores the Range, and the whole new archive is used
+  complete      the part left over is the whole archive, as when a run is
+                killed before the rename: the server answers the Range with
+                416, and the archive is downloaded again from the start
+
+The archive holds the files of the sample season in test_data/. Exits with
+status 1 when a check fails.
+
+    python test_fetcher.py
+"""
+
+import os
+import sys
+import json
+import shutil
+import zipfile
+import hashlib
+import tempfile
+import threading
+import Queue
+import BaseHTTPServer
+from classes.fetcher import Fetcher, DownloadCache
+
+SAMPLE = '%s/test_data' % os.path.dirname(os.path.abspath(__file__))
+ARCHIVE = '2004eve.zip'
+
+
+class Archive(BaseHTTPServer.BaseHTTPRequestHandler):
+    ''' Serves server.data as ARCHIVE, answering conditional and Range
+    requests like a static file server (416 for a Range past the end),
+    after the faults queued in server.faults: '503', or 'truncate' to send
+    half of the body. '''
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict((h, self.headers.get(h)) for h in ('Range', 'If-Range', 'If-None-Match')))
+        fault = server.faults.pop(0) if server.faults else None
+        etag = '"%s"' % hashlib.sha1(server.data + server.salt).hexdigest()
+
+        if fault == '503':
+            self.send_error(503)
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = server.data
+        if self.headers.get('Range') and self.headers.get('If-Range') == etag:
+            offset = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            if offset >= len(server.data):
+                self.send_error(416)
+                return
+            body = server.data[offset:]
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (offset, len(server.data) - 1, len(server.data)))
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:len(body) // 2] if fault == 'truncate' else body)
+
+    def log_message(self, *args):
+        pass
+
+
+def archive(path, names):
+    ''' The contents of a zip archive of the sample files `names`. '''
+    file = '%s/archive.zip' % path
+    zip = zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED)
+    for name in names:
+        zip.write('%s/%s' % (SAMPLE, name), name)
+    zip.close()
+    data = open(file, 'rb').read()
+    os.remove(file)
+    return data
+
+
+def fetch(url, path):
+    ''' Download `url` into `path` like download.py, with a Fetcher thread
+    and the download cache of `path`. Returns the cache and the failures. '''
+    cache = DownloadCache('%s/downloads.json' % path)
+    failures = []
+    queue = Queue.Queue()
+    queue.put(url)
+    queue.put(None)
+    t = Fetcher(queue, path, {'verbose': True, 'retries': 3, 'backoff': 0.01}, cache, failures)
+    t.start()
+    t.join()
+    cache.save()
+    return cache, failures
+
+
+def main():
+    path = tempfile.mkdtemp(prefix='retrosheet-test-')
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Archive)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:%d/%s' % (server.server_port, ARCHIVE)
+
+    errors = []
+    def check(name, ok):
+        print '%-13s %s' % (name, 'ok' if ok else 'FAILED')
+        if not ok:
+            errors.append(name)
+
+    try:
+        names = sorted(os.listdir(SAMPLE))
+        downloads = '%s/downloads' % path
+        os.makedirs(downloads)
+        server.data, server.salt = archive(path, names), ''
+
+        def extracted():
+            return all(open('%s/%s' % (downloads, name), 'rb').read() == open('%s/%s' % (SAMPLE, name), 'rb').read()
+                       for name in names)
+
+        server.faults, server.requests = ['503'], []
+        cache, failures = fetch(url, downloads)
+        check('retry', not failures and len(server.requests) == 2 and extracted() and cache.changed == [ARCHIVE])
+
+        server.faults, server.requests = ['truncate'], []
+        for name in names:
+            os.remove('%s/%s' % (downloads, name))
+        cache, failures = fetch(url, downloads)
+        resumed = server.requests[1:] and server.requests[1]['Range'] == 'bytes=%d-' % (len(server.data) // 2) \
+            and server.requests[1]['If-Range'] is not None
+        check('resume', not failures and len(server.requests) == 2 and resumed and extracted() and
+              not os.path.exists('%s/%s.part' % (downloads, ARCHIVE)))
+
+        server.requests = []
+        cache, failures = fetch(url, downloads)
+        check('not modified', not failures and server.requests[0]['If-None-Match'] is not None and cache.changed == [])
+
+        server.salt, server.requests = 'new etag', []
+        etag = cache.entries[url]['etag']
+        cache, failures = fetch(url, downloads)
+        check('unchanged', not failures and cache.changed == [] and cache.entries[url]['etag'] not in (None, etag))
+
+        # leave a part of the current archive, as a run killed mid-download
+        for name in names:
+            os.remove('%s/%s' % (downloads, name))
+        server.faults = ['truncate']
+        try:
+            Fetcher(Queue.Queue(), downloads, {'verbose': False}).download(url, '%s/%s' % (downloads, ARCHIVE))
+        except IOError:
+            pass
+        names = names[:1]
+        server.data, server.requests = archive(path, names), []
+        cache, failures = fetch(url, downloads)
+        check('changed', not failures and len(server.requests) == 1 and server.requests[0]['Range'] is not None and
+              extracted() and cache.changed == [ARCHIVE])
+
+        # leave the whole archive as the part, with its validators
+        for name in names:
+            os.remove('%s/%s' % (downloads, name))
+        part = '%s/%s.part' % (downloads, ARCHIVE)
+        open(part, 'wb').write(server.data)
+        json.dump({'url': url, 'etag': cache.entries[url]['etag'], 'last_modified': None}, open('%s.json' % part, 'w'))
+        server.requests = []
+        cache, failures = fetch(url, downloads)
+        check('complete', not failures and len(server.requests) == 2 and
+              server.requests[0]['Range'] == 'bytes=%d-' % len(server.data) and server.requests[1]['Range'] is None and
+              extracted() and not os.path.exists(part))
+    finally:
+        server.shutdown()
+        shutil.rmtree(path)
+
+    if errors:
+        raise SystemExit(1)
+    print 'ok'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+-- Optional: partition events and games by season (PostgreSQL 11 or later).
+--
+-- Run this right after schema.postgres.sql, while both tables are still
+-- empty. It recreates them as tables partitioned by a new year_id column.
+-- parse.py notices the partitioning and loads each season into its own
+-- table (events_2004, games_2004, ...), which it swaps in with
+-- ATTACH PARTITION, so reloading a season never touches the others and
+-- queries with "where year_id = ..." only scan one partition.
+
+alter table events rename to events_flat;
+alter table games rename to games_flat;
+
+create table games (like games_flat including defaults, year_id integer not null)
+    partition by list (year_id);
+alter table games add primary key (year_id, game_id);
+
+create table events (like events_flat including defaults, year_id integer not null)
+    partition by list (year_id);
+alter table events add primary key (year_id, game_id, event_id);
+
+drop table events_flat;
+drop table games_flat;
+
+-- indexes on the partitioned tables are created on every partition
+create index events_bat_id_idx on events (bat_id);
+create index events_pit_id_idx on events (pit_id);
+create index games_park_id_idx on games (park_id);
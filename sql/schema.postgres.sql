@@ -3,6 +3,7 @@ drop table if exists games;
 drop table if exists rosters;
 drop table if exists teams;
 drop table if exists parkcodes;
+drop table if exists gamelogs;
 drop table if exists lkup_cd_bases;
 drop table if exists lkup_cd_battedball;
 drop table if exists lkup_cd_event;
@@ -270,6 +271,9 @@ CREATE TABLE events (
     uncertain_play_exc_fl text,
     primary key (game_id, event_id)
 );
+CREATE INDEX events_bat_id_idx ON events (bat_id);
+CREATE INDEX events_pit_id_idx ON events (pit_id);
+CREATE INDEX games_park_id_idx ON games (park_id);
 
 CREATE TABLE teams (
 	 team_id text primary key
@@ -290,6 +294,172 @@ CREATE TABLE rosters (
 	,primary key (year, player_id, team_tx)
 );
 
+-- Retrosheet game logs, see http://www.retrosheet.org/gamelogs/glfields.txt
+CREATE TABLE gamelogs (
+	 game_dt integer
+	,game_ct text
+	,game_dy text
+	,away_team_id text
+	,away_team_league_id text
+	,away_team_game_ct integer
+	,home_team_id text
+	,home_team_league_id text
+	,home_team_game_ct integer
+	,away_score_ct integer
+	,home_score_ct integer
+	,length_outs_ct integer
+	,daynight_park_cd text
+	,completion_tx text
+	,forfeit_tx text
+	,protest_tx text
+	,park_id text
+	,attend_park_ct integer
+	,minutes_game_ct integer
+	,away_linescore_tx text
+	,home_linescore_tx text
+	,away_ab_ct integer
+	,away_h_ct integer
+	,away_2b_ct integer
+	,away_3b_ct integer
+	,away_hr_ct integer
+	,away_rbi_ct integer
+	,away_sh_ct integer
+	,away_sf_ct integer
+	,away_hp_ct integer
+	,away_bb_ct integer
+	,away_ibb_ct integer
+	,away_so_ct integer
+	,away_sb_ct integer
+	,away_cs_ct integer
+	,away_gdp_ct integer
+	,away_xi_ct integer
+	,away_lob_ct integer
+	,away_pit_ct integer
+	,away_er_ct integer
+	,away_ter_ct integer
+	,away_wp_ct integer
+	,away_bk_ct integer
+	,away_po_ct integer
+	,away_a_ct integer
+	,away_e_ct integer
+	,away_pb_ct integer
+	,away_dp_ct integer
+	,away_tp_ct integer
+	,home_ab_ct integer
+	,home_h_ct integer
+	,home_2b_ct integer
+	,home_3b_ct integer
+	,home_hr_ct integer
+	,home_rbi_ct integer
+	,home_sh_ct integer
+	,home_sf_ct integer
+	,home_hp_ct integer
+	,home_bb_ct integer
+	,home_ibb_ct integer
+	,home_so_ct integer
+	,home_sb_ct integer
+	,home_cs_ct integer
+	,home_gdp_ct integer
+	,home_xi_ct integer
+	,home_lob_ct integer
+	,home_pit_ct integer
+	,home_er_ct integer
+	,home_ter_ct integer
+	,home_wp_ct integer
+	,home_bk_ct integer
+	,home_po_ct integer
+	,home_a_ct integer
+	,home_e_ct integer
+	,home_pb_ct integer
+	,home_dp_ct integer
+	,home_tp_ct integer
+	,ump_home_id text
+	,ump_home_name_tx text
+	,ump_1b_id text
+	,ump_1b_name_tx text
+	,ump_2b_id text
+	,ump_2b_name_tx text
+	,ump_3b_id text
+	,ump_3b_name_tx text
+	,ump_lf_id text
+	,ump_lf_name_tx text
+	,ump_rf_id text
+	,ump_rf_name_tx text
+	,away_manager_id text
+	,away_manager_name_tx text
+	,home_manager_id text
+	,home_manager_name_tx text
+	,win_pit_id text
+	,win_pit_name_tx text
+	,lose_pit_id text
+	,lose_pit_name_tx text
+	,save_pit_id text
+	,save_pit_name_tx text
+	,gwrbi_bat_id text
+	,gwrbi_bat_name_tx text
+	,away_start_pit_id text
+	,away_start_pit_name_tx text
+	,home_start_pit_id text
+	,home_start_pit_name_tx text
+	,away_lineup1_bat_id text
+	,away_lineup1_bat_name_tx text
+	,away_lineup1_fld_cd integer
+	,away_lineup2_bat_id text
+	,away_lineup2_bat_name_tx text
+	,away_lineup2_fld_cd integer
+	,away_lineup3_bat_id text
+	,away_lineup3_bat_name_tx text
+	,away_lineup3_fld_cd integer
+	,away_lineup4_bat_id text
+	,away_lineup4_bat_name_tx text
+	,away_lineup4_fld_cd integer
+	,away_lineup5_bat_id text
+	,away_lineup5_bat_name_tx text
+	,away_lineup5_fld_cd integer
+	,away_lineup6_bat_id text
+	,away_lineup6_bat_name_tx text
+	,away_lineup6_fld_cd integer
+	,away_lineup7_bat_id text
+	,away_lineup7_bat_name_tx text
+	,away_lineup7_fld_cd integer
+	,away_lineup8_bat_id text
+	,away_lineup8_bat_name_tx text
+	,away_lineup8_fld_cd integer
+	,away_lineup9_bat_id text
+	,away_lineup9_bat_name_tx text
+	,away_lineup9_fld_cd integer
+	,home_lineup1_bat_id text
+	,home_lineup1_bat_name_tx text
+	,home_lineup1_fld_cd integer
+	,home_lineup2_bat_id text
+	,home_lineup2_bat_name_tx text
+	,home_lineup2_fld_cd integer
+	,home_lineup3_bat_id text
+	,home_lineup3_bat_name_tx text
+	,home_lineup3_fld_cd integer
+	,home_lineup4_bat_id text
+	,home_lineup4_bat_name_tx text
+	,home_lineup4_fld_cd integer
+	,home_lineup5_bat_id text
+	,home_lineup5_bat_name_tx text
+	,home_lineup5_fld_cd integer
+	,home_lineup6_bat_id text
+	,home_lineup6_bat_name_tx text
+	,home_lineup6_fld_cd integer
+	,home_lineup7_bat_id text
+	,home_lineup7_bat_name_tx text
+	,home_lineup7_fld_cd integer
+	,home_lineup8_bat_id text
+	,home_lineup8_bat_name_tx text
+	,home_lineup8_fld_cd integer
+	,home_lineup9_bat_id text
+	,home_lineup9_bat_name_tx text
+	,home_lineup9_fld_cd integer
+	,additional_info_tx text
+	,acquisition_info_tx text
+	,primary key (game_dt, home_team_id, game_ct)
+);
+
 CREATE TABLE parkcodes (
 	park_id text not null primary key,
 	name text,
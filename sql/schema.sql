@@ -164,6 +164,8 @@ GAME_ID varchar(12)
 ,PRIMARY KEY (GAME_ID, EVENT_ID)
 )
 ;
+CREATE INDEX events_bat_id_idx ON events (BAT_ID);
+CREATE INDEX events_pit_id_idx ON events (PIT_ID);
 
 DROP TABLE if exists games;
 CREATE TABLE games (
@@ -253,6 +255,7 @@ GAME_ID varchar(12) PRIMARY KEY
 ,HOME_FINISH_PIT_ID varchar(8)
 )
 ;
+CREATE INDEX games_park_id_idx ON games (PARK_ID);
 
 DROP TABLE if exists rosters;
 CREATE TABLE rosters (
@@ -264,18 +267,186 @@ CREATE TABLE rosters (
 ,PIT_HAND_CD varchar(1)
 ,TEAM_TX varchar(3)
 ,POS_TX varchar(5)
+,PRIMARY KEY (YEAR, PLAYER_ID, TEAM_TX)
 )
 ;
 
 DROP TABLE if exists teams;
 CREATE TABLE teams (
- TEAM_ID varchar(3)
+ TEAM_ID varchar(3) PRIMARY KEY
 ,LG_ID varchar(1)
 ,LOC_TEAM_TX varchar(30)
 ,NAME_TEAM_TX varchar(30)
 )
 ;
 
+DROP TABLE if exists gamelogs;
+CREATE TABLE gamelogs (
+ GAME_DT INTEGER
+,GAME_CT varchar(1)
+,GAME_DY varchar(3)
+,AWAY_TEAM_ID varchar(8)
+,AWAY_TEAM_LEAGUE_ID varchar(8)
+,AWAY_TEAM_GAME_CT INTEGER
+,HOME_TEAM_ID varchar(8)
+,HOME_TEAM_LEAGUE_ID varchar(8)
+,HOME_TEAM_GAME_CT INTEGER
+,AWAY_SCORE_CT INTEGER
+,HOME_SCORE_CT INTEGER
+,LENGTH_OUTS_CT INTEGER
+,DAYNIGHT_PARK_CD varchar(1)
+,COMPLETION_TX varchar(50)
+,FORFEIT_TX varchar(50)
+,PROTEST_TX varchar(50)
+,PARK_ID varchar(5)
+,ATTEND_PARK_CT INTEGER
+,MINUTES_GAME_CT INTEGER
+,AWAY_LINESCORE_TX varchar(255)
+,HOME_LINESCORE_TX varchar(255)
+,AWAY_AB_CT INTEGER
+,AWAY_H_CT INTEGER
+,AWAY_2B_CT INTEGER
+,AWAY_3B_CT INTEGER
+,AWAY_HR_CT INTEGER
+,AWAY_RBI_CT INTEGER
+,AWAY_SH_CT INTEGER
+,AWAY_SF_CT INTEGER
+,AWAY_HP_CT INTEGER
+,AWAY_BB_CT INTEGER
+,AWAY_IBB_CT INTEGER
+,AWAY_SO_CT INTEGER
+,AWAY_SB_CT INTEGER
+,AWAY_CS_CT INTEGER
+,AWAY_GDP_CT INTEGER
+,AWAY_XI_CT INTEGER
+,AWAY_LOB_CT INTEGER
+,AWAY_PIT_CT INTEGER
+,AWAY_ER_CT INTEGER
+,AWAY_TER_CT INTEGER
+,AWAY_WP_CT INTEGER
+,AWAY_BK_CT INTEGER
+,AWAY_PO_CT INTEGER
+,AWAY_A_CT INTEGER
+,AWAY_E_CT INTEGER
+,AWAY_PB_CT INTEGER
+,AWAY_DP_CT INTEGER
+,AWAY_TP_CT INTEGER
+,HOME_AB_CT INTEGER
+,HOME_H_CT INTEGER
+,HOME_2B_CT INTEGER
+,HOME_3B_CT INTEGER
+,HOME_HR_CT INTEGER
+,HOME_RBI_CT INTEGER
+,HOME_SH_CT INTEGER
+,HOME_SF_CT INTEGER
+,HOME_HP_CT INTEGER
+,HOME_BB_CT INTEGER
+,HOME_IBB_CT INTEGER
+,HOME_SO_CT INTEGER
+,HOME_SB_CT INTEGER
+,HOME_CS_CT INTEGER
+,HOME_GDP_CT INTEGER
+,HOME_XI_CT INTEGER
+,HOME_LOB_CT INTEGER
+,HOME_PIT_CT INTEGER
+,HOME_ER_CT INTEGER
+,HOME_TER_CT INTEGER
+,HOME_WP_CT INTEGER
+,HOME_BK_CT INTEGER
+,HOME_PO_CT INTEGER
+,HOME_A_CT INTEGER
+,HOME_E_CT INTEGER
+,HOME_PB_CT INTEGER
+,HOME_DP_CT INTEGER
+,HOME_TP_CT INTEGER
+,UMP_HOME_ID varchar(8)
+,UMP_HOME_NAME_TX varchar(50)
+,UMP_1B_ID varchar(8)
+,UMP_1B_NAME_TX varchar(50)
+,UMP_2B_ID varchar(8)
+,UMP_2B_NAME_TX varchar(50)
+,UMP_3B_ID varchar(8)
+,UMP_3B_NAME_TX varchar(50)
+,UMP_LF_ID varchar(8)
+,UMP_LF_NAME_TX varchar(50)
+,UMP_RF_ID varchar(8)
+,UMP_RF_NAME_TX varchar(50)
+,AWAY_MANAGER_ID varchar(8)
+,AWAY_MANAGER_NAME_TX varchar(50)
+,HOME_MANAGER_ID varchar(8)
+,HOME_MANAGER_NAME_TX varchar(50)
+,WIN_PIT_ID varchar(8)
+,WIN_PIT_NAME_TX varchar(50)
+,LOSE_PIT_ID varchar(8)
+,LOSE_PIT_NAME_TX varchar(50)
+,SAVE_PIT_ID varchar(8)
+,SAVE_PIT_NAME_TX varchar(50)
+,GWRBI_BAT_ID varchar(8)
+,GWRBI_BAT_NAME_TX varchar(50)
+,AWAY_START_PIT_ID varchar(8)
+,AWAY_START_PIT_NAME_TX varchar(50)
+,HOME_START_PIT_ID varchar(8)
+,HOME_START_PIT_NAME_TX varchar(50)
+,AWAY_LINEUP1_BAT_ID varchar(8)
+,AWAY_LINEUP1_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP1_FLD_CD INTEGER
+,AWAY_LINEUP2_BAT_ID varchar(8)
+,AWAY_LINEUP2_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP2_FLD_CD INTEGER
+,AWAY_LINEUP3_BAT_ID varchar(8)
+,AWAY_LINEUP3_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP3_FLD_CD INTEGER
+,AWAY_LINEUP4_BAT_ID varchar(8)
+,AWAY_LINEUP4_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP4_FLD_CD INTEGER
+,AWAY_LINEUP5_BAT_ID varchar(8)
+,AWAY_LINEUP5_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP5_FLD_CD INTEGER
+,AWAY_LINEUP6_BAT_ID varchar(8)
+,AWAY_LINEUP6_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP6_FLD_CD INTEGER
+,AWAY_LINEUP7_BAT_ID varchar(8)
+,AWAY_LINEUP7_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP7_FLD_CD INTEGER
+,AWAY_LINEUP8_BAT_ID varchar(8)
+,AWAY_LINEUP8_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP8_FLD_CD INTEGER
+,AWAY_LINEUP9_BAT_ID varchar(8)
+,AWAY_LINEUP9_BAT_NAME_TX varchar(50)
+,AWAY_LINEUP9_FLD_CD INTEGER
+,HOME_LINEUP1_BAT_ID varchar(8)
+,HOME_LINEUP1_BAT_NAME_TX varchar(50)
+,HOME_LINEUP1_FLD_CD INTEGER
+,HOME_LINEUP2_BAT_ID varchar(8)
+,HOME_LINEUP2_BAT_NAME_TX varchar(50)
+,HOME_LINEUP2_FLD_CD INTEGER
+,HOME_LINEUP3_BAT_ID varchar(8)
+,HOME_LINEUP3_BAT_NAME_TX varchar(50)
+,HOME_LINEUP3_FLD_CD INTEGER
+,HOME_LINEUP4_BAT_ID varchar(8)
+,HOME_LINEUP4_BAT_NAME_TX varchar(50)
+,HOME_LINEUP4_FLD_CD INTEGER
+,HOME_LINEUP5_BAT_ID varchar(8)
+,HOME_LINEUP5_BAT_NAME_TX varchar(50)
+,HOME_LINEUP5_FLD_CD INTEGER
+,HOME_LINEUP6_BAT_ID varchar(8)
+,HOME_LINEUP6_BAT_NAME_TX varchar(50)
+,HOME_LINEUP6_FLD_CD INTEGER
+,HOME_LINEUP7_BAT_ID varchar(8)
+,HOME_LINEUP7_BAT_NAME_TX varchar(50)
+,HOME_LINEUP7_FLD_CD INTEGER
+,HOME_LINEUP8_BAT_ID varchar(8)
+,HOME_LINEUP8_BAT_NAME_TX varchar(50)
+,HOME_LINEUP8_FLD_CD INTEGER
+,HOME_LINEUP9_BAT_ID varchar(8)
+,HOME_LINEUP9_BAT_NAME_TX varchar(50)
+,HOME_LINEUP9_FLD_CD INTEGER
+,ADDITIONAL_INFO_TX varchar(255)
+,ACQUISITION_INFO_TX varchar(255)
+,PRIMARY KEY (GAME_DT, HOME_TEAM_ID, GAME_CT)
+)
+;
+
 DROP TABLE if exists parkcodes;
 CREATE TABLE `parkcodes` (
   `PARKID` varchar(6) NOT NULL,